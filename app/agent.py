@@ -14,12 +14,12 @@
 
 import os
 
-import google
 import vertexai
 from google.adk.agents import Agent
 from google.genai.types import GenerateContentConfig
 
 from app.callbacks import (
+    after_tool_callback,
     before_model_callback,
     before_tool_callback,
 )
@@ -31,8 +31,8 @@ from app.tools import (
     question_generation_agent_tool,
 )
 
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+# Without GOOGLE_CLOUD_PROJECT, Vertex AI and the Gemini client read the project
+# from the application default credentials when they first need it, not here.
 os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
 os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
@@ -41,7 +41,7 @@ TOP_K = 5
 TEMPERATURE = 0.0
 
 vertexai.init(
-    project=project_id,
+    project=os.getenv("GOOGLE_CLOUD_PROJECT"),
     location=os.getenv("GOOGLE_CLOUD_LOCATION"),
 )
 
@@ -57,5 +57,6 @@ root_agent = Agent(
     ],
     before_model_callback=before_model_callback,
     before_tool_callback=before_tool_callback,
+    after_tool_callback=after_tool_callback,
     generate_content_config=GenerateContentConfig(temperature=TEMPERATURE),
 )
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 # mypy: disable-error-code="attr-defined"
+import atexit
 import copy
 import datetime
 import json
@@ -30,7 +31,24 @@ from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
 from app.agent import root_agent
+from app.tools import (
+    evaluation_cache,
+    local_grader,
+    maths_exercise_generator,
+    provisional_scorer,
+    question_bank,
+    question_eval_agent_tool,
+    question_generation_agent_tool,
+    question_speculator,
+    retrieval_cache,
+)
+from app.utils.answer_stream import answer_streams
+from app.utils.bigquery import bq_client_pool
+from app.utils.eval_pipeline import ConcurrentEvalAgentTool
 from app.utils.gcs import create_bucket_if_not_exists
+from app.utils.result_sink import result_writer, rollup_writer
+from app.utils.result_store import LOCATION as RESULTS_LOCATION
+from app.utils.result_store import BigQueryResultStore, result_store
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from app.utils.typing import Feedback
 
@@ -49,19 +67,98 @@ class AgentEngineApp(AdkApp):
         )
         provider.add_span_processor(processor)
         trace.set_tracer_provider(provider)
+        result_writer.replay_journal()
+        atexit.register(self.shutdown)
+
+    def shutdown(self) -> None:
+        """Drain the buffered quiz results before the process exits."""
+        result_writer.close()
+        logging.info(f"Result writer drained: {result_writer.stats()}")
+        # After the result writer, which queues the rows for the score totals.
+        rollup_writer.close()
+        logging.info(f"Rollup writer drained: {rollup_writer.stats()}")
+        if question_bank is not None:
+            question_bank.close()
+        if question_speculator is not None:
+            question_speculator.close()
+
+    def stream_query(
+        self,
+        *,
+        message: str,
+        user_id: str,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Stream the events of a query, with the evaluation of an answer streamed
+        ahead of the root agent's final answer.
+        """
+        events = super().stream_query(
+            message=message, user_id=user_id, session_id=session_id, **kwargs
+        )
+        if not session_id:
+            yield from events
+            return
+        yield from answer_streams.stream(session_id, events, author=root_agent.name)
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
         """Collect and log feedback."""
         feedback_obj = Feedback.model_validate(feedback)
         self.logger.log_struct(feedback_obj.model_dump(), severity="INFO")
 
+    def get_performance_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Return the result and rollup writer, retrieval cache, question bank,
+        evaluation pipeline, question speculation, question history, local
+        grading, maths exercise and answer streaming counters.
+        """
+        return {
+            "result_writer": result_writer.stats(),
+            "rollup_writer": rollup_writer.stats(),
+            "retrieval_cache": retrieval_cache.stats(),
+            "question_bank": question_bank.stats() if question_bank else {},
+            "eval_pipeline": (
+                question_eval_agent_tool.stats()
+                if isinstance(question_eval_agent_tool, ConcurrentEvalAgentTool)
+                else {}
+            ),
+            "question_speculation": (
+                question_speculator.stats() if question_speculator else {}
+            ),
+            "question_history": question_generation_agent_tool.stats(),
+            "local_grading": local_grader.stats() if local_grader else {},
+            "evaluation_cache": evaluation_cache.stats() if evaluation_cache else {},
+            "provisional_score": (
+                provisional_scorer.stats() if provisional_scorer else {}
+            ),
+            "maths_exercises": (
+                maths_exercise_generator.stats() if maths_exercise_generator else {}
+            ),
+            "answer_stream": answer_streams.stats(),
+        }
+
+    def check_health(self) -> dict[str, bool]:
+        """
+        Checks the pooled BigQuery client of the results store, which is rebuilt
+        on the next call when it is unhealthy.
+        """
+        if not isinstance(result_store, BigQueryResultStore):
+            return {}
+        return {"bigquery": bq_client_pool.check_health(RESULTS_LOCATION)}
+
     def register_operations(self) -> Mapping[str, Sequence]:
         """Registers the operations of the Agent.
 
-        Extends the base operations to include feedback registration functionality.
+        Extends the base operations to include feedback registration,
+        performance statistics and the health check.
         """
         operations = super().register_operations()
-        operations[""] = operations[""] + ["register_feedback"]
+        operations[""] = operations[""] + [
+            "register_feedback",
+            "get_performance_stats",
+            "check_health",
+        ]
         return operations
 
     def clone(self) -> "AgentEngineApp":
@@ -101,6 +198,9 @@ def deploy_agent_engine_app(
         agent_engine = AgentEngineApp(agent=root_agent)
     # Set worker parallelism to 1
     env_vars["NUM_WORKERS"] = "1"
+    # Without a journal, buffered quiz results are lost when an instance stops.
+    if not env_vars.get("RESULT_JOURNAL_PATH"):
+        raise ValueError("RESULT_JOURNAL_PATH must be set when deploying the agent")
 
     # Common configuration for both create and update operations
     agent_config = {
@@ -1,4 +1,7 @@
+import asyncio
 import json
+import logging
+import os
 from typing import Any
 
 from google.adk.agents.callback_context import CallbackContext
@@ -7,6 +10,49 @@ from google.adk.models.llm_response import LlmResponse
 from google.adk.tools.base_tool import BaseTool
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
+from pydantic import BaseModel
+
+from app.utils.answer_stream import (
+    format_next_question,
+    format_provisional_line,
+    format_score_line,
+)
+from app.utils.chapter_context import (
+    advance_context_window,
+    get_context_window,
+    get_pinned_context,
+    pin_chapter_context,
+    remove_function_declaration,
+)
+from app.utils.formatting import parse_agent_json, parse_agent_output
+from app.utils.question_history import (
+    get_graded_question,
+    get_question_history,
+    record_graded_question,
+    record_question,
+    record_rubric,
+    seed_question_history,
+    with_rubric,
+)
+from app.utils.scores import record_score
+from app.utils.typing import (
+    GeneratedQuestion,
+    GradedAnswer,
+    QuestionEvaluation,
+    ScoreTotals,
+)
+
+CHAPTER_CONTEXT_MAX_CHARS = int(os.getenv("CHAPTER_CONTEXT_MAX_CHARS", "20000"))
+# Chunks retrieved for a chapter, and chunks each question is generated from.
+CHAPTER_CONTEXT_TOP_K = int(os.getenv("CHAPTER_CONTEXT_TOP_K", "25"))
+CHAPTER_CONTEXT_WINDOW = int(os.getenv("CHAPTER_CONTEXT_WINDOW", "5"))
+
+# Schemas of the tool outputs the root agent's answer is formatted from.
+TOOL_OUTPUT_SCHEMAS: dict[str, type[BaseModel]] = {
+    "question_generation_agent": GeneratedQuestion,
+    "question_eval_agent": QuestionEvaluation,
+    "get_bq_data": ScoreTotals,
+}
 
 
 def store_results(
@@ -19,135 +65,332 @@ def store_results(
     student_score: int,
     max_score: int,
     difficulty: int,
+    correct_answer: str | None = None,
+    rubric: list[dict] | None = None,
 ) -> None:
     """
     After a user answers a question the result of the evaluation is stored in bigquery with this tool.
+
+    The row is handed to the write-behind result writer, so the insert happens
+    outside of the student's turn. The correct answer and rubric the answer was
+    graded against are kept with it, the rubric as JSON, so the provisional
+    score can be calibrated against the stored results.
     """
     import datetime
-    import os
-
-    import google
-    from google.cloud import bigquery
 
     from app.utils.formatting import format_bq_string
+    from app.utils.result_sink import result_writer
 
-    LOCATION = "europe-west1"
-
-    # Initialize Google Cloud and Vertex AI
-    _, project_id = google.auth.default()
-
-    bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
-    bq_table_id = os.getenv("TABLE_ID", "question_answer")
-
-    bigquery_client = bigquery.Client(location=LOCATION, project=project_id)
-    table_id = f"{project_id}.{bq_dataset_id}.{bq_table_id}"
-    table = bigquery_client.get_table(table_id)
-    rows_to_insert = [
-        (
-            user_id,
-            session_id,
-            format_bq_string(subject),
-            format_bq_string(chapter),
-            question,
-            answer,
-            student_score,
-            max_score,
-            difficulty,
-            datetime.datetime.now(),
-        )
-    ]
-    bigquery_client.insert_rows(table, rows_to_insert)
+    result_writer.submit(
+        {
+            "userId": user_id,
+            "sessionId": session_id,
+            "subject": format_bq_string(subject),
+            "chapter": format_bq_string(chapter),
+            "question": question,
+            "answer": answer,
+            "student_score": student_score,
+            "max_score": max_score,
+            "difficulty": difficulty,
+            "timestamp": datetime.datetime.now(),
+            "correct_answer": correct_answer,
+            "rubric": json.dumps(rubric, ensure_ascii=False) if rubric else None,
+        }
+    )
+
+
+def store_graded_answer(
+    callback_context: CallbackContext, result: GradedAnswer | QuestionEvaluation
+) -> None:
+    """Adds a graded answer to the session totals and stores its result."""
+    record_score(
+        callback_context.state,
+        subject=result.subject,
+        chapter=result.chapter,
+        student_score=result.score,
+        max_score=result.max_score,
+    )
+    graded = get_graded_question(callback_context.state, result.question) or {}
+    store_results(
+        user_id=callback_context.state["user_id"],
+        session_id=callback_context.state["session_id"],
+        subject=result.subject,
+        chapter=result.chapter,
+        question=result.question,
+        answer=result.answer,
+        student_score=result.score,
+        max_score=result.max_score,
+        difficulty=result.difficulty,
+        correct_answer=graded.get("correct_answer") or result.correct_answer,
+        rubric=graded.get("rubric"),
+    )
 
 
 def before_model_callback(
     callback_context: CallbackContext, llm_request: LlmRequest
 ) -> LlmRequest | None:
     function_response = llm_request.contents[-1].parts[-1].function_response
-    if function_response:
-        if (
-            "result" in function_response.response
-        ):
-            if "json" in function_response.response["result"]:
-                result = json.loads(
-                    function_response.response["result"]
-                    .replace("\n", "")
-                    .replace("None", "null")
-                    .strip("`json ")
-                )
-            elif function_response.response["result"].startswith("{"):
-                result = json.loads(
-                    function_response.response["result"]
-                    .replace("\n", "")
-                    .replace("None", "null")
-                    .replace("'", '"')
-                )
-            if result:
-                if function_response.name == "question_generation_agent":
-                    return LlmResponse(
-                        content=types.Content(
-                            role="model",
-                            parts=[
-                                types.Part(
-                                    text=f"{result['question']}\n\nMoeilijkheid: {result['difficulty']}/5\n\nScore: /{result['max_score']}"
-                                )
-                            ],
-                        )
-                    )
-                elif function_response.name == "question_eval_agent":
-                    store_results(
-                        user_id=callback_context.state["user_id"],
-                        session_id=callback_context.state["session_id"],
-                        subject=result["subject"],
-                        chapter=result["chapter"],
-                        question=result["question"],
-                        answer=result["answer"],
-                        student_score=result["score"],
-                        max_score=result["max_score"],
-                        difficulty=result["difficulty"],
+    if not function_response:
+        return None
+    schema = TOOL_OUTPUT_SCHEMAS.get(function_response.name)
+    if schema is None:
+        return None
+    response = function_response.response or {}
+    output = response.get("result", response)
+    result = parse_agent_output(output, schema)
+    if result is None:
+        graded_answer = (
+            parse_agent_output(output, GradedAnswer)
+            if schema is QuestionEvaluation
+            else None
+        )
+        if graded_answer is not None:
+            # The grade is kept even when the rest of the evaluation is invalid.
+            store_graded_answer(callback_context, graded_answer)
+        # Left to the root agent, which costs it an extra turn.
+        logging.warning(f"Output of {function_response.name} doesn't match its schema")
+        return None
+    if isinstance(result, GeneratedQuestion):
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        text=f"{result.question}\n\nMoeilijkheid: {result.difficulty}/5\n\nScore: /{result.max_score}"
                     )
-                    return LlmResponse(
-                        content=types.Content(
-                            role="model",
-                            parts=[
-                                types.Part(
-                                    text=f"{result['feedback']}\n\nMoeilijkheid: {result['difficulty']}/5\n\nScore: {result['score']}/{result['max_score']}\n\n---\n\n***Volgende vraag:***\n\n{result['next_question']['question']}\n\nMoeilijkheid: {result['next_question']['difficulty']}/5\n\nScore: /{result['next_question']['max_score']}"
-                                )
-                            ],
-                        )
+                ],
+            )
+        )
+    if isinstance(result, QuestionEvaluation):
+        store_graded_answer(callback_context, result)
+        # Formatted like the pieces streamed by `EvaluationStreamer`, so the
+        # streamed prefix can be stripped from this answer.
+        text = (
+            format_score_line(result.score, result.max_score, result.difficulty)
+            + result.feedback
+        )
+        if result.provisional_score is not None:
+            text = (
+                format_provisional_line(result.provisional_score, result.max_score)
+                + text
+            )
+        if result.next_question is not None:
+            text += format_next_question(
+                result.next_question.question,
+                result.next_question.difficulty,
+                result.next_question.max_score,
+            )
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[types.Part(text=text)],
+            )
+        )
+    if isinstance(result, ScoreTotals) and result.total_student_score is not None:
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        text=f"Je hebt een score van {result.total_student_score}/{result.total_max_score} ({int(result.total_percentage or 0)}%). Wil je nog een vraag?"
                     )
-                elif function_response.name == "get_bq_data":
-                    if result["total_student_score"] is not None:
-                        return LlmResponse(
-                            content=types.Content(
-                                role="model",
-                                parts=[
-                                    types.Part(
-                                        text=f"Je hebt een score van {result['total_student_score']}/{result['total_max_score']} ({int(result['total_percentage'])}%). Wil je nog een vraag?"
-                                    )
-                                ],
-                            )
-                        )
-                    else:
-                        return LlmResponse(
-                            content=types.Content(
-                                role="model",
-                                parts=[
-                                    types.Part(
-                                        text="U hebt in deze sessie nog geen vragen beantwoord. Wil je een vraag beantwoorden?"
-                                    )
-                                ],
-                            )
-                        )
+                ],
+            )
+        )
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    text="U hebt in deze sessie nog geen vragen beantwoord. Wil je een vraag beantwoorden?"
+                )
+            ],
+        )
+    )
+
+
+async def prefetch_chapter_context(
+    args: dict[str, Any], tool_context: ToolContext
+) -> None:
+    """
+    Retrieves the chunks of the chosen subject and chapter once and pins them in
+    the session state, from where the question generation agent reads them
+    instead of calling the retrieval tool on every turn.
+
+    Each question gets the next window of the pinned chunks. Once every chunk
+    was used, the agent retrieves its context itself again.
+    """
+    from app.tools import student_helper_retrieval
+
+    request = parse_agent_json(args.get("request"))
+    subject, chapter = request.get("subject"), request.get("chapter")
+    if not subject or not chapter:
+        return
+    if get_pinned_context(tool_context.state, subject, chapter) is None:
+        try:
+            contexts = await asyncio.to_thread(
+                student_helper_retrieval.retrieve,
+                f"{subject} {chapter}",
+                subject=subject,
+                chapter=chapter,
+                top_k=CHAPTER_CONTEXT_TOP_K,
+            )
+        except Exception as e:
+            logging.warning(f"Could not prefetch context for {subject}/{chapter}: {e}")
+            return
+        pin_chapter_context(
+            tool_context.state,
+            subject,
+            chapter,
+            [text for _, text in contexts],
+            CHAPTER_CONTEXT_MAX_CHARS,
+        )
+    advance_context_window(tool_context.state, subject, chapter, CHAPTER_CONTEXT_WINDOW)
+
+
+async def load_question_history(
+    args: dict[str, Any], tool_context: ToolContext
+) -> None:
+    """
+    Seeds the question history of the chosen subject and chapter with the
+    questions the student answered in earlier sessions, once per session.
+    """
+    from app.tools import QUESTION_HISTORY_MAX_QUESTIONS
+    from app.utils.result_store import result_store
+
+    request = parse_agent_json(args.get("request"))
+    subject, chapter = request.get("subject"), request.get("chapter")
+    if not subject or not chapter:
+        return
+    if get_question_history(tool_context.state, subject, chapter) is not None:
+        return
+    try:
+        questions = await asyncio.to_thread(
+            result_store.get_asked_questions,
+            user_id=tool_context.state["user_id"],
+            subject=subject,
+            chapter=chapter,
+            limit=QUESTION_HISTORY_MAX_QUESTIONS,
+        )
+    except Exception as e:
+        logging.warning(
+            f"Could not load the question history of {subject}/{chapter}: {e}"
+        )
+        questions = []
+    seed_question_history(tool_context.state, subject, chapter, questions)
+
+
+def attach_rubric(args: dict[str, Any], tool_context: ToolContext) -> None:
+    """
+    Adds the rubric generated with the question to the evaluation request, so
+    the answer is graded against its key points. The root agent only relays the
+    question and correct answer. Both are kept to be stored with the result.
+    """
+    request = parse_agent_json(args.get("request"))
+    rubric_request = with_rubric(tool_context.state, request)
+    if rubric_request is not request:
+        args["request"] = json.dumps(rubric_request, ensure_ascii=False)
+    record_graded_question(tool_context.state, rubric_request)
+
+
+async def before_tool_callback(
+    tool: BaseTool,
+    args: dict[str, Any],
+    tool_context: ToolContext,
+) -> dict | None:
+    if tool.name == "question_eval_agent":
+        attach_rubric(args, tool_context)
+    if tool.name in ("question_generation_agent", "question_eval_agent"):
+        await asyncio.gather(
+            prefetch_chapter_context(args, tool_context),
+            load_question_history(args, tool_context),
+        )
     return None
 
 
-def before_tool_callback(
+def shown_question(tool: BaseTool, tool_response: Any) -> dict[str, Any] | None:
+    """Returns the question a tool result is about to show to the student."""
+    result = parse_agent_json(tool_response)
+    if tool.name == "question_eval_agent":
+        result = result.get("next_question") or {}
+    if (
+        not result.get("question")
+        or not result.get("subject")
+        or not result.get("chapter")
+    ):
+        return None
+    return result
+
+
+def speculate_next_question(tool_context: ToolContext, question: dict) -> None:
+    """
+    Starts generating the candidate next questions for the question that is
+    about to be shown to the student, so one is ready once the answer is graded.
+    """
+    from app.tools import question_speculator
+
+    if question_speculator is None:
+        return
+    try:
+        difficulty = int(question["difficulty"])
+    except (KeyError, TypeError, ValueError):
+        return
+    question_speculator.speculate(
+        tool_context.state.get("session_id"),
+        question["subject"],
+        question["chapter"],
+        question["question"],
+        difficulty,
+    )
+
+
+def after_tool_callback(
     tool: BaseTool,
     args: dict[str, Any],
     tool_context: ToolContext,
+    tool_response: Any,
 ) -> dict | None:
-    # Was added for testing an issue, but didn't happen anymore
-    # if "agent" in tool.name:
-    #     print(tool.name)
-    #     print(args)
+    if tool.name in ("question_generation_agent", "question_eval_agent"):
+        question = shown_question(tool, tool_response)
+        if question is not None:
+            from app.tools import QUESTION_HISTORY_MAX_QUESTIONS
+
+            record_question(
+                tool_context.state,
+                question["subject"],
+                question["chapter"],
+                question["question"],
+                QUESTION_HISTORY_MAX_QUESTIONS,
+            )
+            if question.get("rubric"):
+                record_rubric(
+                    tool_context.state, question["question"], question["rubric"]
+                )
+            speculate_next_question(tool_context, question)
+    return None
+
+
+def question_generation_before_model_callback(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> LlmResponse | None:
+    """
+    Feeds the current window of the pinned chapter context to the question
+    generation agent, leaving retrieval to the agent once it is used up.
+    """
+    request = parse_agent_json(llm_request.contents[0].parts[0].text)
+    subject, chapter = request.get("subject"), request.get("chapter")
+    if not subject or not chapter:
+        return None
+    chunks = get_context_window(callback_context.state, subject, chapter)
+    if not chunks:
+        return None
+    llm_request.append_instructions(
+        [
+            f"The retrieved context for {subject} - {chapter} is given below. "
+            "Base the question on this context; don't call "
+            "`student_helper_retrieval`.",
+            "\n\n---\n\n".join(chunks),
+        ]
+    )
+    remove_function_declaration(llm_request, "student_helper_retrieval")
     return None
@@ -1,13 +1,58 @@
 from google.adk.agents import Agent
+from google.adk.agents.llm_agent import ToolUnion
+from google.adk.models import BaseLlm
+from google.genai import types
 
-from app.instructions import question_eval_agent_instructions
+from app.instructions import (
+    answer_feedback_agent_instructions,
+    question_eval_agent_instructions,
+    question_grading_agent_instructions,
+    question_scoring_agent_instructions,
+)
+from app.utils.typing import AnswerEvaluation, AnswerScore
 
 
-def create_question_eval_agent(llm, tools):
+def create_question_eval_agent(
+    llm: str | BaseLlm, tools: list[ToolUnion], generates_next_question: bool = True
+) -> Agent:
+    # Gemini can't combine function calling with a response schema, so only the
+    # grading agent without tools gets its output enforced by the model.
+    output_schema = None if tools else AnswerEvaluation
     return Agent(
         model=llm,
         name="question_eval_agent",
         description="Evaluates a user's answer to a question based on retrieved knowledge.",
-        instruction=question_eval_agent_instructions,
+        instruction=(
+            question_eval_agent_instructions
+            if generates_next_question
+            else question_grading_agent_instructions
+        ),
         tools=tools,
+        output_schema=output_schema,
+        disallow_transfer_to_parent=output_schema is not None,
+        disallow_transfer_to_peers=output_schema is not None,
+    )
+
+
+def create_question_scoring_agent(llm: str | BaseLlm) -> Agent:
+    # The score only needs a few tokens, so the call is capped to keep it short.
+    return Agent(
+        model=llm,
+        name="question_eval_agent",
+        description="Scores a user's answer to a question without feedback.",
+        instruction=question_scoring_agent_instructions,
+        output_schema=AnswerScore,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+        generate_content_config=types.GenerateContentConfig(max_output_tokens=256),
+    )
+
+
+def create_answer_feedback_agent(llm: str | BaseLlm) -> Agent:
+    return Agent(
+        model=llm,
+        name="answer_feedback_agent",
+        description="Writes feedback for a scored answer.",
+        instruction=answer_feedback_agent_instructions,
+        generate_content_config=types.GenerateContentConfig(max_output_tokens=512),
     )
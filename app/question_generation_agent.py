@@ -1,13 +1,17 @@
 from google.adk.agents import Agent
 
+from app.callbacks import question_generation_before_model_callback
 from app.instructions import question_generation_agent_instructions
 
 
 def create_question_generation_agent(llm, tools):
+    # The retrieval tool rules out a response schema; the output is validated
+    # against `GeneratedQuestion` where it is consumed instead.
     return Agent(
         model=llm,
         name="question_generation_agent",
         description="Agent to generate questions based on subject and chapter.",
         instruction=question_generation_agent_instructions,
         tools=tools,
+        before_model_callback=question_generation_before_model_callback,
     )
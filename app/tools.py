@@ -1,104 +1,271 @@
+import asyncio
 import os
 
-import google
 import vertexai
 from google.adk.tools import ToolContext
 from google.adk.tools.agent_tool import AgentTool
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from vertexai import rag
 
-from app.question_evaluation_agent import create_question_eval_agent
+from app.question_evaluation_agent import (
+    create_answer_feedback_agent,
+    create_question_eval_agent,
+    create_question_scoring_agent,
+)
 from app.question_generation_agent import create_question_generation_agent
-from app.utils.formatting import format_bq_string
+from app.utils.cache import LruTtlCache
+from app.utils.catalog import CorpusCatalog, gcs_generation_version
+from app.utils.corpus import CorpusResolver
+from app.utils.eval_pipeline import (
+    ConcurrentEvalAgentTool,
+    SpeculativeQuestionGenerator,
+)
+from app.utils.evaluation_cache import EvaluationCache
+from app.utils.grading import LocalGrader
+from app.utils.maths_exercises import MATHS_SUBJECTS, MathsExerciseGenerator
+from app.utils.provisional_score import ProvisionalScorer
+from app.utils.question_bank import (
+    QuestionBank,
+    QuestionBankAgentTool,
+    agent_question_generator,
+    first_generated,
+)
+from app.utils.question_bank_store import create_question_bank_store
+from app.utils.question_history import QuestionHistoryAgentTool
+from app.utils.result_store import result_store
+from app.utils.retrieval import CachedVertexAiRagRetrieval
+from app.utils.scores import format_score_result, get_cached_score, seed_score
 
 RAG_LOCATION = "europe-west3"
-LOCATION = "europe-west1"
 LLM = "gemini-2.0-flash-001"
 
-# Initialize Google Cloud and Vertex AI
-credentials, project_id = google.auth.default()
-vertexai.init(project=project_id, location=RAG_LOCATION)
+# The corpus is resolved on first use instead of listing all corpora on import.
+rag_corpus = CorpusResolver(
+    display_name=os.getenv("RAG_CORPUS_NAME", "student-helper-rag-corpus"),
+    location=RAG_LOCATION,
+    cache_path=os.getenv("RAG_CORPUS_CACHE_PATH"),
+    resource_name=os.getenv("RAG_CORPUS_RESOURCE"),
+)
+
 
-rag_corpus_name = os.getenv("RAG_CORPUS_NAME", "student-helper-rag-corpus")
-bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
-bq_table_id = os.getenv("TABLE_ID", "question_answer")
-for corpus in rag.list_corpora():
-    if corpus.display_name == rag_corpus_name:
-        rag_corpus = corpus
+def _list_corpus_files() -> list:
+    # The root agent re-initialises Vertex AI in its own location.
+    vertexai.init(location=RAG_LOCATION)
+    return list(rag.list_files(corpus_name=rag_corpus()))
 
-rag_retrieval_config = rag.RagRetrievalConfig(top_k=5)
 
+retrieval_cache = LruTtlCache(
+    max_bytes=int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+)
 
-rag_resources = [
-    rag.RagResource(
-        rag_corpus=rag_corpus.name,
+if os.getenv("RETRIEVAL_BACKEND", "vertex") == "local":
+    from app.utils.local_index import (
+        LocalIndexRetrieval,
+        LocalVectorIndex,
+        vertex_embedder,
     )
-]
-
-student_helper_retrieval = VertexAiRagRetrieval(
-    name="student_helper_retrieval",
-    description="Tools to retrieve data for subject and chapter to generate questions about",
-    rag_resources=rag_resources,
-    similarity_top_k=5,
-    vector_distance_threshold=0.5,  # use bigger threshold so it's easier to return documents for initial testing
-)
 
+    student_helper_retrieval = LocalIndexRetrieval(
+        name="student_helper_retrieval",
+        description="Tools to retrieve data for subject and chapter to generate questions about",
+        index=LocalVectorIndex(os.getenv("LOCAL_INDEX_DIR", "index")),
+        embed_query=vertex_embedder("RETRIEVAL_QUERY", location=RAG_LOCATION),
+        similarity_top_k=5,
+        vector_distance_threshold=0.5,
+    )
+else:
 
-question_generation_agent_tool = AgentTool(
-    agent=create_question_generation_agent(llm=LLM, tools=[student_helper_retrieval]),
+    def _chapter_files(subject: str, chapter: str | None) -> list[str]:
+        return corpus_catalog.files(subject, chapter)
+
+    student_helper_retrieval = CachedVertexAiRagRetrieval(
+        name="student_helper_retrieval",
+        description="Tools to retrieve data for subject and chapter to generate questions about",
+        corpus_fn=rag_corpus,
+        similarity_top_k=5,
+        vector_distance_threshold=0.5,  # use bigger threshold so it's easier to return documents for initial testing
+        cache=retrieval_cache,
+        location=RAG_LOCATION,
+        scope_fn=_chapter_files,
+    )
+
+corpus_catalog = CorpusCatalog(
+    list_files=_list_corpus_files,
+    ttl=float(os.getenv("CATALOG_TTL", "3600")),
+    version_fn=(
+        gcs_generation_version(os.environ["CATALOG_VERSION_URI"])
+        if os.getenv("CATALOG_VERSION_URI")
+        else None
+    ),
+    on_change=lambda: retrieval_cache.invalidate(rag_corpus()),
 )
-question_eval_agent_tool = AgentTool(
-    agent=create_question_eval_agent(llm=LLM, tools=[question_generation_agent_tool]),
+
+
+question_generation_agent = create_question_generation_agent(
+    llm=LLM, tools=[student_helper_retrieval]
 )
+# Questions of the MATHS_SUBJECTS are equations generated locally, without
+# retrieval or the question generation agent, unless MATHS_EXERCISES is "false".
+maths_exercise_generator = None
+generate_question = agent_question_generator(question_generation_agent)
+if os.getenv("MATHS_EXERCISES", "true") == "true":
+    maths_exercise_generator = MathsExerciseGenerator(
+        subjects=os.getenv("MATHS_SUBJECTS", ",".join(MATHS_SUBJECTS)).split(",")
+    )
+    generate_question = first_generated(
+        maths_exercise_generator.generate, generate_question
+    )
+# Only the last QUESTION_HINT_SIZE asked questions are passed to the question
+# generation agent; near duplicates of the whole history are regenerated. With a
+# QUESTION_BATCH_SIZE above 1, each agent call generates that many questions and
+# the extras are asked in later turns of the session.
+QUESTION_HINT_SIZE = int(os.getenv("QUESTION_HINT_SIZE", "5"))
+QUESTION_DEDUP_THRESHOLD = float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.7"))
+QUESTION_BATCH_SIZE = int(os.getenv("QUESTION_BATCH_SIZE", "1"))
+QUESTION_HISTORY_MAX_QUESTIONS = int(os.getenv("QUESTION_HISTORY_MAX_QUESTIONS", "200"))
+question_bank: QuestionBank | None = None
+question_bank_store = create_question_bank_store()
+if question_bank_store is not None:
+    question_bank = QuestionBank(
+        store=question_bank_store,
+        generate_fn=generate_question,
+        target_size=int(os.getenv("QUESTION_BANK_TARGET_SIZE", "5")),
+    )
+    question_generation_agent_tool = QuestionBankAgentTool(
+        agent=question_generation_agent,
+        bank=question_bank,
+        hint_size=QUESTION_HINT_SIZE,
+        threshold=QUESTION_DEDUP_THRESHOLD,
+        exercise_generator=maths_exercise_generator,
+        batch_size=QUESTION_BATCH_SIZE,
+    )
+else:
+    question_generation_agent_tool = QuestionHistoryAgentTool(
+        agent=question_generation_agent,
+        hint_size=QUESTION_HINT_SIZE,
+        threshold=QUESTION_DEDUP_THRESHOLD,
+        exercise_generator=maths_exercise_generator,
+        batch_size=QUESTION_BATCH_SIZE,
+    )
+
+# "concurrent" grades the answer while the next question is generated,
+# "speculative" generates the candidate next questions while the student is
+# still answering, and "nested" lets the evaluation agent call the question
+# generation agent after grading.
+EVAL_PIPELINE = os.getenv("EVAL_PIPELINE", "concurrent")
+question_speculator = None
+# Exact, numeric and simple symbolic answers are graded without the evaluation
+# agent unless LOCAL_GRADING is "false"; only for the concurrent pipelines.
+local_grader = None
+evaluation_cache = None
+provisional_scorer = None
+if EVAL_PIPELINE == "nested":
+    question_eval_agent_tool = AgentTool(
+        agent=create_question_eval_agent(
+            llm=LLM, tools=[question_generation_agent_tool]
+        ),
+    )
+else:
+    if EVAL_PIPELINE == "speculative":
+        question_speculator = SpeculativeQuestionGenerator(
+            generate_fn=generate_question,
+            max_candidates=int(os.getenv("SPECULATIVE_CANDIDATES", "3")),
+            max_pending=int(os.getenv("SPECULATIVE_MAX_PENDING", "32")),
+        )
+    if os.getenv("LOCAL_GRADING", "true") == "true":
+        local_grader = LocalGrader()
+    # A lexical provisional score is shown while the answer is graded unless
+    # PROVISIONAL_SCORE is "false". From a confidence of
+    # PROVISIONAL_SKIP_THRESHOLD on, calibrated with `make
+    # calibrate-provisional`, it replaces the evaluation agent.
+    if os.getenv("PROVISIONAL_SCORE", "true") == "true":
+        provisional_scorer = ProvisionalScorer(
+            threshold=(
+                float(os.environ["PROVISIONAL_SKIP_THRESHOLD"])
+                if os.getenv("PROVISIONAL_SKIP_THRESHOLD")
+                else None
+            )
+        )
+    # Gradings of short answers are reused for the same answer to the same
+    # question unless EVAL_CACHE is "false", except for the subjects listed in
+    # EVAL_CACHE_DISABLED_SUBJECTS.
+    if os.getenv("EVAL_CACHE", "true") == "true":
+        evaluation_cache = EvaluationCache(
+            cache=LruTtlCache(
+                max_bytes=int(os.getenv("EVAL_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+                ttl=float(os.getenv("EVAL_CACHE_TTL", "86400")),
+            ),
+            disabled_subjects=os.getenv("EVAL_CACHE_DISABLED_SUBJECTS", "").split(","),
+        )
+    # With TWO_STAGE_EVAL "true", a short scoring call returns the score and the
+    # feedback is elaborated separately, within EVAL_FEEDBACK_TIMEOUT seconds.
+    if os.getenv("TWO_STAGE_EVAL", "false") == "true":
+        question_eval_agent_tool = ConcurrentEvalAgentTool(
+            agent=create_question_scoring_agent(llm=LLM),
+            generation_tool=question_generation_agent_tool,
+            speculator=question_speculator,
+            grader=local_grader,
+            cache=evaluation_cache,
+            provisional=provisional_scorer,
+            feedback_agent=create_answer_feedback_agent(llm=LLM),
+            feedback_timeout=float(os.getenv("EVAL_FEEDBACK_TIMEOUT", "3")),
+        )
+    else:
+        question_eval_agent_tool = ConcurrentEvalAgentTool(
+            agent=create_question_eval_agent(
+                llm=LLM, tools=[], generates_next_question=False
+            ),
+            generation_tool=question_generation_agent_tool,
+            speculator=question_speculator,
+            grader=local_grader,
+            cache=evaluation_cache,
+            provisional=provisional_scorer,
+        )
 
 
-def get_bq_data(subject: str, chapter: str, tool_context: ToolContext) -> str:
+async def get_bq_data(subject: str, chapter: str, tool_context: ToolContext) -> str:
     """
     Retrieves the student percentage score for a given user and topic from BigQuery.
 
-    This tool queries a BigQuery table to calculate the average student score
-    based on the provided topic and user ID. It returns the results as a
-    formatted string.
+    The running totals kept in the session state by `store_results` are returned
+    directly. Only a session without totals for this subject and chapter reads
+    the totals from the configured results store (the score rollup table for
+    BigQuery), off the event loop, after which the totals are cached in the
+    state.
 
     Args:
         topic (str): The topic for which to retrieve the average score.
 
     Returns:
-        str:  A string containing the student percentage score, or an error message
-              if the query fails. The results are formatted with each row
-              represented as a dictionary string, separated by newlines.
+        str:  A JSON object containing the student percentage score, or an error
+              message if the query fails.
 
     Raises:
         Exception: If an error occurs during the BigQuery query execution,
                    an error message is returned as a string.
     """
-    from google.cloud import bigquery
-
-    bigquery_client = bigquery.Client(location=LOCATION, project=project_id)
-
-    user_id = tool_context.state["user_id"]
-    session_id = tool_context.state["session_id"]
-
-    sql_query = f"""
-            SELECT
-            SUM(student_score) AS total_student_score,
-            SUM(max_score) AS total_max_score,
-            (SUM(student_score) * 100.0 / SUM(max_score)) AS total_percentage
-            FROM `{project_id}.{bq_dataset_id}.{bq_table_id}`
-            WHERE userId = '{user_id}' AND sessionId = '{session_id}' AND subject = '{format_bq_string(subject)}' AND chapter = '{format_bq_string(chapter)}';
-        """
+    cached = get_cached_score(tool_context.state, subject, chapter)
+    if cached is not None:
+        return format_score_result(**cached)
 
     try:
-        query_job = bigquery_client.query(sql_query)
-
-        results = query_job.result()
-
-        # Format results as a string
-        formatted_results = ""
-        for row in results:
-            formatted_results += str(dict(row.items())) + "\n"
-
-        return formatted_results
+        totals = await asyncio.to_thread(
+            result_store.get_totals,
+            user_id=tool_context.state["user_id"],
+            session_id=tool_context.state["session_id"],
+            subject=subject,
+            chapter=chapter,
+        )
+        seed_score(
+            tool_context.state,
+            subject,
+            chapter,
+            total_student_score=totals["total_student_score"] or 0,
+            total_max_score=totals["total_max_score"] or 0,
+        )
+        return format_score_result(
+            totals["total_student_score"], totals["total_max_score"]
+        )
 
     except Exception as e:
         return f"Error executing BigQuery query: {e}"
@@ -108,30 +275,22 @@ def get_subjects_chapters_available(subject: str, tool_context: ToolContext) ->
     """
     Retrieves the available subjects from the RAG corpus whenever the user asks for the available subjects.
 
+    Subjects and chapters are answered from the cached corpus catalog instead of
+    listing or searching the corpus on every call.
+
     Args:
         subject (str): The subject for which to retrieve the available chapters.
 
     Returns:
-        str: A string containing the available subjects, or an error message
-             if the retrieval fails.
+        str: A string containing the available subjects, or the available chapters
+             if a subject is given.
     """
-
-    vertexai.init(project=project_id, location=RAG_LOCATION)
-    # try:
     if subject is None or subject == "":
-        subjects = set()
-        for document in rag.list_files(corpus_name=rag_corpus.name):
-            print(document)
-            subjects.add(document.gcs_source.uris[0].split("/")[3])
-        return ", ".join(subjects)
-    else:
-        return [
-            context.text
-            for context in rag.retrieval_query(
-                text=f"Welke hoofdstukken zijn er voor {subject}",
-                rag_resources=rag_resources,
-                rag_retrieval_config=rag_retrieval_config,
-            ).contexts.contexts
-        ]
-    # except Exception as e:
-    #     return f"Error retrieving available subjects: {e}"
+        return ", ".join(corpus_catalog.subjects())
+    chapters = corpus_catalog.chapters(subject)
+    if not chapters:
+        return (
+            f"Geen hoofdstukken gevonden voor {subject}. Beschikbare vakken: "
+            + ", ".join(corpus_catalog.subjects())
+        )
+    return f"Hoofdstukken voor {subject}: " + ", ".join(chapters)
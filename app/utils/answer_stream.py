@@ -0,0 +1,274 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from app.utils.incremental_json import IncrementalJsonParser
+
+
+def format_score_line(score: int, max_score: int, difficulty: int) -> str:
+    """Formats the score line that opens the answer to an evaluated answer."""
+    return f"Score: {score}/{max_score}\n\nMoeilijkheid: {difficulty}/5\n\n"
+
+
+def format_provisional_line(score: int, max_score: int) -> str:
+    """Formats the provisional score shown while the answer is being graded."""
+    return f"Voorlopige score: {score}/{max_score}\n\n"
+
+
+def format_next_question(question: str, difficulty: int, max_score: int) -> str:
+    """Formats the next question appended to the answer to an evaluated answer."""
+    return (
+        f"\n\n---\n\n***Volgende vraag:***\n\n{question}\n\n"
+        f"Moeilijkheid: {difficulty}/5\n\nScore: /{max_score}"
+    )
+
+
+def _texts(event: dict[str, Any]) -> list[str] | None:
+    # The texts of an event that only holds text parts, or None.
+    parts = (event.get("content") or {}).get("parts") or []
+    if not parts or any(set(part) - {"text"} for part in parts):
+        return None
+    return [part.get("text") or "" for part in parts]
+
+
+def _calls(event: dict[str, Any]) -> list[str]:
+    parts = (event.get("content") or {}).get("parts") or []
+    return [
+        part["function_call"].get("name", "")
+        for part in parts
+        if part.get("function_call")
+    ]
+
+
+class AnswerStream:
+    """Text of the answer of one query that is streamed ahead of the final answer."""
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+
+    def put(self, text: str) -> None:
+        """Streams the next piece of the answer to the student."""
+        if text:
+            self._queue.put(("text", text))
+
+
+class AnswerStreams:
+    """
+    Merges the text the tools stream ahead of the root agent's answer into the
+    events of a query, and tracks the time to the first token of the answer.
+
+    Tools look up the stream of their session with `get`. The final answer of
+    the root agent repeats the streamed text, which is stripped from the event
+    sent to the client but kept in the session.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._streams: dict[Any, AnswerStream] = {}
+        self._stats: dict[str, float] = {
+            "turns": 0,
+            "answer_turns": 0,
+            "streamed_answers": 0,
+            "ttft_ms_total": 0.0,
+            "answer_ttft_ms_total": 0.0,
+            "answer_ttft_ms_max": 0.0,
+        }
+
+    def get(self, session_id: Any) -> AnswerStream | None:
+        """Returns the stream of the query running in a session, if any."""
+        with self._lock:
+            return self._streams.get(session_id)
+
+    def stats(self) -> dict[str, float]:
+        """Returns the mean time to the first token of all and of answer turns."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["ttft_ms_mean"] = (
+            stats.pop("ttft_ms_total") / stats["turns"] if stats["turns"] else 0.0
+        )
+        stats["answer_ttft_ms_mean"] = (
+            stats.pop("answer_ttft_ms_total") / stats["answer_turns"]
+            if stats["answer_turns"]
+            else 0.0
+        )
+        return stats
+
+    def stream(
+        self,
+        session_id: Any,
+        events: Iterable[dict[str, Any]],
+        author: str,
+        answer_tools: Iterable[str] = ("question_eval_agent",),
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Yields the events of a query together with the text streamed by its
+        tools, as partial events of `author`.
+
+        :param session_id: Session the query runs in
+        :param events: Events of the query, as dicts
+        :param author: Name of the root agent
+        :param answer_tools: Tools whose call makes the query an answer turn
+        """
+        stream = AnswerStream()
+        answer_tools = set(answer_tools)
+        with self._lock:
+            self._streams[session_id] = stream
+        start = time.perf_counter()
+        first_token_ms = None
+        answer_turn = streamed_answer = False
+        streamed = ""
+
+        def pump() -> None:
+            try:
+                for event in events:
+                    stream._queue.put(("event", event))
+            except BaseException as e:
+                stream._queue.put(("error", e))
+            else:
+                stream._queue.put(("done", None))
+
+        threading.Thread(target=pump, name="answer-stream", daemon=True).start()
+        try:
+            while True:
+                kind, item = stream._queue.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise item
+                if kind == "text":
+                    streamed += item
+                    streamed_answer = True
+                    event = {
+                        "author": author,
+                        "content": {"role": "model", "parts": [{"text": item}]},
+                        "partial": True,
+                    }
+                else:
+                    event = item
+                    answer_turn = answer_turn or bool(answer_tools & set(_calls(event)))
+                    texts = _texts(event)
+                    if streamed and texts is not None and not event.get("partial"):
+                        event = self._strip(event, "".join(texts), streamed)
+                        streamed = ""
+                if first_token_ms is None and any(_texts(event) or ()):
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                yield event
+        finally:
+            with self._lock:
+                if self._streams.get(session_id) is stream:
+                    del self._streams[session_id]
+                self._record(first_token_ms, answer_turn, streamed_answer)
+
+    @staticmethod
+    def _strip(event: dict[str, Any], text: str, streamed: str) -> dict[str, Any]:
+        if not text.startswith(streamed):
+            logging.warning("The final answer doesn't repeat the streamed answer")
+            return event
+        content = {**event["content"], "parts": [{"text": text[len(streamed) :]}]}
+        return {**event, "content": content}
+
+    def _record(
+        self, first_token_ms: float | None, answer_turn: bool, streamed: bool
+    ) -> None:
+        # Must be called with the lock held.
+        if first_token_ms is None:
+            return
+        self._stats["turns"] += 1
+        self._stats["ttft_ms_total"] += first_token_ms
+        if answer_turn:
+            self._stats["answer_turns"] += 1
+            self._stats["streamed_answers"] += streamed
+            self._stats["answer_ttft_ms_total"] += first_token_ms
+            self._stats["answer_ttft_ms_max"] = max(
+                self._stats["answer_ttft_ms_max"], first_token_ms
+            )
+
+
+class EvaluationStreamer:
+    """
+    Streams an evaluation to the student as it is produced: the provisional
+    score, if any, the score line as soon as `score`, `difficulty` and
+    `max_score` are parsed, then the feedback
+    as it is generated, and the next question once it is ready. The pieces are
+    formatted like the final answer of `before_model_callback`.
+    """
+
+    def __init__(self, stream: AnswerStream) -> None:
+        """
+        :param stream: Stream of the answer of the query
+        """
+        self.stream = stream
+        self._parser = IncrementalJsonParser()
+        self._values: dict[str, Any] = {}
+        self._feedback = ""
+        self._feedback_sent = 0
+        self._score_sent = False
+        self._provisional_sent = False
+
+    def feed(self, chunk: str) -> None:
+        """Parses the next chunk of the evaluation agent's JSON answer."""
+        for kind, key, value in self._parser.feed(chunk):
+            if kind == "value":
+                self._values[key] = value
+            elif key == "feedback":
+                self._feedback += value
+        self._flush()
+
+    def provisional(self, score: int, max_score: int) -> None:
+        """Streams the provisional score ahead of the graded score."""
+        if not self._score_sent and not self._provisional_sent:
+            self.stream.put(format_provisional_line(score, max_score))
+            self._provisional_sent = True
+
+    def score(self, evaluation: dict[str, Any]) -> None:
+        """Streams the score line of an evaluation whose feedback comes later."""
+        if not self._score_sent:
+            self._values = {**self._values, **evaluation}
+        self._flush()
+
+    def evaluation(self, evaluation: dict[str, Any]) -> None:
+        """Streams what hasn't been streamed yet of the complete evaluation."""
+        if not self._score_sent:
+            self._values = {**self._values, **evaluation}
+        feedback = str(evaluation.get("feedback") or "")
+        if feedback.startswith(self._feedback):
+            self._feedback = feedback
+        self._flush()
+
+    def next_question(self, question: dict[str, Any]) -> None:
+        """
+        Streams the next question after the evaluation, unless its difficulty
+        or max score is missing; the final answer then shows it.
+        """
+        if not self._score_sent or not question.get("question"):
+            return
+        try:
+            difficulty, max_score = (
+                int(question[key]) for key in ("difficulty", "max_score")
+            )
+        except (KeyError, TypeError, ValueError):
+            return
+        self.stream.put(
+            format_next_question(str(question["question"]), difficulty, max_score)
+        )
+
+    def _flush(self) -> None:
+        if not self._score_sent:
+            try:
+                score, difficulty, max_score = (
+                    int(self._values[key])
+                    for key in ("score", "difficulty", "max_score")
+                )
+            except (KeyError, TypeError, ValueError):
+                return
+            self.stream.put(format_score_line(score, max_score, difficulty))
+            self._score_sent = True
+        if len(self._feedback) > self._feedback_sent:
+            self.stream.put(self._feedback[self._feedback_sent :])
+            self._feedback_sent = len(self._feedback)
+
+
+answer_streams = AnswerStreams()
@@ -0,0 +1,100 @@
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import google.auth
+from google.cloud import bigquery
+
+
+class BigQueryClientPool:
+    """
+    Thread-safe registry of BigQuery clients shared by the tools and callbacks.
+
+    Clients are built lazily on first use and keyed by (project, location), so the
+    credentials lookup and client construction happen once per process instead of
+    once per quiz turn. Table metadata (which carries the schema `insert_rows`
+    needs) is cached per table id for the same reason.
+    """
+
+    def __init__(self, client_factory: Callable[..., Any] | None = None) -> None:
+        """
+        :param client_factory: Callable building a client from `project` and
+            `location` keyword arguments, defaults to `bigquery.Client`
+        """
+        self._client_factory = client_factory or bigquery.Client
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[str, str], Any] = {}
+        self._tables: dict[str, Any] = {}
+        self._default_project: str | None = None
+
+    def default_project(self) -> str:
+        """Returns the project of the application default credentials."""
+        if self._default_project is None:
+            with self._lock:
+                if self._default_project is None:
+                    _, project = google.auth.default()
+                    if project is None:
+                        raise RuntimeError(
+                            "The application default credentials have no project"
+                        )
+                    self._default_project = project
+        return self._default_project
+
+    def get_client(self, location: str, project: str | None = None) -> Any:
+        """Returns the shared client for a project and location, building it once."""
+        key = (project or self.default_project(), location)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._client_factory(project=key[0], location=location)
+                    self._clients[key] = client
+        return client
+
+    def get_table(
+        self, table_id: str, location: str, project: str | None = None
+    ) -> Any:
+        """Returns the cached table (and therefore its schema) for a table id."""
+        table = self._tables.get(table_id)
+        if table is None:
+            table = self.get_client(location, project).get_table(table_id)
+            with self._lock:
+                table = self._tables.setdefault(table_id, table)
+        return table
+
+    def invalidate_table(self, table_id: str) -> None:
+        """Drops a cached table, e.g. after its schema changed."""
+        with self._lock:
+            self._tables.pop(table_id, None)
+
+    def check_health(self, location: str, project: str | None = None) -> bool:
+        """
+        Runs a trivial query on the pooled client.
+
+        An unhealthy client is evicted so that the next call builds a fresh one.
+        """
+        key = (project or self.default_project(), location)
+        try:
+            self.get_client(location, key[0]).query("SELECT 1").result()
+            return True
+        except Exception as e:
+            logging.warning(f"BigQuery client {key} failed health check: {e}")
+            with self._lock:
+                self._clients.pop(key, None)
+            return False
+
+    def reset(self) -> None:
+        """Closes and forgets every pooled client and cached table."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._tables.clear()
+        for client in clients:
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+
+
+bq_client_pool = BigQueryClientPool()
@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimates the memory held by a (nested) JSON-like value in bytes."""
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, list | tuple | set | frozenset):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LruTtlCache:
+    """
+    Thread-safe least-recently-used cache whose entries expire after `ttl`
+    seconds.
+
+    The cache is bounded by the estimated memory of its entries rather than by
+    their count. Entries can carry tags (e.g. the corpus they were derived from)
+    so that everything derived from a source can be invalidated at once.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        size_fn: Callable[[Any], int] = estimate_size,
+    ) -> None:
+        """
+        :param max_bytes: Upper bound of the estimated size of all entries
+        :param ttl: Seconds an entry stays valid
+        :param size_fn: Callable estimating the size of a value in bytes
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_fn = size_fn
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, tags, value)
+        self._entries: OrderedDict[Hashable, tuple[float, int, frozenset, Any]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable) -> Any | None:
+        """Returns the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[3]
+
+    def put(self, key: Hashable, value: Any, tags: Iterable[str] = ()) -> None:
+        """Caches a value, evicting the least recently used entries if needed."""
+        size = self.size_fn(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (
+                time.monotonic() + self.ttl,
+                size,
+                frozenset(tags),
+                value,
+            )
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, tag: str | None = None) -> int:
+        """Drops all entries carrying `tag`, or every entry without a tag."""
+        with self._lock:
+            keys = [
+                key
+                for key, entry in self._entries.items()
+                if tag is None or tag in entry[2]
+            ]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def stats(self) -> dict[str, Any]:
+        """Returns hit/miss counters, the hit ratio and the current size."""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["size_bytes"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _, _ = self._entries.pop(key)
+        self._size -= size
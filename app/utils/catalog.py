@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from typing import Any
+
+from app.utils.formatting import format_bq_string
+
+CATALOG_VERSION_BLOB = "_catalog/version"
+
+
+def parse_corpus_path(uri: str) -> tuple[str, str] | None:
+    """
+    Derives (subject, chapter) from the GCS path of a corpus file.
+
+    Files are stored as `gs://<bucket>/<subject>/<chapter>/<file>`. A file placed
+    directly under its subject folder is its own chapter, named after the file.
+    """
+    parts = uri.split("/")
+    if len(parts) < 5 or not parts[3]:
+        return None
+    if len(parts) > 5:
+        return parts[3], parts[4]
+    return parts[3], os.path.splitext(parts[4])[0]
+
+
+class CorpusCatalog:
+    """
+    Index of subject -> chapters -> RAG files, derived from the corpus file paths.
+
+    The index is built once and kept for `ttl` seconds. When `version_fn` is given
+    it is polled at most every `version_check_interval` seconds and a changed
+    version (bumped by the ingestion function after importing files) invalidates
+    the index early and calls `on_change`, e.g. to drop retrieval caches.
+    """
+
+    def __init__(
+        self,
+        list_files: Callable[[], Iterable[Any]],
+        ttl: float = 3600.0,
+        version_fn: Callable[[], Any] | None = None,
+        version_check_interval: float = 60.0,
+        on_change: Callable[[], object] | None = None,
+    ) -> None:
+        """
+        :param list_files: Callable returning the `RagFile`s of the corpus
+        :param ttl: Seconds before the index is rebuilt regardless of the version
+        :param version_fn: Optional callable returning the current corpus version
+        :param version_check_interval: Seconds between two `version_fn` calls
+        :param on_change: Optional callable invoked when the version changed
+        """
+        self.list_files = list_files
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index: dict[str, dict[str, Any]] | None = None
+        self._built_at = 0.0
+        self._version: Any = None
+        self._version_checked_at = 0.0
+
+    def invalidate(self) -> None:
+        """Forces a rebuild on the next lookup."""
+        with self._lock:
+            self._index = None
+
+    def subjects(self) -> list[str]:
+        """Returns the display names of all subjects."""
+        return sorted(entry["name"] for entry in self._get_index().values())
+
+    def chapters(self, subject: str) -> list[str]:
+        """Returns the chapters of a subject, empty for an unknown subject."""
+        entry = self._get_index().get(format_bq_string(subject))
+        if entry is None:
+            return []
+        return sorted(chapter["name"] for chapter in entry["chapters"].values())
+
+    def files(self, subject: str, chapter: str | None = None) -> list[str]:
+        """Returns the RAG file resource names of a subject or one of its chapters."""
+        entry = self._get_index().get(format_bq_string(subject))
+        if entry is None:
+            return []
+        chapters = entry["chapters"]
+        if chapter is not None:
+            selected = chapters.get(format_bq_string(chapter))
+            return list(selected["files"]) if selected else []
+        return [name for chapter in chapters.values() for name in chapter["files"]]
+
+    def _get_index(self) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            index = self._index
+            if index is not None and now - self._built_at > self.ttl:
+                index = None
+            check_version = (
+                index is not None
+                and self.version_fn is not None
+                and now - self._version_checked_at > self.version_check_interval
+            )
+            if check_version:
+                # Claimed under the lock, so one caller polls per interval.
+                self._version_checked_at = now
+            known_version = self._version
+        # The version and the files are read without holding the lock, so other
+        # lookups are served from the current index in the meantime.
+        if index is not None and check_version:
+            if self._current_version() == known_version:
+                return index
+            if self.on_change is not None:
+                self.on_change()
+            index = None
+        if index is not None:
+            return index
+        with self._build_lock:
+            with self._lock:
+                # Rebuilt by another caller while this one waited.
+                if self._index is not None and self._built_at >= now:
+                    return self._index
+            version = self._current_version()
+            index = self._build()
+            with self._lock:
+                self._index = index
+                self._version = version
+                self._built_at = self._version_checked_at = time.monotonic()
+            return index
+
+    def _current_version(self) -> Any:
+        try:
+            return self.version_fn() if self.version_fn else None
+        except Exception as e:
+            logging.warning(f"Could not read the corpus catalog version: {e}")
+            return self._version
+
+    def _build(self) -> dict[str, dict[str, Any]]:
+        index: dict[str, dict[str, Any]] = {}
+        for rag_file in self.list_files():
+            for uri in rag_file.gcs_source.uris:
+                parsed = parse_corpus_path(uri)
+                if parsed is None:
+                    continue
+                subject, chapter = parsed
+                entry = index.setdefault(
+                    format_bq_string(subject), {"name": subject, "chapters": {}}
+                )
+                chapter_entry = entry["chapters"].setdefault(
+                    format_bq_string(chapter), {"name": chapter, "files": []}
+                )
+                chapter_entry["files"].append(rag_file.name)
+        logging.info(f"Built corpus catalog with {len(index)} subjects")
+        return index
+
+
+def gcs_generation_version(uri: str) -> Callable[[], int | None]:
+    """
+    Returns a version function reading the generation of a GCS marker object,
+    which the ingestion function rewrites after every import. The storage client
+    is built on the first version check, so the credentials lookup doesn't run
+    on import.
+    """
+    from google.cloud import storage
+
+    bucket_name, blob_name = uri.removeprefix("gs://").split("/", 1)
+
+    @lru_cache(maxsize=1)
+    def bucket() -> storage.Bucket:
+        return storage.Client().bucket(bucket_name)
+
+    def version() -> int | None:
+        blob = bucket().get_blob(blob_name)
+        return blob.generation if blob else None
+
+    return version
@@ -0,0 +1,94 @@
+from typing import Any
+
+from google.adk.models.llm_request import LlmRequest
+
+from app.utils.formatting import format_bq_string
+from app.utils.session_state import set_state_entry
+
+CHAPTER_CONTEXT_KEY = "chapter_context"
+
+
+def _chapter_key(subject: str, chapter: str) -> str:
+    return f"{format_bq_string(subject)}/{format_bq_string(chapter)}"
+
+
+def _get_pinned(state: Any, subject: str, chapter: str) -> dict[str, Any] | None:
+    pinned = state.get(CHAPTER_CONTEXT_KEY)
+    if not pinned or pinned["key"] != _chapter_key(subject, chapter):
+        return None
+    return pinned
+
+
+def get_pinned_context(state: Any, subject: str, chapter: str) -> list[str] | None:
+    """Returns all chunks pinned for a subject and chapter, if any."""
+    pinned = _get_pinned(state, subject, chapter)
+    return pinned["chunks"] if pinned else None
+
+
+def get_context_window(state: Any, subject: str, chapter: str) -> list[str]:
+    """
+    Returns the pinned chunks the next question is generated from, empty once
+    every pinned chunk was used.
+    """
+    pinned = _get_pinned(state, subject, chapter)
+    if pinned is None:
+        return []
+    start, end = pinned.get("window", (0, 0))
+    return pinned["chunks"][start:end]
+
+
+def advance_context_window(state: Any, subject: str, chapter: str, size: int) -> None:
+    """
+    Moves the context window on to the next `size` pinned chunks, so
+    consecutive questions are generated from different parts of the chapter.
+    """
+    pinned = _get_pinned(state, subject, chapter)
+    if pinned is None:
+        return
+    start = pinned.get("window", (0, 0))[1]
+    end = min(start + size, len(pinned["chunks"]))
+    set_state_entry(state, CHAPTER_CONTEXT_KEY, "window", [start, end])
+
+
+def pin_chapter_context(
+    state: Any, subject: str, chapter: str, chunks: list[str], max_chars: int
+) -> None:
+    """
+    Pins the chunks of the chosen chapter in the session state, keeping whole
+    chunks in retrieval order up to `max_chars` characters. Only the current
+    chapter is pinned, so the state doesn't grow over a session.
+    """
+    pinned: list[str] = []
+    size = 0
+    for chunk in chunks:
+        if size + len(chunk) > max_chars:
+            break
+        pinned.append(chunk)
+        size += len(chunk)
+    state[CHAPTER_CONTEXT_KEY] = {
+        "key": _chapter_key(subject, chapter),
+        "subject": subject,
+        "chapter": chapter,
+        "chunks": pinned,
+        "window": [0, 0],
+    }
+
+
+def remove_function_declaration(llm_request: LlmRequest, name: str) -> None:
+    """Hides a tool from the model for this request."""
+    if not llm_request.config or not llm_request.config.tools:
+        return
+    for tool in llm_request.config.tools:
+        if tool.function_declarations:
+            tool.function_declarations = [
+                declaration
+                for declaration in tool.function_declarations
+                if declaration.name != name
+            ]
+    tools = [
+        tool
+        for tool in llm_request.config.tools
+        if tool.function_declarations
+        or tool.model_dump(exclude_none=True, exclude={"function_declarations"})
+    ]
+    llm_request.config.tools = tools or None
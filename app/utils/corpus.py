@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import threading
+
+import vertexai
+from vertexai import rag
+
+
+class CorpusResolver:
+    """
+    Resolves the resource name of a RAG corpus from its display name on first use.
+
+    The resolved name is kept in memory and, when `cache_path` is given, in a
+    small JSON file shared by workers and restarts, so `rag.list_corpora` is
+    only enumerated once per deployment instead of on every import.
+    """
+
+    def __init__(
+        self,
+        display_name: str,
+        location: str,
+        project: str | None = None,
+        cache_path: str | None = None,
+        resource_name: str | None = None,
+    ) -> None:
+        """
+        :param display_name: Display name of the corpus
+        :param location: Location of the corpus
+        :param project: Project of the corpus, defaults to the initialised project
+        :param cache_path: Optional JSON file persisting resolved names
+        :param resource_name: Known resource name, skips the resolution entirely
+        """
+        self.display_name = display_name
+        self.location = location
+        self.project = project
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._resource_name = resource_name
+
+    def __call__(self) -> str:
+        """Returns the resource name of the corpus."""
+        if self._resource_name is not None:
+            return self._resource_name
+        with self._lock:
+            if self._resource_name is None:
+                self._resource_name = self._read_cache() or self._resolve()
+            return self._resource_name
+
+    def invalidate(self) -> None:
+        """Forgets the resolved name, e.g. after the corpus was recreated."""
+        with self._lock:
+            self._resource_name = None
+            if self.cache_path and os.path.exists(self.cache_path):
+                cached = self._load_cache_file(self.cache_path)
+                cached.pop(self._cache_key(), None)
+                self._write_cache_file(self.cache_path, cached)
+
+    def _cache_key(self) -> str:
+        return f"{self.project or ''}/{self.location}/{self.display_name}"
+
+    def _resolve(self) -> str:
+        vertexai.init(project=self.project, location=self.location)
+        for corpus in rag.list_corpora():
+            if corpus.display_name == self.display_name:
+                logging.info(f"Resolved RAG corpus {self.display_name}: {corpus.name}")
+                if self.cache_path:
+                    cached = self._load_cache_file(self.cache_path)
+                    cached[self._cache_key()] = corpus.name
+                    self._write_cache_file(self.cache_path, cached)
+                return corpus.name
+        raise LookupError(f"RAG corpus {self.display_name} not found")
+
+    def _read_cache(self) -> str | None:
+        if not self.cache_path:
+            return None
+        return self._load_cache_file(self.cache_path).get(self._cache_key())
+
+    def _load_cache_file(self, path: str) -> dict[str, str]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache_file(self, path: str, cached: dict[str, str]) -> None:
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not persist the resolved RAG corpus: {e}")
@@ -0,0 +1,570 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import BaseTool, ToolContext
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+
+from app.utils.answer_stream import EvaluationStreamer, answer_streams
+from app.utils.evaluation_cache import EvaluationCache
+from app.utils.formatting import (
+    format_agent_json,
+    parse_agent_json,
+    parse_agent_output,
+)
+from app.utils.grading import LocalGrader, short_feedback
+from app.utils.provisional_score import ProvisionalScorer
+from app.utils.question_bank import GenerateFn
+from app.utils.question_history import QuestionHistoryAgentTool, get_question_history
+from app.utils.typing import GeneratedQuestion
+
+# Offsets of the next difficulty, in the order they are speculated on before
+# any usage has been observed.
+_OFFSETS = (0, 1, -1)
+
+
+def next_difficulty(score: int, max_score: int, difficulty: int) -> int:
+    """
+    Applies the difficulty rule of the exercise flow: above 80% of the max score
+    goes one level up, below 50% one level down, within 1-5.
+    """
+    if max_score and score > 0.8 * max_score:
+        return min(difficulty + 1, 5)
+    if max_score and score < 0.5 * max_score:
+        return max(difficulty - 1, 1)
+    return difficulty
+
+
+class SpeculativeQuestionGenerator:
+    """
+    Generates the candidate next questions of a session while the student is
+    still answering the current one.
+
+    The next difficulty only depends on the score, so it is one of d-1, d or
+    d+1. Up to `max_candidates` of them are generated in the background, the
+    offsets the scores asked for most often first, and the candidate matching the
+    score is served once the answer is graded. The other candidates are wasted.
+    """
+
+    def __init__(
+        self,
+        generate_fn: GenerateFn,
+        max_candidates: int = 3,
+        max_pending: int = 32,
+        max_sessions: int = 1000,
+    ) -> None:
+        """
+        :param generate_fn: Callable generating one question for a subject,
+            chapter and difficulty, returning None when it couldn't
+        :param max_candidates: Candidates generated per question (1-3), which
+            caps the wasted generations to `max_candidates - 1` per question
+        :param max_pending: Generations that may be queued or running at once;
+            speculation is skipped beyond it
+        :param max_sessions: Sessions whose candidates are kept
+        """
+        self.generate_fn = generate_fn
+        self.max_candidates = max(1, min(max_candidates, len(_OFFSETS)))
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(_OFFSETS), thread_name_prefix="question-speculation"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._sessions: OrderedDict[Any, tuple[str, dict[int, Future]]] = OrderedDict()
+        # Offsets the score asked for and offsets served from a candidate.
+        self._needed: Counter[int] = Counter()
+        self._used: Counter[int] = Counter()
+        self._stats = {
+            "speculations": 0,
+            "speculations_skipped": 0,
+            "candidates_generated": 0,
+            "candidates_failed": 0,
+            "candidates_wasted": 0,
+            "misses": 0,
+        }
+
+    def speculate(
+        self,
+        session_id: Any,
+        subject: str,
+        chapter: str,
+        question: str,
+        difficulty: int,
+    ) -> None:
+        """
+        Starts generating the candidate next questions for the question the
+        session was just asked, replacing the session's earlier candidates.
+        """
+        with self._lock:
+            offsets = sorted(_OFFSETS, key=lambda o: -self._needed[o])
+            difficulties = [
+                difficulty + offset
+                for offset in offsets
+                if 1 <= difficulty + offset <= 5
+            ][: self.max_candidates]
+            if self._pending + len(difficulties) > self.max_pending:
+                self._stats["speculations_skipped"] += 1
+                return
+            self._pending += len(difficulties)
+            self._stats["speculations"] += 1
+        candidates = {
+            d: self._executor.submit(self._generate, subject, chapter, d)
+            for d in difficulties
+        }
+        with self._lock:
+            self._discard(self._sessions.pop(session_id, None))
+            self._sessions[session_id] = (question, candidates)
+            while len(self._sessions) > self.max_sessions:
+                self._discard(self._sessions.popitem(last=False)[1])
+
+    def claim(self, session_id: Any, question: str) -> dict[int, Future] | None:
+        """
+        Removes and returns the candidates speculated for `question`, keyed by
+        difficulty, or None when there are none.
+        """
+        with self._lock:
+            speculation = self._sessions.get(session_id)
+            if speculation is None or speculation[0] != question:
+                return None
+            del self._sessions[session_id]
+            return speculation[1]
+
+    async def take(
+        self,
+        candidates: dict[int, Future],
+        difficulty: int,
+        next_difficulty: int,
+        exclude: Iterable[str] = (),
+    ) -> dict[str, Any] | None:
+        """
+        Returns the candidate at `next_difficulty`, waiting for it if it is
+        still being generated, and counts the other candidates as wasted.
+        """
+        future = candidates.pop(next_difficulty, None)
+        with self._lock:
+            self._discard(candidates)
+        question = None
+        if future is not None:
+            try:
+                question = await asyncio.wrap_future(future)
+            except Exception as e:
+                logging.warning(f"Speculative question generation failed: {e}")
+        if question is not None and question["question"] in set(exclude):
+            question = None
+        with self._lock:
+            self._needed[next_difficulty - difficulty] += 1
+            if question is None:
+                self._stats["misses"] += 1
+            else:
+                self._used[next_difficulty - difficulty] += 1
+        return question
+
+    def stats(self) -> dict[str, float]:
+        """Returns how often each candidate was used and how many were wasted."""
+        with self._lock:
+            stats: dict[str, float] = dict(self._stats)
+            stats["used_down"] = self._used[-1]
+            stats["used_same"] = self._used[0]
+            stats["used_up"] = self._used[1]
+            stats["pending"] = self._pending
+        used = stats["used_down"] + stats["used_same"] + stats["used_up"]
+        run = stats["candidates_generated"] + stats["candidates_failed"]
+        stats["use_rate"] = used / run if run else 0.0
+        stats["waste_rate"] = stats["candidates_wasted"] / run if run else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Cancels the queued candidates and waits for the running ones."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _generate(self, subject: str, chapter: str, difficulty: int) -> dict | None:
+        try:
+            question = self.generate_fn(subject, chapter, difficulty)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._stats[
+                "candidates_generated" if question else "candidates_failed"
+            ] += 1
+        return question
+
+    def _discard(
+        self, speculation: tuple[str, dict[int, Future]] | dict[int, Future] | None
+    ) -> None:
+        # Must be called with the lock held. Candidates that already started
+        # can't be cancelled any more and are counted as wasted.
+        if isinstance(speculation, tuple):
+            speculation = speculation[1]
+        for future in (speculation or {}).values():
+            if not future.cancel():
+                self._stats["candidates_wasted"] += 1
+            else:
+                self._pending -= 1
+
+
+class ConcurrentEvalAgentTool(AgentTool):
+    """
+    `AgentTool` for an evaluation agent without the nested question generation
+    tool. Grading and the generation of the next question start together, and
+    the next question is merged into the evaluation as `next_question`, so the
+    result has the same shape as the nested evaluation agent's.
+
+    The next question is generated at the difficulty of the graded question.
+    When the score moves the difficulty up or down, that generation is
+    cancelled and the next question is generated at the new difficulty.
+
+    With a `speculator`, the candidates it generated while the student was
+    answering are used instead, and only a missing candidate is generated after
+    grading. With a `grader`, answers it can decide aren't sent to the
+    evaluation agent at all, and with a `cache`, neither are answers the agent
+    already graded for the same question.
+
+    With a `provisional` scorer, the lexical provisional score of the answer is
+    streamed while the evaluation agent grades it, and answers it is confident
+    enough about aren't sent to the agent.
+
+    When the query streams its answer (see `AnswerStreams`), the evaluation
+    agent's answer is streamed and the score line, feedback and next question
+    are sent to the student as soon as each is known.
+
+    With a `feedback_agent`, evaluation takes two stages: `agent` only scores
+    the answer in a short call, and the feedback is elaborated in a second call
+    while the next question is generated. The score is available, and streamed,
+    as soon as the first call returns. Full scores get no second call, and
+    feedback that isn't ready `feedback_timeout` seconds after the score falls
+    back to a one-line feedback with the correct answer.
+    """
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        generation_tool: BaseTool,
+        speculator: SpeculativeQuestionGenerator | None = None,
+        grader: LocalGrader | None = None,
+        feedback_agent: BaseAgent | None = None,
+        feedback_timeout: float = 3.0,
+        cache: EvaluationCache | None = None,
+        provisional: ProvisionalScorer | None = None,
+    ) -> None:
+        """
+        :param agent: Evaluation agent that only grades the answer
+        :param generation_tool: Tool running the question generation agent
+        :param speculator: Optional generator of the candidate next questions,
+            which are then used instead of generating during grading
+        :param grader: Optional grader of exact, numeric and symbolic answers,
+            which skips the evaluation agent for the answers it can decide
+        :param feedback_agent: Optional agent elaborating the feedback, which
+            makes `agent` a scoring agent that only returns the score
+        :param feedback_timeout: Seconds after scoring that the elaborated
+            feedback is waited for before it is cancelled
+        :param cache: Optional cache of the evaluation agent's gradings, which
+            are reused for the same answer to the same question
+        :param provisional: Optional scorer of the provisional score shown
+            while grading, which grades the answers it is confident about
+        """
+        super().__init__(agent=agent)
+        self.generation_tool = generation_tool
+        self.speculator = speculator
+        self.grader = grader
+        self.feedback_tool = (
+            AgentTool(agent=feedback_agent) if feedback_agent is not None else None
+        )
+        self.feedback_timeout = feedback_timeout
+        self.cache = cache
+        self.provisional = provisional
+        self._lock = threading.Lock()
+        self._stats = {
+            "evaluations": 0,
+            "next_questions_reused": 0,
+            "next_questions_speculated": 0,
+            "regenerations": 0,
+            "feedback_elaborated": 0,
+            "feedback_cancelled": 0,
+        }
+
+    def stats(self) -> dict[str, int]:
+        """Returns how often the concurrently generated question could be used."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _increment(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    async def _generate(
+        self,
+        request: dict[str, Any],
+        difficulty: int,
+        tool_context: ToolContext,
+    ) -> dict[str, Any] | None:
+        previous_questions = list(request.get("previous_questions") or [])
+        if request.get("question"):
+            previous_questions.append(request["question"])
+        result = await self.generation_tool.run_async(
+            args={
+                "request": json.dumps(
+                    {
+                        "subject": request["subject"],
+                        "chapter": request["chapter"],
+                        "difficulty": difficulty,
+                        "previous_questions": previous_questions,
+                    },
+                    ensure_ascii=False,
+                )
+            },
+            tool_context=tool_context,
+        )
+        question = parse_agent_output(result, GeneratedQuestion)
+        return question.model_dump() if question is not None else None
+
+    async def _elaborate(
+        self, evaluation: dict[str, Any], tool_context: ToolContext
+    ) -> str:
+        assert self.feedback_tool is not None
+        result = await self.feedback_tool.run_async(
+            args={"request": json.dumps(evaluation, ensure_ascii=False)},
+            tool_context=tool_context,
+        )
+        return str(result).strip()
+
+    async def _feedback(self, elaboration: asyncio.Task, deadline: float) -> str | None:
+        # The elaborated feedback, or None when it failed or missed the deadline.
+        timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+        try:
+            feedback = await asyncio.wait_for(elaboration, timeout)
+        except asyncio.TimeoutError:
+            self._increment("feedback_cancelled")
+            return None
+        except Exception as e:
+            logging.warning(f"Elaborating the feedback failed: {e}")
+            return None
+        if not feedback:
+            return None
+        self._increment("feedback_elaborated")
+        return feedback
+
+    @staticmethod
+    def _scored_evaluation(
+        request: dict[str, Any], score: dict[str, Any], difficulty: int
+    ) -> dict[str, Any]:
+        # The evaluation JSON of the single-stage agent, from the request and the
+        # scoring agent's answer, with the one-line feedback.
+        try:
+            max_score = int(request.get("max_score") or 1)
+        except (TypeError, ValueError):
+            max_score = 1
+        points = max(0, min(int(score["score"]), max_score))
+        correct_answer = score.get("correct_answer") or request.get("correct_answer")
+        evaluation = {
+            "question": request.get("question", ""),
+            "answer": request.get("answer", ""),
+            "subject": request.get("subject", ""),
+            "chapter": request.get("chapter", ""),
+            "evaluation": score.get("evaluation") or "",
+            "score": points,
+            "difficulty": difficulty,
+            "max_score": max_score,
+            "feedback": short_feedback(points, max_score, correct_answer),
+        }
+        if points < max_score and correct_answer:
+            evaluation["correct_answer"] = correct_answer
+        return evaluation
+
+    async def _grade_streaming(
+        self,
+        args: dict[str, Any],
+        tool_context: ToolContext,
+        streamer: EvaluationStreamer,
+    ) -> str:
+        # Runs the evaluation agent like `AgentTool` does, with the model's
+        # answer streamed into `streamer`.
+        runner = Runner(
+            app_name=self.agent.name,
+            agent=self.agent,
+            session_service=InMemorySessionService(),
+        )
+        session = runner.session_service.create_session(
+            app_name=self.agent.name,
+            user_id="tmp_user",
+            state=tool_context.state.to_dict(),
+        )
+        text = ""
+        async for event in runner.run_async(
+            user_id=session.user_id,
+            session_id=session.id,
+            new_message=types.Content(
+                role="user", parts=[types.Part.from_text(text=args["request"])]
+            ),
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            if event.actions.state_delta:
+                tool_context.state.update(event.actions.state_delta)
+            if not event.content or not event.content.parts:
+                continue
+            chunk = "".join(part.text or "" for part in event.content.parts)
+            if event.partial:
+                streamer.feed(chunk)
+            elif chunk:
+                text = chunk
+        return text
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        request = parse_agent_json(args.get("request"))
+        try:
+            difficulty = int(request["difficulty"])
+        except (KeyError, TypeError, ValueError):
+            difficulty = 3
+        if not request.get("subject") or not request.get("chapter"):
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        stream = answer_streams.get(tool_context.state.get("session_id"))
+        streamer = EvaluationStreamer(stream) if stream is not None else None
+        evaluation = self.grader.grade(request) if self.grader is not None else None
+        if evaluation is None and self.cache is not None:
+            evaluation = self.cache.get(request)
+        provisional = None
+        if evaluation is None and self.provisional is not None:
+            provisional = self.provisional.score(request)
+            evaluation = self.provisional.grade(request, provisional)
+        graded_by_agent = evaluation is None
+        candidates = None
+        if self.speculator is not None:
+            candidates = self.speculator.claim(
+                tool_context.state.get("session_id"), str(request.get("question") or "")
+            )
+        generation = elaboration = None
+        if evaluation is None:
+            if streamer is not None and provisional is not None:
+                streamer.provisional(provisional["score"], provisional["max_score"])
+            if candidates is None:
+                generation = asyncio.create_task(
+                    self._generate(request, difficulty, tool_context)
+                )
+            try:
+                if streamer is not None:
+                    evaluation_text = await self._grade_streaming(
+                        args, tool_context, streamer
+                    )
+                else:
+                    evaluation_text = await super().run_async(
+                        args=args, tool_context=tool_context
+                    )
+            except BaseException:
+                if generation is not None:
+                    generation.cancel()
+                raise
+            evaluation = parse_agent_json(evaluation_text)
+            if "score" not in evaluation:
+                if generation is not None:
+                    generation.cancel()
+                return evaluation_text
+            if self.feedback_tool is not None:
+                try:
+                    evaluation = self._scored_evaluation(
+                        request, evaluation, difficulty
+                    )
+                except (TypeError, ValueError):
+                    if generation is not None:
+                        generation.cancel()
+                    return evaluation_text
+                if evaluation["score"] < evaluation["max_score"]:
+                    elaboration = asyncio.create_task(
+                        self._elaborate(evaluation, tool_context)
+                    )
+                    deadline = asyncio.get_running_loop().time() + self.feedback_timeout
+            if provisional is not None and self.provisional is not None:
+                try:
+                    self.provisional.record(provisional, int(evaluation["score"]))
+                except (TypeError, ValueError):
+                    pass
+                if streamer is not None:
+                    evaluation["provisional_score"] = provisional["score"]
+        self._increment("evaluations")
+        if streamer is not None:
+            if elaboration is not None:
+                streamer.score(evaluation)
+            else:
+                streamer.evaluation(evaluation)
+
+        try:
+            wanted = next_difficulty(
+                int(evaluation["score"]),
+                int(evaluation.get("max_score") or request.get("max_score") or 0),
+                difficulty,
+            )
+        except (TypeError, ValueError):
+            wanted = difficulty
+        next_question = None
+        if candidates is not None and self.speculator is not None:
+            next_question = await self.speculator.take(
+                candidates,
+                difficulty,
+                wanted,
+                exclude=[
+                    *(
+                        get_question_history(
+                            tool_context.state, request["subject"], request["chapter"]
+                        )
+                        or []
+                    ),
+                    *(request.get("previous_questions") or []),
+                    str(request.get("question") or ""),
+                ],
+            )
+            if (
+                next_question is not None
+                and isinstance(self.generation_tool, QuestionHistoryAgentTool)
+                and self.generation_tool.is_duplicate(tool_context.state, next_question)
+            ):
+                next_question = None
+            if next_question is not None:
+                self._increment("next_questions_speculated")
+            else:
+                generation = asyncio.create_task(
+                    self._generate(request, wanted, tool_context)
+                )
+        elif generation is None:
+            # Graded locally, so the difficulty is known before generating.
+            generation = asyncio.create_task(
+                self._generate(request, wanted, tool_context)
+            )
+        elif wanted == difficulty:
+            self._increment("next_questions_reused")
+        else:
+            generation.cancel()
+            self._increment("regenerations")
+            generation = asyncio.create_task(
+                self._generate(request, wanted, tool_context)
+            )
+        if generation is not None:
+            try:
+                next_question = await generation
+            except Exception as e:
+                logging.warning(f"Generating the next question failed: {e}")
+        if elaboration is not None:
+            feedback = await self._feedback(elaboration, deadline)
+            if feedback is not None:
+                evaluation["feedback"] = feedback
+            if streamer is not None:
+                streamer.evaluation(evaluation)
+        if graded_by_agent and self.cache is not None:
+            self.cache.put(request, evaluation)
+        if next_question is not None:
+            evaluation["next_question"] = next_question
+            if streamer is not None:
+                streamer.next_question(next_question)
+        return format_agent_json(evaluation)
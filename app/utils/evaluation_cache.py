@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+from app.utils.cache import LruTtlCache
+from app.utils.formatting import format_bq_string, request_difficulty
+from app.utils.grading import normalize_answer
+from app.utils.question_history import normalize_question
+
+# Fields of an evaluation that only depend on the question and the answer.
+CACHED_FIELDS = ("evaluation", "score", "max_score", "feedback", "correct_answer")
+
+
+def question_fingerprint(request: dict[str, Any]) -> str:
+    """
+    Fingerprints what an answer is graded against: the subject, question, its
+    correct answer, max score and rubric.
+    """
+    text = json.dumps(
+        [
+            format_bq_string(str(request.get("subject") or "")),
+            normalize_question(str(request.get("question") or "")),
+            normalize_answer(str(request.get("correct_answer") or "")),
+            str(request.get("max_score") or ""),
+            request.get("rubric") or [],
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class EvaluationCache:
+    """
+    Caches the evaluation agent's grading of short answers, keyed on the
+    question fingerprint and the normalized answer, so students answering a
+    banked question with the same answer get the stored score and feedback
+    without a grading call.
+
+    Entries are tagged with their subject, so a subject can be invalidated at
+    once, and subjects in `disabled_subjects` are never cached.
+    """
+
+    def __init__(
+        self,
+        cache: LruTtlCache,
+        disabled_subjects: Iterable[str] = (),
+        max_answer_words: int = 8,
+    ) -> None:
+        """
+        :param cache: Bounded cache holding the evaluations
+        :param disabled_subjects: Subjects whose answers are always graded
+        :param max_answer_words: Longest answer, in words, that is cached;
+            longer answers hardly ever repeat
+        """
+        self.cache = cache
+        self.disabled_subjects = {
+            format_bq_string(subject) for subject in disabled_subjects if subject
+        }
+        self.max_answer_words = max_answer_words
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stored": 0, "skipped": 0}
+
+    def enabled(self, subject: str) -> bool:
+        """Whether the answers of a subject are cached."""
+        return format_bq_string(subject or "") not in self.disabled_subjects
+
+    def key(self, request: dict[str, Any]) -> tuple[str, str] | None:
+        """Returns the cache key of an evaluation request, or None if uncached."""
+        answer = normalize_answer(str(request.get("answer") or ""))
+        if (
+            not answer
+            or not request.get("question")
+            or len(answer.split()) > self.max_answer_words
+            or not self.enabled(str(request.get("subject") or ""))
+        ):
+            return None
+        return question_fingerprint(request), answer
+
+    def get(self, request: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Returns the cached evaluation of the answer in a request, with the
+        request's own question, answer and difficulty, or None on a miss.
+        """
+        key = self.key(request)
+        if key is None:
+            self._increment("skipped")
+            return None
+        self._increment("lookups")
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        self._increment("hits")
+        return {
+            "question": request.get("question", ""),
+            "answer": request.get("answer", ""),
+            "subject": request.get("subject", ""),
+            "chapter": request.get("chapter", ""),
+            "difficulty": request_difficulty(request),
+            **cached,
+        }
+
+    def put(self, request: dict[str, Any], evaluation: dict[str, Any]) -> None:
+        """Caches the evaluation agent's grading of the answer in a request."""
+        key = self.key(request)
+        if key is None or "score" not in evaluation:
+            return
+        self.cache.put(
+            key,
+            {
+                field: evaluation[field]
+                for field in CACHED_FIELDS
+                if evaluation.get(field) is not None
+            },
+            tags=[format_bq_string(request.get("subject") or "")],
+        )
+        self._increment("stored")
+
+    def invalidate(self, subject: str) -> int:
+        """Drops the cached evaluations of a subject."""
+        return self.cache.invalidate(format_bq_string(subject))
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the lookups, hits and hit ratio, and the cache's counters."""
+        with self._lock:
+            stats: dict[str, Any] = dict(self._stats)
+        stats["hit_ratio"] = (
+            stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        )
+        stats["cache"] = self.cache.stats()
+        return stats
+
+    def _increment(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
@@ -1,2 +1,53 @@
+import json
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
 def format_bq_string(input: str) -> str:
     return str.lower(input).replace(" ", "_")
+
+
+def strip_json_fence(text: str) -> str:
+    """Removes the ```json fence agents put around their JSON answer, if any."""
+    return text.strip().strip("`").removeprefix("json")
+
+
+def parse_agent_json(request: Any) -> dict[str, Any]:
+    """Parses the JSON object exchanged with a sub-agent, plain or in a ```json fence."""
+    if isinstance(request, dict):
+        return request
+    try:
+        parsed = json.loads(strip_json_fence(str(request)))
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def request_difficulty(request: dict[str, Any]) -> int:
+    """Returns the difficulty of an agent request, 3 when it is missing or invalid."""
+    try:
+        return max(1, min(int(request.get("difficulty") or 3), 5))
+    except (TypeError, ValueError):
+        return 3
+
+
+def format_agent_json(result: dict[str, Any]) -> str:
+    """Formats a result like the fenced JSON answer of a sub-agent."""
+    return f"```json\n{json.dumps(result, ensure_ascii=False)}\n```"
+
+
+def parse_agent_output(output: Any, schema: type[ModelT]) -> ModelT | None:
+    """
+    Validates the output of a tool against its schema in a single decode. The
+    output is a dict, or JSON text, plain or in a ```json fence. Returns None
+    when it doesn't match the schema.
+    """
+    try:
+        if isinstance(output, dict):
+            return schema.model_validate(output)
+        return schema.model_validate_json(strip_json_fence(str(output)))
+    except ValidationError:
+        return None
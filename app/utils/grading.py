@@ -0,0 +1,310 @@
+import ast
+import math
+import random
+import re
+import threading
+import unicodedata
+from fractions import Fraction
+from typing import Any
+
+from app.utils.formatting import request_difficulty
+
+ARTICLES = {"de", "het", "een", "the", "a", "an"}
+_CONNECTIVES = {"of", "en", "or", "and"}
+
+_NUMBER = r"[-\u2212]?\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?"
+_NUMERIC_PART = re.compile(rf"^(?:[a-z]\s*=\s*)?({_NUMBER})$")
+_SEPARATOR = re.compile(r"\s*(?:\bof\b|\ben\b|\bor\b|\band\b|;|,\s)\s*")
+_EXPRESSION = re.compile(r"^[a-z0-9.,+\-\u2212*/^()\u00b7\u00d7:\s]+$")
+# `1.000` or `2,500` may be a thousands separator or decimals.
+_THOUSANDS = re.compile(r"(?<![\d.,])[1-9]\d{0,2}[.,]\d{3}(?![\d.,])")
+_IMPLICIT_PRODUCT = re.compile(r"(?<=[0-9a-z)])\s*(?=[a-z(])|(?<=[a-z)])\s*(?=[0-9])")
+
+MAX_EXPONENT = 10
+SAMPLE_POINTS = (-2.3, -0.7, 0.4, 1.3, 2.9, 3.7)
+
+
+def normalize_answer(answer: str) -> str:
+    """Lowercases an answer and drops accents, punctuation and leading articles."""
+    text = unicodedata.normalize("NFKD", str(answer).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = re.sub(r"[^\w\s]", " ", text).split()
+    while len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _parse_number(text: str) -> tuple[Fraction, int] | None:
+    """Parses a number, a Dutch decimal comma or a fraction, with its decimals."""
+    text = text.replace("\u2212", "-").replace(" ", "")
+    try:
+        if "/" in text:
+            numerator, denominator = text.split("/")
+            return Fraction(numerator.replace(",", ".")) / Fraction(denominator), 0
+        decimals = len(re.split(r"[.,]", text)[1]) if re.search(r"[.,]", text) else 0
+        return Fraction(text.replace(",", ".")), decimals
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def parse_numbers(answer: str) -> list[tuple[Fraction, int]] | None:
+    """
+    Parses an answer that only holds numbers, optionally as `x = 5` and joined
+    by "of", "en" or commas, or returns None.
+    """
+    text = str(answer).strip().lower().rstrip(".")
+    if _THOUSANDS.search(text):
+        return None
+    numbers = []
+    for part in _SEPARATOR.split(text):
+        match = _NUMERIC_PART.match(part.strip())
+        if not match:
+            return None
+        number = _parse_number(match.group(1))
+        if number is None:
+            return None
+        numbers.append(number)
+    return numbers or None
+
+
+def _to_python_expression(answer: str) -> str | None:
+    text = str(answer).strip().lower().rstrip(".")
+    if "=" in text:
+        # `y = 2x + 3` and `f(x) = ...` compare their right-hand sides.
+        text = text.rsplit("=", 1)[1]
+    if not text.strip() or not _EXPRESSION.match(text) or _THOUSANDS.search(text):
+        return None
+    if re.search(r"[a-z]{2}", text) or set(text.split()) & _CONNECTIVES:
+        # Words, units such as `cm` or functions rather than single-letter
+        # variables. A product like `xy` is left to the evaluation agent too.
+        return None
+    if not re.search(r"[0-9+\-\u2212*/^\u00b7\u00d7:]", text):
+        return None
+    text = re.sub(r"(?<=\d),(?=\d)", ".", text)
+    text = (
+        text.replace("\u2212", "-")
+        .replace("\u00b7", "*")
+        .replace("\u00d7", "*")
+        .replace(":", "/")
+    )
+    text = _IMPLICIT_PRODUCT.sub("*", text.strip())
+    return text.replace("^", "**")
+
+
+def _evaluate(node: ast.AST, variables: dict[str, float]) -> float:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, variables)
+    if isinstance(node, ast.Constant) and isinstance(node.value, int | float):
+        return float(node.value)
+    if isinstance(node, ast.Name) and len(node.id) == 1:
+        return variables[node.id]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub | ast.UAdd):
+        value = _evaluate(node.operand, variables)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(node.left, variables)
+        right = _evaluate(node.right, variables)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        if isinstance(node.op, ast.Div):
+            return left / right
+        if isinstance(node.op, ast.Pow) and abs(right) <= MAX_EXPONENT:
+            return left**right
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+
+def parse_expression(answer: str) -> tuple[ast.Expression, set[str]] | None:
+    """
+    Parses an arithmetic expression in single-letter variables, such as
+    `2x + 3` or `(x+1)(x-1)`, into a tree that only `_evaluate` runs.
+    """
+    expression = _to_python_expression(answer)
+    if expression is None:
+        return None
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError:
+        return None
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    if any(len(name) != 1 for name in names):
+        return None
+    try:
+        _evaluate(tree, dict.fromkeys(names, 1.1))
+    except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+        return None
+    return tree, names
+
+
+def expressions_equivalent(
+    first: tuple[ast.Expression, set[str]],
+    second: tuple[ast.Expression, set[str]],
+    min_points: int = 3,
+) -> bool | None:
+    """
+    Compares two expressions at fixed sample points. Returns None when too few
+    points could be evaluated to decide.
+    """
+    names = sorted(first[1] | second[1])
+    rng = random.Random(0)
+    evaluated = 0
+    for point in SAMPLE_POINTS:
+        variables = {name: point + rng.random() for name in names}
+        try:
+            a = _evaluate(first[0], variables)
+            b = _evaluate(second[0], variables)
+        except (ZeroDivisionError, OverflowError, ValueError):
+            continue
+        if isinstance(a, complex) or isinstance(b, complex):
+            continue
+        if not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9):
+            return False
+        evaluated += 1
+    return True if evaluated >= min_points else None
+
+
+def short_feedback(score: int, max_score: int, correct_answer: str | None) -> str:
+    """Returns the one-line Dutch feedback of a score, with the correct answer."""
+    if score >= max_score:
+        return "Je antwoord is correct."
+    verdict = "gedeeltelijk correct" if score > 0 else "niet correct"
+    if not correct_answer:
+        return f"Je antwoord is {verdict}."
+    return f"Je antwoord is {verdict}. Het juiste antwoord is: {correct_answer}."
+
+
+class LocalGrader:
+    """
+    Grades exact, numeric and simple symbolic answers without the evaluation
+    agent, in the evaluation JSON the agent returns.
+
+    An answer is only graded when the outcome is certain: a normalized match
+    with a short correct answer, numbers compared within the precision of the
+    correct answer, or expressions compared at sample points. Anything else
+    returns None and is left to the evaluation agent.
+    """
+
+    def __init__(self, max_answer_words: int = 3, rel_tol: float = 1e-6) -> None:
+        """
+        :param max_answer_words: Longest correct answer, in words, that a
+            normalized string match grades as correct
+        :param rel_tol: Relative tolerance of numeric answers on top of the
+            precision of the correct answer
+        """
+        self.max_answer_words = max_answer_words
+        self.rel_tol = rel_tol
+        self._lock = threading.Lock()
+        self._stats = {
+            "evaluations": 0,
+            "graded_exact": 0,
+            "graded_numeric": 0,
+            "graded_symbolic": 0,
+        }
+
+    def stats(self) -> dict[str, float]:
+        """Returns the answers graded per method and the fast-path coverage."""
+        with self._lock:
+            stats: dict[str, float] = dict(self._stats)
+        graded = (
+            stats["graded_exact"] + stats["graded_numeric"] + stats["graded_symbolic"]
+        )
+        stats["coverage_rate"] = (
+            graded / stats["evaluations"] if stats["evaluations"] else 0.0
+        )
+        return stats
+
+    def grade(self, request: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Returns the evaluation of the answer in an evaluation request, or None
+        when it can't be graded with certainty.
+        """
+        with self._lock:
+            self._stats["evaluations"] += 1
+        correct_answer = str(request.get("correct_answer") or "")
+        answer = str(request.get("answer") or "")
+        try:
+            max_score = int(request["max_score"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not correct_answer.strip() or not answer.strip():
+            return None
+
+        for method, compare in (
+            ("exact", self._compare_exact),
+            ("numeric", self._compare_numbers),
+            ("symbolic", self._compare_expressions),
+        ):
+            correct = compare(correct_answer, answer)
+            if correct is not None:
+                with self._lock:
+                    self._stats[f"graded_{method}"] += 1
+                return self._evaluation(request, correct, max_score)
+        return None
+
+    def _compare_exact(self, correct_answer: str, answer: str) -> bool | None:
+        expected = normalize_answer(correct_answer)
+        if len(expected.split()) > self.max_answer_words:
+            return None
+        # A different wording may still be right, so only a match is certain.
+        return True if normalize_answer(answer) == expected else None
+
+    def _compare_numbers(self, correct_answer: str, answer: str) -> bool | None:
+        expected = parse_numbers(correct_answer)
+        given = parse_numbers(answer)
+        if expected is None or given is None or len(expected) != len(given):
+            return None
+        unmatched = list(expected)
+        uncertain = False
+        for value, decimals in given:
+            for target, target_decimals in unmatched:
+                # The correct answer is only as precise as its decimals.
+                tolerance = self.rel_tol * abs(float(target))
+                if target_decimals:
+                    tolerance = max(tolerance, 0.5 * 10.0**-target_decimals)
+                difference = abs(float(value - target))
+                if difference <= tolerance:
+                    unmatched.remove((target, target_decimals))
+                    break
+                if decimals and difference <= 0.5 * 10.0**-decimals:
+                    # Rounded differently than the correct answer.
+                    uncertain = True
+        if not unmatched:
+            return True
+        if uncertain or len(unmatched) < len(expected):
+            # Partially right answers are left to the evaluation agent.
+            return None
+        return False
+
+    def _compare_expressions(self, correct_answer: str, answer: str) -> bool | None:
+        expected = parse_expression(correct_answer)
+        if expected is None or not expected[1]:
+            return None
+        given = parse_expression(answer)
+        if given is None or given[1] != expected[1]:
+            # Another variable is more likely a different notation or unit.
+            return None
+        return expressions_equivalent(expected, given)
+
+    @staticmethod
+    def _evaluation(
+        request: dict[str, Any], correct: bool, max_score: int
+    ) -> dict[str, Any]:
+        evaluation = {
+            "question": request.get("question", ""),
+            "answer": request.get("answer", ""),
+            "subject": request.get("subject", ""),
+            "chapter": request.get("chapter", ""),
+            "evaluation": "Correct" if correct else "Incorrect",
+            "score": max_score if correct else 0,
+            "difficulty": request_difficulty(request),
+            "max_score": max_score,
+            "feedback": short_feedback(
+                max_score if correct else 0, max_score, request["correct_answer"]
+            ),
+        }
+        if not correct:
+            evaluation["correct_answer"] = request["correct_answer"]
+        return evaluation
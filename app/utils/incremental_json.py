@@ -0,0 +1,140 @@
+import json
+from typing import Any
+
+# Parser states, within the top-level object of the streamed JSON.
+_BEFORE_OBJECT = "before_object"
+_EXPECT_KEY = "expect_key"
+_IN_KEY = "in_key"
+_EXPECT_COLON = "expect_colon"
+_EXPECT_VALUE = "expect_value"
+_IN_STRING = "in_string"
+_IN_VALUE = "in_value"
+_DONE = "done"
+
+
+def _decodable_length(raw: str) -> int:
+    """
+    Returns the length of the longest prefix of the escaped contents of a JSON
+    string that doesn't end within an escape sequence or a surrogate pair.
+    """
+    index = safe = 0
+    while index < len(raw):
+        if raw[index] != "\\":
+            index += 1
+        elif index + 1 >= len(raw):
+            break
+        elif raw[index + 1] != "u":
+            index += 2
+        elif index + 6 > len(raw):
+            break
+        elif 0xD800 <= int(raw[index + 2 : index + 6], 16) <= 0xDBFF:
+            if index + 12 > len(raw):
+                break
+            index += 12
+        else:
+            index += 6
+        safe = index
+    return safe
+
+
+class IncrementalJsonParser:
+    """
+    Parses the top-level JSON object of a streamed agent answer, which may be
+    wrapped in a ```json fence, chunk by chunk.
+
+    `feed` returns the events of a chunk as `(kind, key, value)` tuples:
+    `("delta", key, text)` for the newly decoded text of a string value and
+    `("value", key, value)` once a value is complete. Nested objects and arrays
+    are only reported as complete values.
+    """
+
+    def __init__(self) -> None:
+        self._state = _BEFORE_OBJECT
+        self._key = ""
+        self._raw = ""
+        self._decoded = ""
+        self._escaped = False
+        self._depth = 0
+        self._in_nested_string = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the closing brace of the object was parsed."""
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> list[tuple[str, str, Any]]:
+        """Parses the next chunk and returns the events it completes."""
+        events: list[tuple[str, str, Any]] = []
+        for char in chunk:
+            self._feed_char(char, events)
+        if self._state == _IN_STRING:
+            self._emit_delta(events)
+        return events
+
+    def _feed_char(self, char: str, events: list[tuple[str, str, Any]]) -> None:
+        state = self._state
+        if state == _BEFORE_OBJECT:
+            if char == "{":
+                self._state = _EXPECT_KEY
+        elif state == _EXPECT_KEY:
+            if char == '"':
+                self._state, self._raw, self._escaped = _IN_KEY, "", False
+            elif char == "}":
+                self._state = _DONE
+        elif state == _IN_KEY:
+            if char == '"' and not self._escaped:
+                self._key = json.loads(f'"{self._raw}"', strict=False)
+                self._state = _EXPECT_COLON
+            else:
+                self._raw += char
+            self._escaped = char == "\\" and not self._escaped
+        elif state == _EXPECT_COLON:
+            if char == ":":
+                self._state = _EXPECT_VALUE
+        elif state == _EXPECT_VALUE:
+            if char == '"':
+                self._state, self._raw, self._decoded = _IN_STRING, "", ""
+                self._escaped = False
+            elif not char.isspace():
+                self._state, self._raw, self._depth = _IN_VALUE, "", 0
+                self._in_nested_string = self._escaped = False
+                self._feed_char(char, events)
+        elif state == _IN_STRING:
+            if char == '"' and not self._escaped:
+                self._emit_delta(events)
+                events.append(("value", self._key, self._decoded))
+                self._state = _EXPECT_KEY
+            else:
+                self._raw += char
+            self._escaped = char == "\\" and not self._escaped
+        elif state == _IN_VALUE:
+            self._feed_value_char(char, events)
+
+    def _feed_value_char(self, char: str, events: list[tuple[str, str, Any]]) -> None:
+        if self._in_nested_string:
+            if char == '"' and not self._escaped:
+                self._in_nested_string = False
+            self._escaped = char == "\\" and not self._escaped
+        elif char == '"':
+            self._in_nested_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]" and self._depth:
+            self._depth -= 1
+        elif char in ",}" and self._depth == 0:
+            try:
+                events.append(("value", self._key, json.loads(self._raw)))
+            except ValueError:
+                # Not valid JSON, e.g. `None`; left to the full answer.
+                pass
+            self._state = _DONE if char == "}" else _EXPECT_KEY
+            return
+        self._raw += char
+
+    def _emit_delta(self, events: list[tuple[str, str, Any]]) -> None:
+        decoded = json.loads(
+            f'"{self._raw[: _decodable_length(self._raw)]}"', strict=False
+        )
+        if len(decoded) > len(self._decoded):
+            events.append(("delta", self._key, decoded[len(self._decoded) :]))
+            self._decoded = decoded
@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+import numpy as np
+import vertexai
+from google.adk.tools import ToolContext
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.genai import types
+from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
+
+from app.utils.catalog import CATALOG_VERSION_BLOB, parse_corpus_path
+from app.utils.formatting import format_bq_string
+from app.utils.retrieval import scoped_declaration
+
+# Same chunking and embedding model as the ingestion cloud function.
+CHUNK_SIZE = 1024
+CHUNK_OVERLAP = 100
+EMBEDDING_MODEL = "text-embedding-005"
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.jsonl"
+
+EmbedFn = Callable[[list[str]], list[list[float]]]
+
+
+def chunk_text(
+    text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+) -> list[str]:
+    """
+    Splits text into overlapping chunks of `chunk_size` words, approximating the
+    token based chunking of the RAG Engine.
+    """
+    words = text.split()
+    step = chunk_size - chunk_overlap
+    return [
+        " ".join(words[start : start + chunk_size])
+        for start in range(0, max(len(words) - chunk_overlap, 1), step)
+        if words[start : start + chunk_size]
+    ]
+
+
+def vertex_embedder(
+    task_type: str, model: str = EMBEDDING_MODEL, location: str | None = None
+) -> EmbedFn:
+    """
+    Returns an embedding function backed by a Vertex AI text embedding model,
+    which is loaded in `location` on the first call.
+    """
+    embedding_model = None
+
+    def embed(texts: list[str]) -> list[list[float]]:
+        nonlocal embedding_model
+        if embedding_model is None:
+            if location:
+                vertexai.init(location=location)
+            embedding_model = TextEmbeddingModel.from_pretrained(model)
+        inputs = [TextEmbeddingInput(text, task_type) for text in texts]
+        return [
+            embedding.values for embedding in embedding_model.get_embeddings(inputs)
+        ]
+
+    return embed
+
+
+class LocalVectorIndex:
+    """
+    Brute-force cosine similarity search over a memory-mapped embedding matrix,
+    mirroring the RAG corpus for offline runs and benchmarks.
+
+    The index directory holds `embeddings.npy`, an L2-normalised float32 matrix
+    with one row per chunk, and `chunks.jsonl` with the text and source URI of
+    every row. Build it from the knowledge bucket with:
+
+        uv run python -m app.utils.local_index --source gs://<bucket> --output <dir>
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: Directory written by `build_index`
+        """
+        self.embeddings = np.load(
+            os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r"
+        )
+        with open(os.path.join(directory, CHUNKS_FILE)) as f:
+            self.chunks = [json.loads(line) for line in f]
+        scopes = [parse_corpus_path(chunk["uri"]) or ("", "") for chunk in self.chunks]
+        self._subjects = np.array([format_bq_string(subject) for subject, _ in scopes])
+        self._chapters = np.array([format_bq_string(chapter) for _, chapter in scopes])
+
+    def search(
+        self,
+        query_embedding: list[float],
+        top_k: int,
+        max_distance: float | None = None,
+        subject: str | None = None,
+        chapter: str | None = None,
+    ) -> list[tuple[float, dict[str, Any]]]:
+        """
+        Returns up to `top_k` (cosine distance, chunk) pairs, nearest first.
+
+        Args:
+            query_embedding: Embedding of the query
+            top_k: Maximum number of chunks to return
+            max_distance: Drop chunks further away than this cosine distance
+            subject: Only search the chunks of this subject, if it has any
+            chapter: Only search the chunks of this chapter of the subject
+        """
+        query = np.array(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        distances = 1.0 - self.embeddings @ query
+        if subject:
+            mask = self._subjects == format_bq_string(subject)
+            if chapter:
+                mask &= self._chapters == format_bq_string(chapter)
+            # Unknown subject or chapter, search the whole index.
+            if mask.any():
+                distances = np.where(mask, distances, np.inf)
+        top_k = min(top_k, len(distances))
+        if top_k == 0:
+            return []
+        nearest = np.argpartition(distances, top_k - 1)[:top_k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [
+            (float(distances[i]), self.chunks[i])
+            for i in nearest
+            if np.isfinite(distances[i])
+            and (max_distance is None or distances[i] <= max_distance)
+        ]
+
+
+class LocalIndexRetrieval(BaseRetrievalTool):
+    """
+    Drop-in replacement of `VertexAiRagRetrieval` answering from a
+    `LocalVectorIndex`. Results have the same shape: a list of chunk texts, or a
+    message when nothing matched.
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        description: str,
+        index: LocalVectorIndex,
+        embed_query: EmbedFn,
+        similarity_top_k: int = 5,
+        vector_distance_threshold: float | None = None,
+    ) -> None:
+        """
+        :param name: Name of the tool
+        :param description: Description of the tool
+        :param index: Index to search
+        :param embed_query: Embedding function for queries
+        :param similarity_top_k: Number of chunks to return
+        :param vector_distance_threshold: Maximum cosine distance of a chunk
+        """
+        super().__init__(name=name, description=description)
+        self.index = index
+        self.embed_query = embed_query
+        self.similarity_top_k = similarity_top_k
+        self.vector_distance_threshold = vector_distance_threshold
+
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        return scoped_declaration(self.name, self.description)
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        # Embedding the query is a blocking call, so it runs off the event loop.
+        contexts = await asyncio.to_thread(
+            self.retrieve,
+            args["query"],
+            subject=args.get("subject"),
+            chapter=args.get("chapter"),
+        )
+        if not contexts:
+            return f"No matching result found in the local index for: {args['query']}"
+        return [text for _, text in contexts]
+
+    def retrieve(
+        self,
+        query: str,
+        subject: str | None = None,
+        chapter: str | None = None,
+        top_k: int | None = None,
+    ) -> list[tuple[str, str]]:
+        """
+        Returns the (source uri, text) of the chunks matching a query.
+
+        :param top_k: Number of chunks to return instead of `similarity_top_k`
+        """
+        results = self.index.search(
+            self.embed_query([query])[0],
+            top_k=top_k or self.similarity_top_k,
+            max_distance=self.vector_distance_threshold,
+            subject=subject,
+            chapter=chapter,
+        )
+        return [(chunk["uri"], chunk["text"]) for _, chunk in results]
+
+
+def build_index(
+    documents: Iterable[tuple[str, str]],
+    embed: EmbedFn,
+    directory: str,
+    batch_size: int = 16,
+) -> int:
+    """
+    Chunks and embeds (uri, text) documents into an index directory.
+
+    Returns:
+        int: The number of indexed chunks
+    """
+    chunks = [
+        {"uri": uri, "text": chunk}
+        for uri, text in documents
+        for chunk in chunk_text(text)
+    ]
+    vectors: list[list[float]] = []
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start : start + batch_size]
+        vectors.extend(embed([chunk["text"] for chunk in batch]))
+
+    embeddings = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.where(norms == 0, 1.0, norms)
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, EMBEDDINGS_FILE), embeddings)
+    with open(os.path.join(directory, CHUNKS_FILE), "w") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk) + "\n")
+    logging.info(f"Indexed {len(chunks)} chunks in {directory}")
+    return len(chunks)
+
+
+def _extract_text(name: str, data: bytes) -> str:
+    if name.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        return "\n".join(
+            page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages
+        )
+    return data.decode("utf-8", errors="ignore")
+
+
+def read_gcs_documents(source: str) -> Iterator[tuple[str, str]]:
+    """Yields (uri, text) of every file below a `gs://bucket[/prefix]` source."""
+    from google.cloud import storage
+
+    bucket_name, _, prefix = source.removeprefix("gs://").partition("/")
+    for blob in storage.Client().list_blobs(bucket_name, prefix=prefix or None):
+        if blob.name == CATALOG_VERSION_BLOB or blob.name.endswith("/"):
+            continue
+        yield (
+            f"gs://{bucket_name}/{blob.name}",
+            _extract_text(blob.name, blob.download_as_bytes()),
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Build the local vector index from the knowledge bucket"
+    )
+    parser.add_argument("--source", required=True, help="gs://bucket[/prefix]")
+    parser.add_argument("--output", default=os.getenv("LOCAL_INDEX_DIR", "index"))
+    parser.add_argument("--location", default="europe-west3")
+    args = parser.parse_args()
+
+    import google.auth
+
+    _, project_id = google.auth.default()
+    vertexai.init(project=project_id, location=args.location)
+    build_index(
+        read_gcs_documents(args.source),
+        vertex_embedder("RETRIEVAL_DOCUMENT"),
+        args.output,
+    )
@@ -0,0 +1,251 @@
+import random
+import threading
+from collections.abc import Callable, Iterable
+from fractions import Fraction
+from typing import Any
+
+from app.utils.formatting import format_bq_string
+
+MATHS_SUBJECTS = ("Wiskunde", "Maths")
+
+# Kinds of exercise a chapter asks for, by a word in its name. Other chapters
+# get the kinds that suit the difficulty.
+CHAPTER_KINDS = {
+    "breuk": "fractions",
+    "kwadrat": "quadratic",
+    "vierkant": "quadratic",
+    "tweedegraads": "quadratic",
+    "quadratic": "quadratic",
+    "fraction": "fractions",
+    "eerstegraads": "linear",
+    "lineair": "linear",
+    "linear": "linear",
+}
+DIFFICULTY_KINDS = {
+    1: ("linear",),
+    2: ("linear", "fractions"),
+    3: ("linear", "fractions"),
+    4: ("linear", "fractions", "quadratic"),
+    5: ("fractions", "quadratic"),
+}
+
+
+def _term(coefficient: int, variable: str = "x", first: bool = False) -> str:
+    """Formats `coefficient * variable` as a term of a sum, e.g. `- 3x`."""
+    if coefficient == 0:
+        return ""
+    sign = "-" if coefficient < 0 else "+"
+    magnitude = abs(coefficient)
+    text = (
+        f"{'' if magnitude == 1 and variable else magnitude}{variable}"
+        if variable
+        else str(magnitude)
+    )
+    if first:
+        return f"-{text}" if coefficient < 0 else text
+    return f" {sign} {text}"
+
+
+def _sum(*terms: tuple[int, str]) -> str:
+    """Formats a sum of `(coefficient, variable)` terms, `0` when all vanish."""
+    text = ""
+    for coefficient, variable in terms:
+        text += _term(coefficient, variable, first=not text)
+    return text or "0"
+
+
+def _product(factor: int, constant: int) -> str:
+    """Formats `factor(x + constant)`, e.g. `3(x - 2)`."""
+    if constant == 0:
+        return _term(factor, first=True)
+    sign = {1: "", -1: "-"}.get(factor, str(factor))
+    return f"{sign}({_sum((1, 'x'), (constant, ''))})"
+
+
+def _quotient(constant: int, divisor: int) -> str:
+    """Formats `(x + constant)/divisor`, e.g. `(x - 2)/3`."""
+    if constant == 0:
+        return f"x/{divisor}"
+    return f"({_sum((1, 'x'), (constant, ''))})/{divisor}"
+
+
+def _number(value: Fraction) -> str:
+    return str(value.numerator) if value.denominator == 1 else str(value)
+
+
+def _solutions(*roots: Fraction) -> str:
+    return " of ".join(
+        f"x = {_number(root)}" for root in sorted(set(roots), reverse=True)
+    )
+
+
+class MathsExerciseGenerator:
+    """
+    Generates maths exercises locally, in the JSON of the question generation
+    agent: linear equations, equations with fractions and quadratic equations,
+    built backwards from an integer (or, at difficulty 5, fractional) solution so
+    every exercise has a small, exact answer the local grader can decide.
+    """
+
+    def __init__(
+        self,
+        subjects: Iterable[str] = MATHS_SUBJECTS,
+        seed: int | None = None,
+        max_attempts: int = 20,
+    ) -> None:
+        """
+        :param subjects: Subjects whose questions are generated as exercises
+        :param seed: Seed of the random exercises, for reproducible runs
+        :param max_attempts: Exercises drawn before giving up on finding one
+            that isn't excluded
+        """
+        self.subjects = {format_bq_string(subject) for subject in subjects}
+        self.max_attempts = max_attempts
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"exercises": 0, "exhausted": 0}
+        self._kinds: dict[str, Callable[[random.Random, int], tuple[str, str]]] = {
+            "linear": self._linear,
+            "fractions": self._fractions,
+            "quadratic": self._quadratic,
+        }
+
+    def handles(self, subject: str, chapter: str) -> bool:
+        """Whether the questions of a subject and chapter are generated here."""
+        return bool(chapter) and format_bq_string(subject or "") in self.subjects
+
+    def stats(self) -> dict[str, int]:
+        """Returns how many exercises were generated."""
+        with self._lock:
+            return dict(self._stats)
+
+    def generate(
+        self,
+        subject: str,
+        chapter: str,
+        difficulty: int,
+        exclude: Iterable[str] = (),
+    ) -> dict[str, Any] | None:
+        """
+        Returns an exercise for a maths subject and chapter that isn't in
+        `exclude`, or None for other subjects.
+        """
+        if not self.handles(subject, chapter):
+            return None
+        difficulty = max(1, min(int(difficulty), 5))
+        kinds = [
+            kind
+            for word, kind in CHAPTER_KINDS.items()
+            if word in format_bq_string(chapter)
+        ][:1] or DIFFICULTY_KINDS[difficulty]
+        exclude = set(exclude)
+        with self._lock:
+            for _ in range(self.max_attempts):
+                kind = self._rng.choice(kinds)
+                question, answer = self._kinds[kind](self._rng, difficulty)
+                if question not in exclude:
+                    self._stats["exercises"] += 1
+                    break
+            else:
+                self._stats["exhausted"] += 1
+                return None
+        return {
+            "subject": subject,
+            "chapter": chapter,
+            "question": question,
+            "answer": answer,
+            "difficulty": difficulty,
+            "max_score": 1 + (difficulty >= 3) + (difficulty == 5),
+        }
+
+    @staticmethod
+    def _linear(rng: random.Random, difficulty: int) -> tuple[str, str]:
+        x = rng.randint(-10, 10)
+        a = rng.choice([n for n in range(-9, 10) if n not in (-1, 0, 1)])
+        b = rng.choice([n for n in range(-20, 21) if n != 0])
+        if difficulty == 1:
+            # x + b = c or ax = c
+            if rng.random() < 0.5:
+                return f"Los op: {_sum((1, 'x'), (b, ''))} = {x + b}", f"x = {x}"
+            return f"Los op: {_sum((a, 'x'))} = {a * x}", f"x = {x}"
+        if difficulty == 2:
+            # ax + b = c
+            return f"Los op: {_sum((a, 'x'), (b, ''))} = {a * x + b}", f"x = {x}"
+        if difficulty == 3:
+            # ax + b = cx + d
+            c = rng.choice([n for n in range(-9, 10) if n not in (0, a)])
+            d = a * x + b - c * x
+            return (
+                f"Los op: {_sum((a, 'x'), (b, ''))} = {_sum((c, 'x'), (d, ''))}",
+                f"x = {x}",
+            )
+        # a(x + b) = c(x + d), at difficulty 5 with an extra ex on the left. The
+        # left side is worth `value` at the solution, so c must divide it.
+        b = rng.randint(-9, 9)
+        e = rng.choice([n for n in range(-5, 6) if n != 0]) if difficulty == 5 else 0
+        value = a * (x + b) + e * x
+        divisors = [
+            n
+            for n in range(-9, 10)
+            if n not in (0, a + e) and (value == 0 or value % n == 0)
+        ]
+        if not divisors:
+            return MathsExerciseGenerator._linear(rng, difficulty)
+        c = rng.choice(divisors)
+        d = value // c - x
+        left = _product(a, b) + _term(e)
+        return f"Los op: {left} = {_product(c, d)}", f"x = {x}"
+
+    @staticmethod
+    def _fractions(rng: random.Random, difficulty: int) -> tuple[str, str]:
+        a = rng.randint(2, 9)
+        k = rng.randint(-10, 10)
+        if difficulty <= 2:
+            # x/a = k or x/a + b = c
+            x = a * k
+            if difficulty == 1:
+                return f"Los op: x/{a} = {k}", f"x = {x}"
+            b = rng.choice([n for n in range(-10, 11) if n != 0])
+            return f"Los op: {_sum((1, 'x/' + str(a)), (b, ''))} = {k + b}", f"x = {x}"
+        if difficulty == 3:
+            # (x + b)/a = k
+            b = rng.choice([n for n in range(-10, 11) if n != 0])
+            return f"Los op: {_quotient(b, a)} = {k}", f"x = {a * k - b}"
+        c = rng.choice([n for n in range(2, 10) if n != a])
+        if difficulty == 4:
+            # x/a + x/c = m, with x a multiple of both denominators
+            x = a * c * rng.randint(-3, 3)
+            m = Fraction(x, a) + Fraction(x, c)
+            return f"Los op: x/{a} + x/{c} = {_number(m)}", f"x = {x}"
+        # (x + b)/a = (x + d)/c, so x + b = ak and x + d = ck
+        x = rng.randint(-10, 10)
+        k = rng.choice([n for n in range(-5, 6) if n != 0])
+        b, d = a * k - x, c * k - x
+        return f"Los op: {_quotient(b, a)} = {_quotient(d, c)}", f"x = {x}"
+
+    @staticmethod
+    def _quadratic(rng: random.Random, difficulty: int) -> tuple[str, str]:
+        r = rng.randint(1, 10)
+        s = rng.choice([n for n in range(-10, 11) if n != 0])
+        if difficulty <= 2:
+            # x² = r² or x² + bx = 0
+            if difficulty == 1 or rng.random() < 0.5:
+                return f"Los op: x² = {r * r}", _solutions(Fraction(r), Fraction(-r))
+            return (
+                f"Los op: {_sum((1, 'x²'), (-s, 'x'))} = 0",
+                _solutions(Fraction(0), Fraction(s)),
+            )
+        # (px - q)(x - s) with integer roots, and a fractional root q/p at 5
+        p, q = 1, rng.choice([n for n in range(-10, 11) if n != 0])
+        if difficulty == 4:
+            p = rng.randint(2, 4)
+            q = p * q
+        elif difficulty == 5:
+            p = rng.randint(2, 5)
+            while Fraction(q, p).denominator == 1:
+                q = rng.choice([n for n in range(-10, 11) if n != 0])
+        a, b, c = p, -(q + p * s), q * s
+        return (
+            f"Los op: {_sum((a, 'x²'), (b, 'x'), (c, ''))} = 0",
+            _solutions(Fraction(q, p), Fraction(s)),
+        )
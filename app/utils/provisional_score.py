@@ -0,0 +1,353 @@
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from app.utils.formatting import request_difficulty
+from app.utils.grading import normalize_answer, parse_numbers, short_feedback
+from app.utils.question_history import normalize_question
+from app.utils.typing import rubric_points
+
+LOCATION = "europe-west1"
+
+# Words that carry no content when comparing an answer with the correct answer.
+STOPWORDS = set(
+    "de het een en of is zijn was van in op te dat die met voor aan door als er "
+    "om bij the a an and or to are".split()
+)
+# Words that match when they share a prefix this long, e.g. "revolutie" and
+# "revolutionair", or "oorzaak" and "oorzaken".
+PREFIX_LENGTH = 5
+# A key point or correct answer with fewer content words is all or nothing,
+# e.g. a single word, so its coverage can't tell a right answer apart from
+# another wording and the answer is left to the evaluation agent.
+MIN_CONTENT_WORDS = 3
+DEFAULT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+
+def content_words(text: str) -> list[str]:
+    """Returns the normalized words of a text without stopwords."""
+    return [word for word in normalize_answer(text).split() if word not in STOPWORDS]
+
+
+def _matches(word: str, words: set[str], prefixes: set[str]) -> bool:
+    if word in words:
+        return True
+    return len(word) >= PREFIX_LENGTH and word[:PREFIX_LENGTH] in prefixes
+
+
+def coverage(answer: str, expected: str) -> float | None:
+    """
+    Returns the share of the content words of `expected` that the answer
+    contains, or None when `expected` has none.
+    """
+    expected_words = content_words(expected)
+    if not expected_words:
+        return None
+    words = set(content_words(answer))
+    prefixes = {word[:PREFIX_LENGTH] for word in words if len(word) >= PREFIX_LENGTH}
+    matched = sum(_matches(word, words, prefixes) for word in expected_words)
+    return matched / len(expected_words)
+
+
+def _confidence(covered: float, expected: str) -> float:
+    if len(content_words(expected)) < MIN_CONTENT_WORDS:
+        return 0.0
+    return abs(2 * covered - 1)
+
+
+class ProvisionalScorer:
+    """
+    Scores an answer instantly from the lexical overlap with the correct answer
+    or, when the question has one, with each key point of its rubric. The score
+    is shown while the evaluation agent grades the answer, which then confirms
+    or corrects it.
+
+    Every covered share is turned into a decision (at least half covered counts
+    as covered), and its confidence is how far the share is from that boundary:
+    1 for none or all of the words, 0 for exactly half. Key points and correct
+    answers with fewer than `MIN_CONTENT_WORDS` content words have a confidence
+    of 0. With a rubric, the least clear-cut key point sets the confidence.
+    Answers with a confidence of at least `threshold` are graded with the
+    provisional score, without the evaluation agent; calibrate the threshold
+    with `calibrate` first.
+    """
+
+    def __init__(self, threshold: float | None = None) -> None:
+        """
+        :param threshold: Confidence from which the provisional score is final,
+            or None to always let the evaluation agent grade
+        """
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._stats = {
+            "scored": 0,
+            "graded": 0,
+            "confirmed": 0,
+            "corrected": 0,
+        }
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns how many answers got a provisional score, were graded with it,
+        and how often the evaluation agent confirmed it.
+        """
+        with self._lock:
+            stats: dict[str, float] = dict(self._stats)
+        checked = stats["confirmed"] + stats["corrected"]
+        stats["agreement_rate"] = stats["confirmed"] / checked if checked else 0.0
+        return stats
+
+    def score(self, request: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Returns the provisional `score`, `max_score` and `confidence` of the
+        answer in an evaluation request, or None when it can't be scored
+        lexically, e.g. for numeric answers.
+        """
+        answer = str(request.get("answer") or "")
+        correct_answer = str(request.get("correct_answer") or "")
+        try:
+            max_score = int(request["max_score"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not answer.strip() or parse_numbers(correct_answer) is not None:
+            return None
+        rubric = rubric_points(request.get("rubric"))
+        if rubric:
+            score, confidence = 0, 1.0
+            for point in rubric:
+                covered = coverage(answer, point.point)
+                if covered is None:
+                    return None
+                if covered >= 0.5:
+                    score += point.weight
+                confidence = min(confidence, _confidence(covered, point.point))
+            score = min(score, max_score)
+        else:
+            covered = coverage(answer, correct_answer)
+            if covered is None:
+                return None
+            score = round(covered * max_score)
+            confidence = _confidence(covered, correct_answer)
+        with self._lock:
+            self._stats["scored"] += 1
+        return {"score": score, "max_score": max_score, "confidence": confidence}
+
+    def grade(
+        self, request: dict[str, Any], provisional: dict[str, Any] | None
+    ) -> dict[str, Any] | None:
+        """
+        Returns the evaluation of a provisional score whose confidence reaches
+        the threshold, or None when the evaluation agent should grade.
+        """
+        if (
+            provisional is None
+            or self.threshold is None
+            or provisional["confidence"] < self.threshold
+        ):
+            return None
+        with self._lock:
+            self._stats["graded"] += 1
+        score, max_score = provisional["score"], provisional["max_score"]
+        evaluation = {
+            "question": request.get("question", ""),
+            "answer": request.get("answer", ""),
+            "subject": request.get("subject", ""),
+            "chapter": request.get("chapter", ""),
+            "evaluation": (
+                "Correct"
+                if score >= max_score
+                else "Partially correct"
+                if score
+                else "Incorrect"
+            ),
+            "score": score,
+            "difficulty": request_difficulty(request),
+            "max_score": max_score,
+            "feedback": short_feedback(score, max_score, request.get("correct_answer")),
+        }
+        if score < max_score and request.get("correct_answer"):
+            evaluation["correct_answer"] = request["correct_answer"]
+        return evaluation
+
+    def record(self, provisional: dict[str, Any], score: int) -> None:
+        """Records whether the evaluation agent confirmed a provisional score."""
+        with self._lock:
+            self._stats[
+                "confirmed" if provisional["score"] == score else "corrected"
+            ] += 1
+
+
+def calibrate(
+    samples: Iterable[tuple[dict[str, Any], int]],
+    thresholds: Iterable[float] = DEFAULT_THRESHOLDS,
+) -> list[dict[str, float]]:
+    """
+    Measures, per confidence threshold, the share of graded answers the
+    provisional score would grade (`coverage`) and how often it matches the
+    stored score there (`accuracy`).
+
+    :param samples: Evaluation requests with the score they were given
+    :param thresholds: Confidence thresholds to measure
+    """
+    scorer = ProvisionalScorer()
+    scored = []
+    total = 0
+    for request, student_score in samples:
+        total += 1
+        provisional = scorer.score(request)
+        if provisional is not None:
+            scored.append(
+                (provisional["confidence"], provisional["score"] == student_score)
+            )
+    results = []
+    for threshold in thresholds:
+        decided = [correct for confidence, correct in scored if confidence >= threshold]
+        results.append(
+            {
+                "threshold": threshold,
+                "coverage": len(decided) / total if total else 0.0,
+                "accuracy": sum(decided) / len(decided) if decided else 0.0,
+            }
+        )
+    return results
+
+
+def recommend_threshold(
+    results: list[dict[str, float]], min_accuracy: float = 0.98
+) -> float | None:
+    """Returns the lowest threshold reaching `min_accuracy`, if any."""
+    for result in sorted(results, key=lambda result: result["threshold"]):
+        if result["coverage"] and result["accuracy"] >= min_accuracy:
+            return result["threshold"]
+    return None
+
+
+def read_jsonl(path: str) -> Iterator[dict[str, Any]]:
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_history_rows(project_id: str, limit: int) -> Iterator[dict[str, Any]]:
+    """Yields the last `limit` rows of the `question_answer` table."""
+    from google.cloud import bigquery
+
+    from app.utils.bigquery import bq_client_pool
+
+    bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
+    bq_table_id = os.getenv("TABLE_ID", "question_answer")
+    results = (
+        bq_client_pool.get_client(LOCATION, project_id)
+        .query(
+            f"""
+            SELECT question, answer, student_score, max_score, correct_answer, rubric
+            FROM `{project_id}.{bq_dataset_id}.{bq_table_id}`
+            ORDER BY timestamp DESC
+            LIMIT @limit
+            """,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("limit", "INT64", limit)
+                ]
+            ),
+        )
+        .result()
+    )
+    for row in results:
+        yield dict(row.items())
+
+
+def history_samples(
+    rows: Iterable[dict[str, Any]], questions: Iterable[dict[str, Any]] = ()
+) -> Iterator[tuple[dict[str, Any], int]]:
+    """
+    Turns graded answers into evaluation requests with their score. Rows are
+    graded against the correct answer and rubric stored with them; rows stored
+    without a correct answer are joined with their question in `questions`, and
+    skipped when it is missing.
+    """
+    by_question = {
+        normalize_question(question["question"]): question
+        for question in questions
+        if question.get("question")
+    }
+    for row in rows:
+        if row.get("correct_answer"):
+            correct_answer, rubric = row["correct_answer"], row.get("rubric")
+            if isinstance(rubric, str):
+                rubric = json.loads(rubric)
+        else:
+            question = by_question.get(
+                normalize_question(str(row.get("question") or ""))
+            )
+            if question is None:
+                continue
+            correct_answer, rubric = question.get("answer"), question.get("rubric")
+        yield (
+            {
+                "question": row["question"],
+                "answer": row.get("answer") or "",
+                "correct_answer": correct_answer or "",
+                "rubric": rubric or [],
+                "max_score": row["max_score"],
+            },
+            int(row["student_score"]),
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Calibrate the confidence threshold of the provisional score against "
+            "graded answers"
+        )
+    )
+    parser.add_argument(
+        "--questions",
+        default=None,
+        help=(
+            "JSONL of generated questions with their answer and rubric, for rows "
+            "stored without them"
+        ),
+    )
+    parser.add_argument(
+        "--rows",
+        default=None,
+        help="JSONL export of question_answer rows, instead of reading BigQuery",
+    )
+    parser.add_argument(
+        "--project",
+        default=None,
+        help="GCP project ID (defaults to application default credentials)",
+    )
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--min-accuracy", type=float, default=0.98)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rows:
+        rows = read_jsonl(args.rows)
+    else:
+        from app.utils.bigquery import bq_client_pool
+
+        rows = read_history_rows(
+            args.project or bq_client_pool.default_project(), args.limit
+        )
+    questions = read_jsonl(args.questions) if args.questions else ()
+    results = calibrate(history_samples(rows, questions))
+    for result in results:
+        logging.info(
+            f"threshold={result['threshold']:.2f} "
+            f"coverage={result['coverage']:.2%} accuracy={result['accuracy']:.2%}"
+        )
+    threshold = recommend_threshold(results, args.min_accuracy)
+    if threshold is None:
+        logging.info(f"No threshold reaches {args.min_accuracy:.0%} accuracy")
+    else:
+        logging.info(f"Set PROVISIONAL_SKIP_THRESHOLD={threshold}")
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from google.adk.agents import BaseAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from app.utils.formatting import (
+    format_agent_json,
+    format_bq_string,
+    parse_agent_json,
+    parse_agent_output,
+)
+from app.utils.question_bank_store import QuestionBankStore
+from app.utils.question_history import (
+    QuestionHistoryAgentTool,
+    get_question_history,
+)
+from app.utils.typing import GeneratedQuestion
+
+_STOP = object()
+
+GenerateFn = Callable[[str, str, int], dict[str, Any] | None]
+
+
+class QuestionBank:
+    """
+    Keeps `target_size` ready questions per subject, chapter and difficulty.
+
+    `take` serves a ready question from the store and asks the background filler
+    to top the bank up again, so only a cold key waits for live generation. Keys
+    are only filled once they have been asked for, which keeps the bank limited
+    to the chapters students actually practise.
+    """
+
+    def __init__(
+        self,
+        store: QuestionBankStore,
+        generate_fn: GenerateFn,
+        target_size: int = 5,
+        max_generation_attempts: int = 2,
+    ) -> None:
+        """
+        :param store: Store holding the ready questions
+        :param generate_fn: Callable generating one question for a subject,
+            chapter and difficulty, returning None when it couldn't
+        :param target_size: Number of ready questions to keep per key
+        :param max_generation_attempts: Failed generations before a refill of a
+            key is given up until it is requested again
+        """
+        self.store = store
+        self.generate_fn = generate_fn
+        self.target_size = target_size
+        self.max_generation_attempts = max_generation_attempts
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: set[tuple[str, str, int]] = set()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._closed = False
+        self._stats: dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "serve_ms_total": 0.0,
+            "serve_ms_max": 0.0,
+            "refills_requested": 0,
+            "questions_generated": 0,
+            "generation_failures": 0,
+        }
+
+    def take(
+        self,
+        subject: str,
+        chapter: str,
+        difficulty: int,
+        exclude: Iterable[str] = (),
+    ) -> dict[str, Any] | None:
+        """
+        Returns a ready question that isn't in `exclude`, or None on a miss, and
+        schedules a refill of the key either way.
+        """
+        start = time.perf_counter()
+        try:
+            question = self.store.pop(subject, chapter, difficulty, exclude)
+        except Exception as e:
+            logging.warning(f"Reading the question bank failed: {e}")
+            question = None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["hits" if question else "misses"] += 1
+            self._stats["serve_ms_total"] += elapsed
+            self._stats["serve_ms_max"] = max(self._stats["serve_ms_max"], elapsed)
+        self.request_refill(subject, chapter, difficulty)
+        return question
+
+    def request_refill(self, subject: str, chapter: str, difficulty: int) -> None:
+        """Asks the background filler to top up a key, once at a time."""
+        key = (subject, chapter, int(difficulty))
+        normalized = (format_bq_string(subject), format_bq_string(chapter), key[2])
+        with self._lock:
+            if self._closed or normalized in self._pending:
+                return
+            self._pending.add(normalized)
+            self._stats["refills_requested"] += 1
+        self._ensure_worker()
+        self._queue.put((normalized, key))
+
+    def stats(self) -> dict[str, float]:
+        """Returns the hit rate, serve latency and filler counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["serve_ms_mean"] = (
+            stats.pop("serve_ms_total") / lookups if lookups else 0.0
+        )
+        stats["refill_queue_depth"] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        """Stops accepting refills and waits for the queued ones to finish."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join(timeout)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="question-bank-filler", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            normalized, key = item
+            try:
+                self._refill(*key)
+            except Exception as e:
+                logging.warning(f"Refilling the question bank for {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(normalized)
+
+    def _refill(self, subject: str, chapter: str, difficulty: int) -> None:
+        failures = 0
+        while (
+            failures < self.max_generation_attempts
+            and self.store.count(subject, chapter, difficulty) < self.target_size
+        ):
+            question = self.generate_fn(subject, chapter, difficulty)
+            if question is None:
+                failures += 1
+                self._increment("generation_failures")
+                continue
+            self.store.add(subject, chapter, difficulty, [question])
+            self._increment("questions_generated")
+
+    def _increment(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+def agent_question_generator(agent: BaseAgent) -> GenerateFn:
+    """
+    Returns a generate function running the question generation agent outside
+    of a student's session, the way `AgentTool` runs it.
+    """
+
+    async def generate(
+        subject: str, chapter: str, difficulty: int
+    ) -> dict[str, Any] | None:
+        runner = Runner(
+            app_name="question_bank",
+            agent=agent,
+            session_service=InMemorySessionService(),
+        )
+        session = runner.session_service.create_session(
+            app_name="question_bank", user_id="question_bank"
+        )
+        request = json.dumps(
+            {"subject": subject, "chapter": chapter, "difficulty": difficulty}
+        )
+        text = None
+        async for event in runner.run_async(
+            user_id=session.user_id,
+            session_id=session.id,
+            new_message=types.Content(
+                role="user", parts=[types.Part.from_text(text=request)]
+            ),
+        ):
+            if event.content and event.content.parts:
+                text = "\n".join(part.text for part in event.content.parts if part.text)
+        question = parse_agent_output(text, GeneratedQuestion)
+        return question.model_dump() if question is not None else None
+
+    def generate_sync(subject: str, chapter: str, difficulty: int) -> dict | None:
+        return asyncio.run(generate(subject, chapter, difficulty))
+
+    return generate_sync
+
+
+def first_generated(*generate_fns: GenerateFn) -> GenerateFn:
+    """
+    Returns a generate function trying `generate_fns` in order until one
+    returns a question, e.g. a local exercise generator before the agent.
+    """
+
+    def generate(subject: str, chapter: str, difficulty: int) -> dict | None:
+        for generate_fn in generate_fns:
+            question = generate_fn(subject, chapter, difficulty)
+            if question is not None:
+                return question
+        return None
+
+    return generate
+
+
+class QuestionBankAgentTool(QuestionHistoryAgentTool):
+    """
+    `AgentTool` for the question generation agent that serves ready questions
+    from a `QuestionBank` and only runs the agent when the bank has none.
+
+    Banked questions that were asked before, or nearly duplicate an asked
+    question, are put back for other students.
+    """
+
+    def __init__(self, agent: BaseAgent, bank: QuestionBank, **kwargs: Any) -> None:
+        """
+        :param agent: The question generation agent
+        :param bank: Bank of ready questions
+        :param kwargs: Options of `QuestionHistoryAgentTool`
+        """
+        super().__init__(agent=agent, **kwargs)
+        self.bank = bank
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        request = parse_agent_json(args.get("request"))
+        subject, chapter = request.get("subject"), request.get("chapter")
+        if subject and chapter:
+            question = self.exercise(tool_context.state, request) or (
+                self.take_batched(tool_context.state, request)
+            )
+            if question is not None:
+                return format_agent_json(question)
+        difficulty: int | None
+        try:
+            difficulty = int(request["difficulty"])
+        except (KeyError, TypeError, ValueError):
+            difficulty = None
+        if subject and chapter and difficulty is not None:
+            exclude = [
+                *(get_question_history(tool_context.state, subject, chapter) or []),
+                *(request.get("previous_questions") or []),
+            ]
+            # The bank store reads and writes block, so they run off the event
+            # loop.
+            for _ in range(self.max_generation_attempts):
+                question = await asyncio.to_thread(
+                    self.bank.take, subject, chapter, difficulty, exclude
+                )
+                if question is None:
+                    break
+                if not self.is_duplicate(tool_context.state, question):
+                    # Same shape as the agent's own answer.
+                    return format_agent_json(question)
+                await asyncio.to_thread(
+                    self.bank.store.add, subject, chapter, difficulty, [question]
+                )
+                exclude.append(question["question"])
+        return await super().run_async(args=args, tool_context=tool_context)
@@ -0,0 +1,309 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.bigquery import bq_client_pool
+from app.utils.formatting import format_bq_string
+
+LOCATION = "europe-west1"
+
+
+class QuestionBankStore(ABC):
+    """
+    Storage of pre-generated questions, keyed by subject, chapter and difficulty.
+
+    Questions are dicts shaped like the output of the question generation agent:
+    `subject`, `chapter`, `question`, `answer`, `difficulty`, `max_score` and
+    the `rubric` the answer is graded against.
+    """
+
+    @abstractmethod
+    def add(
+        self, subject: str, chapter: str, difficulty: int, questions: list[dict]
+    ) -> None:
+        """Adds questions to the bank, ignoring questions it already holds."""
+
+    @abstractmethod
+    def pop(
+        self, subject: str, chapter: str, difficulty: int, exclude: Iterable[str] = ()
+    ) -> dict[str, Any] | None:
+        """Removes and returns the oldest question not in `exclude`, if any."""
+
+    @abstractmethod
+    def count(self, subject: str, chapter: str, difficulty: int) -> int:
+        """Returns the number of ready questions."""
+
+
+def _key(subject: str, chapter: str, difficulty: int) -> tuple[str, str, int]:
+    return format_bq_string(subject), format_bq_string(chapter), int(difficulty)
+
+
+class InMemoryQuestionBankStore(QuestionBankStore):
+    """Keeps the bank in process memory, e.g. for unit tests and benchmarks."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._questions: dict[tuple[str, str, int], list[dict[str, Any]]] = {}
+
+    def add(
+        self, subject: str, chapter: str, difficulty: int, questions: list[dict]
+    ) -> None:
+        with self._lock:
+            ready = self._questions.setdefault(_key(subject, chapter, difficulty), [])
+            known = {question["question"] for question in ready}
+            ready.extend(q for q in questions if q["question"] not in known)
+
+    def pop(
+        self, subject: str, chapter: str, difficulty: int, exclude: Iterable[str] = ()
+    ) -> dict[str, Any] | None:
+        excluded = set(exclude)
+        with self._lock:
+            ready = self._questions.get(_key(subject, chapter, difficulty), [])
+            for index, question in enumerate(ready):
+                if question["question"] not in excluded:
+                    return ready.pop(index)
+        return None
+
+    def count(self, subject: str, chapter: str, difficulty: int) -> int:
+        with self._lock:
+            return len(self._questions.get(_key(subject, chapter, difficulty), []))
+
+
+class SQLiteQuestionBankStore(QuestionBankStore):
+    """
+    Keeps the bank in a local SQLite file, shared by the workers of an instance
+    and kept across restarts.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        :param path: Location of the SQLite database file
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS question_bank (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subject TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                difficulty INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                UNIQUE (subject, chapter, difficulty, question) ON CONFLICT IGNORE
+            );
+            """
+        )
+
+    def add(
+        self, subject: str, chapter: str, difficulty: int, questions: list[dict]
+    ) -> None:
+        key = _key(subject, chapter, difficulty)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT INTO question_bank (subject, chapter, difficulty, question, payload)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [(*key, q["question"], json.dumps(q)) for q in questions],
+            )
+
+    def pop(
+        self, subject: str, chapter: str, difficulty: int, exclude: Iterable[str] = ()
+    ) -> dict[str, Any] | None:
+        excluded = list(exclude)
+        placeholders = ", ".join("?" * len(excluded))
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                f"""
+                SELECT id, payload FROM question_bank
+                WHERE subject = ? AND chapter = ? AND difficulty = ?
+                    AND question NOT IN ({placeholders})
+                ORDER BY id
+                LIMIT 1
+                """,
+                (*_key(subject, chapter, difficulty), *excluded),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("DELETE FROM question_bank WHERE id = ?", row[:1])
+        return json.loads(row[1])
+
+    def count(self, subject: str, chapter: str, difficulty: int) -> int:
+        with self._lock:
+            return self._connection.execute(
+                """
+                SELECT COUNT(*) FROM question_bank
+                WHERE subject = ? AND chapter = ? AND difficulty = ?
+                """,
+                _key(subject, chapter, difficulty),
+            ).fetchone()[0]
+
+
+class BigQueryQuestionBankStore(QuestionBankStore):
+    """
+    Keeps the bank in the `question_bank` table, shared by all instances.
+
+    Every call is a query job, so serving from it takes a BigQuery round trip;
+    prefer the SQLite store when instances don't need to share their bank.
+    """
+
+    def __init__(self, max_pop_attempts: int = 3) -> None:
+        """
+        :param max_pop_attempts: Candidates tried when concurrent pops collide
+        """
+        self.max_pop_attempts = max_pop_attempts
+
+    def _table(self) -> tuple[bigquery.Client, str]:
+        project_id = bq_client_pool.default_project()
+        bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
+        bq_table_id = os.getenv("QUESTION_BANK_TABLE_ID", "question_bank")
+        return (
+            bq_client_pool.get_client(LOCATION, project_id),
+            f"{project_id}.{bq_dataset_id}.{bq_table_id}",
+        )
+
+    @staticmethod
+    def _key_parameters(
+        subject: str, chapter: str, difficulty: int
+    ) -> list[bigquery.ScalarQueryParameter]:
+        subject, chapter, difficulty = _key(subject, chapter, difficulty)
+        return [
+            bigquery.ScalarQueryParameter("subject", "STRING", subject),
+            bigquery.ScalarQueryParameter("chapter", "STRING", chapter),
+            bigquery.ScalarQueryParameter("difficulty", "INT64", difficulty),
+        ]
+
+    def add(
+        self, subject: str, chapter: str, difficulty: int, questions: list[dict]
+    ) -> None:
+        if not questions:
+            return
+        client, table = self._table()
+        rows_parameter = bigquery.ArrayQueryParameter(
+            "rows",
+            "STRUCT",
+            [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter("id", "STRING", uuid.uuid4().hex),
+                    bigquery.ScalarQueryParameter(
+                        "question", "STRING", question["question"]
+                    ),
+                    bigquery.ScalarQueryParameter(
+                        "payload", "STRING", json.dumps(question)
+                    ),
+                )
+                for question in questions
+            ],
+        )
+        client.query(
+            f"""
+            MERGE `{table}` T
+            USING (SELECT * FROM UNNEST(@rows)) S
+            ON T.subject = @subject
+                AND T.chapter = @chapter
+                AND T.difficulty = @difficulty
+                AND T.question = S.question
+            WHEN NOT MATCHED THEN INSERT (
+                id, subject, chapter, difficulty, question, payload, created_at
+            ) VALUES (
+                S.id, @subject, @chapter, @difficulty, S.question, S.payload,
+                CURRENT_TIMESTAMP()
+            )
+            """,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    *self._key_parameters(subject, chapter, difficulty),
+                    rows_parameter,
+                ]
+            ),
+        ).result()
+
+    def pop(
+        self, subject: str, chapter: str, difficulty: int, exclude: Iterable[str] = ()
+    ) -> dict[str, Any] | None:
+        client, table = self._table()
+        key_parameters = self._key_parameters(subject, chapter, difficulty)
+        candidates = client.query(
+            f"""
+            SELECT id, payload FROM `{table}`
+            WHERE subject = @subject
+                AND chapter = @chapter
+                AND difficulty = @difficulty
+                AND question NOT IN UNNEST(@exclude)
+            ORDER BY created_at
+            LIMIT @limit
+            """,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    *key_parameters,
+                    bigquery.ArrayQueryParameter("exclude", "STRING", list(exclude)),
+                    bigquery.ScalarQueryParameter(
+                        "limit", "INT64", self.max_pop_attempts
+                    ),
+                ]
+            ),
+        ).result()
+        for row in candidates:
+            # Only the instance whose DELETE removed the row may serve it.
+            delete_job = client.query(
+                f"DELETE FROM `{table}` WHERE id = @id",
+                job_config=bigquery.QueryJobConfig(
+                    query_parameters=[
+                        bigquery.ScalarQueryParameter("id", "STRING", row["id"])
+                    ]
+                ),
+            )
+            delete_job.result()
+            if delete_job.num_dml_affected_rows:
+                return json.loads(row["payload"])
+        return None
+
+    def count(self, subject: str, chapter: str, difficulty: int) -> int:
+        client, table = self._table()
+        results = client.query(
+            f"""
+            SELECT COUNT(*) AS ready FROM `{table}`
+            WHERE subject = @subject AND chapter = @chapter AND difficulty = @difficulty
+            """,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=self._key_parameters(subject, chapter, difficulty)
+            ),
+        ).result()
+        return next(iter(results))["ready"]
+
+
+def create_question_bank_store(backend: str | None = None) -> QuestionBankStore | None:
+    """
+    Builds the question bank store selected by `QUESTION_BANK_BACKEND`.
+
+    Args:
+        backend: One of "sqlite" (default), "bigquery", "memory" or "none", which
+            disables the question bank
+    """
+    backend = backend or os.getenv("QUESTION_BANK_BACKEND", "sqlite")
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteQuestionBankStore(
+            os.getenv(
+                "QUESTION_BANK_PATH",
+                os.path.join(
+                    tempfile.gettempdir(), "study_helper_question_bank.sqlite3"
+                ),
+            )
+        )
+    if backend == "bigquery":
+        return BigQueryQuestionBankStore()
+    if backend == "memory":
+        return InMemoryQuestionBankStore()
+    raise ValueError(f"Unknown question bank backend: {backend}")
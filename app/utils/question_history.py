@@ -0,0 +1,478 @@
+import json
+import re
+import threading
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+from google.adk.agents import BaseAgent
+from google.adk.tools import ToolContext
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.formatting import (
+    format_agent_json,
+    format_bq_string,
+    parse_agent_json,
+    parse_agent_output,
+    request_difficulty,
+)
+from app.utils.maths_exercises import MathsExerciseGenerator
+from app.utils.session_state import set_state_entry
+from app.utils.typing import GeneratedQuestionBatch, rubric_points
+
+QUESTION_HISTORY_KEY = "question_history"
+QUESTION_BATCH_KEY = "question_batch"
+QUESTION_RUBRIC_KEY = "question_rubrics"
+GRADED_QUESTION_KEY = "graded_question"
+
+NUM_PERM = 64
+SHINGLE_SIZE = 4
+
+# Multiply-shift hash functions of the MinHash signatures, fixed so signatures
+# are comparable across processes.
+_rng = np.random.default_rng(20250501)
+_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+
+def _history_key(subject: str, chapter: str) -> str:
+    return f"{format_bq_string(subject)}/{format_bq_string(chapter)}"
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases a question and drops punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w+\-*/=^<>]", " ", question.lower()).split())
+
+
+@lru_cache(maxsize=4096)
+def minhash_signature(question: str) -> np.ndarray:
+    """Returns the MinHash signature of the character shingles of a question."""
+    text = normalize_question(question)
+    shingles = {
+        text[i : i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))
+    }
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode()) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    signature = ((_A[:, None] * hashes[None, :] + _B[:, None]) >> np.uint64(32)).min(
+        axis=1
+    )
+    signature.flags.writeable = False
+    return signature
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index of questions. A question is a near duplicate when the
+    estimated Jaccard similarity of its character shingles with an indexed
+    question reaches `threshold`.
+    """
+
+    def __init__(self, threshold: float = 0.7, bands: int = 32) -> None:
+        """
+        :param threshold: Estimated Jaccard similarity of a near duplicate
+        :param bands: LSH bands the signature is split in; more bands find
+            less similar candidates at the cost of more comparisons
+        """
+        self.threshold = threshold
+        self.bands = bands
+        self._rows = NUM_PERM // bands
+        self._buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+        self._questions: list[str] = []
+        self._signatures: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def add(self, question: str) -> None:
+        """Indexes a question."""
+        signature = minhash_signature(question)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band, key].append(len(self._questions))
+        self._questions.append(question)
+        self._signatures.append(signature)
+
+    def find(self, question: str) -> str | None:
+        """Returns the most similar indexed near duplicate of a question, if any."""
+        signature = minhash_signature(question)
+        candidates = {
+            index
+            for band, key in enumerate(self._band_keys(signature))
+            for index in self._buckets.get((band, key), ())
+        }
+        best, best_similarity = None, self.threshold
+        for index in candidates:
+            similarity = float(np.mean(self._signatures[index] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = self._questions[index], similarity
+        return best
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self._rows : (band + 1) * self._rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+@lru_cache(maxsize=256)
+def _history_index(questions: tuple[str, ...], threshold: float) -> NearDuplicateIndex:
+    index = NearDuplicateIndex(threshold)
+    for question in questions:
+        index.add(question)
+    return index
+
+
+def get_question_history(state: Any, subject: str, chapter: str) -> list[str] | None:
+    """
+    Returns the questions asked to the student for a subject and chapter, oldest
+    first, or None when the history hasn't been loaded in this session yet.
+    """
+    return state.get(QUESTION_HISTORY_KEY, {}).get(_history_key(subject, chapter))
+
+
+def seed_question_history(
+    state: Any, subject: str, chapter: str, questions: list[str]
+) -> None:
+    """Stores the questions of earlier sessions, e.g. read from the results store."""
+    set_state_entry(
+        state, QUESTION_HISTORY_KEY, _history_key(subject, chapter), list(questions)
+    )
+
+
+def record_question(
+    state: Any, subject: str, chapter: str, question: str, max_questions: int = 200
+) -> None:
+    """Adds a question shown to the student, keeping the last `max_questions`."""
+    questions = get_question_history(state, subject, chapter) or []
+    if question in questions:
+        return
+    seed_question_history(
+        state, subject, chapter, [*questions, question][-max_questions:]
+    )
+
+
+def find_near_duplicate(
+    state: Any, subject: str, chapter: str, question: str, threshold: float = 0.7
+) -> str | None:
+    """Returns the asked question that `question` nearly duplicates, if any."""
+    questions = get_question_history(state, subject, chapter)
+    if not questions:
+        return None
+    return _history_index(tuple(questions), threshold).find(question)
+
+
+def batch_difficulties(difficulty: int, batch_size: int) -> list[int]:
+    """
+    Returns the difficulties of a batch of questions: the requested difficulty
+    first, then alternately the difficulties the next answer may move to.
+    """
+    offsets = (0, 1, -1)
+    return [
+        max(1, min(difficulty + offsets[index % len(offsets)], 5))
+        for index in range(batch_size)
+    ]
+
+
+def get_batched_questions(state: Any, subject: str, chapter: str) -> list[dict]:
+    """Returns the questions generated in an earlier batch and not asked yet."""
+    return list(
+        state.get(QUESTION_BATCH_KEY, {}).get(_history_key(subject, chapter)) or []
+    )
+
+
+def store_batched_questions(
+    state: Any, subject: str, chapter: str, questions: list[dict]
+) -> None:
+    """Keeps the questions of a batch for later turns of the session."""
+    set_state_entry(
+        state, QUESTION_BATCH_KEY, _history_key(subject, chapter), list(questions)
+    )
+
+
+def record_rubric(
+    state: Any, question: str, rubric: list[Any], max_rubrics: int = 20
+) -> None:
+    """
+    Keeps the valid points of the rubric of a question shown to the student
+    until it is graded.
+    """
+    set_state_entry(
+        state,
+        QUESTION_RUBRIC_KEY,
+        question,
+        [point.model_dump() for point in rubric_points(rubric)],
+        max_entries=max_rubrics,
+    )
+
+
+def get_rubric(state: Any, question: str) -> list[dict] | None:
+    """Returns the rubric generated with a question, if it was kept."""
+    return state.get(QUESTION_RUBRIC_KEY, {}).get(question)
+
+
+def with_rubric(state: Any, request: dict[str, Any]) -> dict[str, Any]:
+    """Adds the kept rubric of its question to an evaluation request."""
+    if request.get("rubric") or not request.get("question"):
+        return request
+    rubric = get_rubric(state, request["question"])
+    return {**request, "rubric": rubric} if rubric else request
+
+
+def record_graded_question(state: Any, request: dict[str, Any]) -> None:
+    """
+    Keeps the correct answer and rubric of the question in an evaluation
+    request, which are stored with the graded answer.
+    """
+    state[GRADED_QUESTION_KEY] = {
+        "question": request.get("question"),
+        "correct_answer": request.get("correct_answer"),
+        "rubric": request.get("rubric"),
+    }
+
+
+def get_graded_question(state: Any, question: str) -> dict[str, Any] | None:
+    """Returns the correct answer and rubric kept for a graded question."""
+    graded = state.get(GRADED_QUESTION_KEY) or {}
+    return graded if graded.get("question") == question else None
+
+
+class QuestionHistoryAgentTool(AgentTool):
+    """
+    `AgentTool` for the question generation agent that replaces the growing
+    `previous_questions` list of the request with a fixed-size hint of the last
+    questions in the session's question history, and regenerates a question
+    that nearly duplicates one of the history.
+    """
+
+    def __init__(
+        self,
+        agent: BaseAgent,
+        hint_size: int = 5,
+        threshold: float = 0.7,
+        max_generation_attempts: int = 2,
+        exercise_generator: MathsExerciseGenerator | None = None,
+        batch_size: int = 1,
+    ) -> None:
+        """
+        :param agent: The question generation agent
+        :param hint_size: Number of last asked questions passed to the agent
+        :param threshold: Estimated Jaccard similarity of a near duplicate
+        :param max_generation_attempts: Generations before a near duplicate is
+            returned anyway
+        :param exercise_generator: Optional local generator of the questions of
+            maths subjects
+        :param batch_size: Questions generated per agent call
+        """
+        super().__init__(agent=agent)
+        self.hint_size = hint_size
+        self.threshold = threshold
+        self.max_generation_attempts = max_generation_attempts
+        self.exercise_generator = exercise_generator
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "generations": 0,
+            "duplicates_rejected": 0,
+            "batched_questions": 0,
+            "batched_served": 0,
+        }
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns how many generated or banked questions were near duplicates, and
+        how many batched questions were kept and served.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def is_duplicate(self, state: Any, question: dict[str, Any]) -> bool:
+        """Whether a generated question nearly duplicates an asked question."""
+        if not question.get("question"):
+            return False
+        if self.exercise_generator is not None and self.exercise_generator.handles(
+            question.get("subject", ""), question.get("chapter", "")
+        ):
+            # Exercises only differ in their numbers, so only exact repeats,
+            # which the generator excludes, count.
+            return False
+        duplicate = find_near_duplicate(
+            state,
+            question.get("subject", ""),
+            question.get("chapter", ""),
+            question["question"],
+            self.threshold,
+        )
+        if duplicate is not None:
+            self._increment("duplicates_rejected")
+        return duplicate is not None
+
+    def hint(self, state: Any, request: dict[str, Any]) -> list[str]:
+        """Returns the last asked questions, including those of the request."""
+        questions = list(
+            get_question_history(state, request["subject"], request["chapter"]) or []
+        )
+        for question in request.get("previous_questions") or []:
+            if question not in questions:
+                questions.append(question)
+        return questions[-self.hint_size :] if self.hint_size else []
+
+    def exercise(self, state: Any, request: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Returns a locally generated exercise that wasn't asked before, or None
+        when the request isn't for a maths subject.
+        """
+        subject, chapter = request.get("subject"), request.get("chapter")
+        if (
+            self.exercise_generator is None
+            or not subject
+            or not chapter
+            or not self.exercise_generator.handles(subject, chapter)
+        ):
+            return None
+        return self.exercise_generator.generate(
+            subject,
+            chapter,
+            request_difficulty(request),
+            exclude=[
+                *(get_question_history(state, subject, chapter) or []),
+                *(request.get("previous_questions") or []),
+            ],
+        )
+
+    def take_batched(
+        self, state: Any, request: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        """
+        Returns a question of an earlier batch at the requested difficulty, and
+        drops the batched questions that were asked since.
+        """
+        if self.batch_size == 1:
+            return None
+        subject, chapter = request["subject"], request["chapter"]
+        questions = get_batched_questions(state, subject, chapter)
+        if not questions:
+            return None
+        difficulty = request_difficulty(request)
+        asked = {
+            *(get_question_history(state, subject, chapter) or []),
+            *(request.get("previous_questions") or []),
+        }
+        fresh = [
+            question
+            for question in questions
+            if question["question"] not in asked
+            and not self.is_duplicate(state, question)
+        ]
+        question = next(
+            (question for question in fresh if question["difficulty"] == difficulty),
+            None,
+        )
+        if question is not None:
+            fresh.remove(question)
+            self._increment("batched_served")
+        if fresh != questions:
+            store_batched_questions(state, subject, chapter, fresh)
+        return question
+
+    def _generated_questions(self, result: Any) -> list[dict[str, Any]] | None:
+        # The questions of a batch answer, or None for a single question.
+        if self.batch_size == 1:
+            return None
+        batch = parse_agent_output(result, GeneratedQuestionBatch)
+        if batch is None or not batch.questions:
+            return None
+        return [question.model_dump() for question in batch.questions]
+
+    def _keep_batch(
+        self, state: Any, request: dict[str, Any], questions: list[dict[str, Any]]
+    ) -> dict[str, Any] | None:
+        # Returns the question to ask now and keeps the others of the batch.
+        index = NearDuplicateIndex(self.threshold)
+        fresh = []
+        for question in questions:
+            question = {
+                **question,
+                "subject": request["subject"],
+                "chapter": request["chapter"],
+            }
+            if index.find(question["question"]) is None and not self.is_duplicate(
+                state, question
+            ):
+                index.add(question["question"])
+                fresh.append(question)
+        if not fresh:
+            return None
+        difficulty = request_difficulty(request)
+        question = min(fresh, key=lambda q: abs(q["difficulty"] - difficulty))
+        fresh.remove(question)
+        if fresh:
+            self._increment("batched_questions", len(fresh))
+            # Two batches are kept at most; older questions go first.
+            batched = get_batched_questions(
+                state, request["subject"], request["chapter"]
+            )
+            store_batched_questions(
+                state,
+                request["subject"],
+                request["chapter"],
+                [*batched, *fresh][-2 * self.batch_size :],
+            )
+        return question
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        request = parse_agent_json(args.get("request"))
+        if not request.get("subject") or not request.get("chapter"):
+            return await super().run_async(args=args, tool_context=tool_context)
+        question = self.exercise(tool_context.state, request) or self.take_batched(
+            tool_context.state, request
+        )
+        if question is not None:
+            return format_agent_json(question)
+        previous_questions = self.hint(tool_context.state, request)
+        if self.batch_size > 1:
+            request["difficulties"] = batch_difficulties(
+                request_difficulty(request), self.batch_size
+            )
+        result = None
+        for _ in range(self.max_generation_attempts):
+            request["previous_questions"] = previous_questions
+            self._increment("generations")
+            result = await super().run_async(
+                args={"request": json.dumps(request, ensure_ascii=False)},
+                tool_context=tool_context,
+            )
+            questions = self._generated_questions(result)
+            if questions is not None:
+                question = self._keep_batch(tool_context.state, request, questions)
+                if question is not None:
+                    return format_agent_json(question)
+                # Like a single question, a near duplicate is asked anyway when
+                # every attempt repeats the history.
+                result = format_agent_json(
+                    {
+                        **questions[0],
+                        "subject": request["subject"],
+                        "chapter": request["chapter"],
+                    }
+                )
+            else:
+                question = parse_agent_json(result)
+                if not self.is_duplicate(tool_context.state, {**request, **question}):
+                    break
+                questions = [question]
+            # Point the next attempt at the questions it nearly repeated.
+            previous_questions = [
+                *previous_questions,
+                *(question["question"] for question in questions),
+            ][-self.hint_size - len(questions) :]
+        return result
@@ -0,0 +1,204 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any
+
+
+def _is_alive(lock_path: str) -> bool:
+    # An owner is alive while it holds the lock on its lock file, which the
+    # operating system releases when the process exits.
+    try:
+        fd = os.open(lock_path, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+class ResultJournal:
+    """
+    Append-only local journal of quiz results backed by SQLite.
+
+    Every result is committed to the journal before it is acknowledged to the
+    student and removed once it has been flushed to the results table. Rows are
+    owned by a token unique to the process that appended them, which holds a
+    lock on the token's file next to the journal for as long as it runs.
+    Workers sharing a journal only replay the rows of owners whose lock is
+    free, never the rows another live worker still has buffered, and a
+    restarted process that gets the same process id still replays its
+    predecessor's rows.
+
+    The journal must live on a filesystem local to the host that supports
+    `flock`, and outlives the process only as long as that filesystem does.
+    """
+
+    def __init__(self, path: str, owner: str | None = None) -> None:
+        """
+        :param path: Location of the SQLite database file
+        :param owner: Token recorded with appended rows, defaults to a token
+            unique to the current process
+        """
+        self.path = path
+        self._owner = owner
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        # Token and owner lock of the current process, as (pid, value).
+        self._token: tuple[int, str] | None = None
+        self._owner_fd: tuple[int, int] | None = None
+
+    @property
+    def owner(self) -> str:
+        """Token of the process owning the rows appended from here."""
+        if self._owner is not None:
+            return self._owner
+        pid = os.getpid()
+        if self._token is None or self._token[0] != pid:
+            self._token = (pid, f"{pid}-{uuid.uuid4().hex}")
+        return self._token[1]
+
+    def append(self, row: dict[str, Any]) -> int:
+        """Durably records a row and returns its journal id."""
+        payload = json.dumps(row, default=str)
+        with self._lock:
+            connection = self._connect()
+            self._hold_owner_lock()
+            cursor = connection.execute(
+                "INSERT INTO results (owner, row) VALUES (?, ?)",
+                (self.owner, payload),
+            )
+            connection.commit()
+        assert cursor.lastrowid is not None
+        return cursor.lastrowid
+
+    def mark_flushed(self, ids: list[int]) -> None:
+        """Removes rows that have been written to the results table."""
+        if not ids:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "DELETE FROM results WHERE id = ?", [(id_,) for id_ in ids]
+            )
+            connection.commit()
+
+    def pending(self) -> list[tuple[int, dict[str, Any]]]:
+        """Returns all unflushed rows in the order they were appended."""
+        with self._lock:
+            records = (
+                self._connect()
+                .execute("SELECT id, row FROM results ORDER BY id")
+                .fetchall()
+            )
+        return [(id_, json.loads(row)) for id_, row in records]
+
+    def claim_orphaned(self) -> list[tuple[int, dict[str, Any]]]:
+        """
+        Takes over the unflushed rows of processes that are no longer running
+        and returns them in the order they were appended.
+        """
+        with self._lock:
+            connection = self._connect()
+            # Lock the journal so two workers can't claim the same rows.
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._hold_owner_lock()
+                owners = [
+                    owner
+                    for (owner,) in connection.execute(
+                        "SELECT DISTINCT owner FROM results WHERE owner != ?",
+                        (self.owner,),
+                    )
+                    if not _is_alive(self._owner_lock_path(owner))
+                ]
+                records = []
+                for owner in owners:
+                    records.extend(
+                        connection.execute(
+                            "SELECT id, row FROM results WHERE owner = ?", (owner,)
+                        ).fetchall()
+                    )
+                    connection.execute(
+                        "UPDATE results SET owner = ? WHERE owner = ?",
+                        (self.owner, owner),
+                    )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            for owner in owners:
+                try:
+                    os.remove(self._owner_lock_path(owner))
+                except FileNotFoundError:
+                    pass
+        return [(id_, json.loads(row)) for id_, row in sorted(records)]
+
+    def close(self) -> None:
+        """
+        Closes the journal and releases its rows, which the next writer to
+        claim orphaned rows takes over.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            if self._owner_fd is not None and self._owner_fd[0] == os.getpid():
+                try:
+                    os.remove(self._owner_lock_path(self.owner))
+                except FileNotFoundError:
+                    pass
+                os.close(self._owner_fd[1])
+            self._owner_fd = None
+
+    def _owner_lock_path(self, owner: Any) -> str:
+        return f"{self.path}.owners/{owner}.lock"
+
+    def _hold_owner_lock(self) -> None:
+        # Taken before the first row is appended or claimed and held until the
+        # process exits; a forked child takes the lock of its own token.
+        if self._owner_fd is not None and self._owner_fd[0] == os.getpid():
+            return
+        lock_path = self._owner_lock_path(self.owner)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._owner_fd = (os.getpid(), fd)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections don't survive a fork, so every process opens its own.
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL DEFAULT '',
+                row TEXT NOT NULL
+            )
+            """
+        )
+        columns = [
+            column[1] for column in connection.execute("PRAGMA table_info(results)")
+        ]
+        if "owner" not in columns:
+            connection.execute(
+                "ALTER TABLE results ADD COLUMN owner TEXT NOT NULL DEFAULT ''"
+            )
+        connection.commit()
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
@@ -0,0 +1,235 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.utils.result_journal import ResultJournal
+from app.utils.result_store import result_store
+
+_STOP = object()
+
+
+class BufferedResultWriter:
+    """
+    Write-behind buffer for quiz results.
+
+    `submit` only enqueues the row, so the student never waits for the results
+    store. A
+    background worker flushes batches once `max_batch_size` rows are buffered or
+    the oldest buffered row is `max_batch_age` seconds old, retrying failed
+    flushes with exponential backoff.
+
+    With a journal, rows are recorded durably before `submit` returns and only
+    removed from the journal after a successful flush, so results survive failed
+    flushes and crashes. `replay_journal` picks up the rows this writer dropped
+    and those left behind by processes that are no longer running.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[list[dict[str, Any]]], None],
+        max_batch_size: int = 50,
+        max_batch_age: float = 2.0,
+        max_retries: int = 5,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_queue_size: int = 10_000,
+        journal: ResultJournal | None = None,
+    ) -> None:
+        """
+        :param flush_fn: Callable persisting a batch of rows, raising on failure
+        :param max_batch_size: Number of rows that triggers a flush
+        :param max_batch_age: Seconds a row may wait in the buffer before a flush
+        :param max_retries: Retries of a failed flush before the batch is dropped
+        :param initial_backoff: Seconds to wait before the first retry
+        :param max_backoff: Upper bound of the wait between retries
+        :param max_queue_size: Rows buffered before `submit` blocks
+        :param journal: Optional write-ahead journal for crash safety
+        """
+        self.flush_fn = flush_fn
+        self.max_batch_size = max_batch_size
+        self.max_batch_age = max_batch_age
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.journal = journal
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._closed = False
+        self._dropped: list[tuple[int, dict[str, Any]]] = []
+        self._stats = {
+            "rows_submitted": 0,
+            "rows_flushed": 0,
+            "rows_dropped": 0,
+            "rows_replayed": 0,
+            "batches_flushed": 0,
+            "flush_failures": 0,
+            "flush_retries": 0,
+        }
+
+    def submit(self, row: dict[str, Any]) -> None:
+        """Buffers a row for the background worker and returns immediately."""
+        if self._closed:
+            raise RuntimeError("Cannot submit results to a closed writer")
+        journal_id = self.journal.append(row) if self.journal else None
+        self._ensure_worker()
+        self._queue.put((journal_id, row))
+        self._increment("rows_submitted")
+
+    def replay_journal(self) -> int:
+        """
+        Re-queues the journaled rows this writer dropped after its retries and
+        the rows left in the journal by processes that are no longer running.
+        Rows other live workers still have buffered are left alone.
+        """
+        if self.journal is None:
+            return 0
+        with self._lock:
+            pending, self._dropped = self._dropped, []
+        pending.extend(self.journal.claim_orphaned())
+        if pending:
+            self._ensure_worker()
+            for entry in pending:
+                self._queue.put(entry)
+            self._increment("rows_replayed", len(pending))
+            logging.info(f"Replaying {len(pending)} journaled results")
+        return len(pending)
+
+    def stats(self) -> dict[str, int]:
+        """Returns flush counters and the current queue depth."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        """Stops accepting rows and waits for the buffered rows to be flushed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+        if worker is None:
+            return
+        self._queue.put(_STOP)
+        worker.join(timeout)
+        if worker.is_alive():
+            logging.warning(
+                f"Result writer did not drain within {timeout}s, "
+                f"{self._queue.qsize()} rows still buffered"
+            )
+        elif self.journal is not None:
+            self.journal.close()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="result-writer", daemon=True
+                )
+                self._worker.start()
+
+    def _increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: list[tuple[int | None, dict[str, Any]]] = []
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch.append(item)
+            deadline = time.monotonic() + self.max_batch_age
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+        # Drain whatever was submitted concurrently with close().
+        remaining_rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining_rows.append(item)
+        for start in range(0, len(remaining_rows), self.max_batch_size):
+            self._flush(remaining_rows[start : start + self.max_batch_size])
+
+    def _flush(self, batch: list[tuple[int | None, dict[str, Any]]]) -> None:
+        rows = [row for _, row in batch]
+        backoff = self.initial_backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush_fn(rows)
+            except Exception as e:
+                self._increment("flush_failures")
+                if attempt == self.max_retries:
+                    kept = " (kept in journal)" if self.journal is not None else ""
+                    logging.error(
+                        f"Dropping {len(batch)} results{kept} after "
+                        f"{self.max_retries} retries: {e}"
+                    )
+                    self._increment("rows_dropped", len(batch))
+                    if self.journal is not None:
+                        with self._lock:
+                            self._dropped.extend(
+                                (journal_id, row)
+                                for journal_id, row in batch
+                                if journal_id
+                            )
+                    return
+                logging.warning(f"Flushing {len(batch)} results failed: {e}")
+                self._increment("flush_retries")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if self.journal is not None:
+                self.journal.mark_flushed(
+                    [journal_id for journal_id, _ in batch if journal_id]
+                )
+            self._increment("rows_flushed", len(batch))
+            self._increment("batches_flushed")
+            return
+
+
+# Without a journal path, e.g. locally, buffered results are lost on a crash.
+RESULT_JOURNAL_PATH = os.getenv("RESULT_JOURNAL_PATH")
+
+# Score totals are merged in larger batches than the results are inserted. Rows
+# inserted but not merged when the process dies are repaired by a backfill.
+rollup_writer = BufferedResultWriter(
+    flush_fn=result_store.update_totals,
+    max_batch_size=int(os.getenv("ROLLUP_BATCH_SIZE", "500")),
+    max_batch_age=float(os.getenv("ROLLUP_BATCH_MAX_AGE", "30.0")),
+)
+
+
+def insert_results(rows: list[dict[str, Any]]) -> None:
+    """Inserts a batch of results and queues them for the score totals."""
+    result_store.insert_rows(rows)
+    for row in rows:
+        rollup_writer.submit(row)
+
+
+result_writer = BufferedResultWriter(
+    flush_fn=insert_results,
+    max_batch_size=int(os.getenv("RESULT_BATCH_SIZE", "50")),
+    max_batch_age=float(os.getenv("RESULT_BATCH_MAX_AGE", "2.0")),
+    journal=ResultJournal(RESULT_JOURNAL_PATH) if RESULT_JOURNAL_PATH else None,
+)
@@ -0,0 +1,305 @@
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.bigquery import bq_client_pool
+from app.utils.formatting import format_bq_string
+from app.utils.score_rollup import get_rollup_totals, merge_into_rollup, row_id
+from app.utils.scores import build_score_totals
+
+LOCATION = "europe-west1"
+
+
+class ResultStore(ABC):
+    """Storage of graded answers and of the score totals derived from them."""
+
+    @abstractmethod
+    def insert_rows(self, rows: list[dict[str, Any]]) -> None:
+        """Persists a batch of question/answer rows."""
+
+    def update_totals(self, rows: list[dict[str, Any]]) -> None:
+        """
+        Adds persisted rows to the score totals, for stores that don't update
+        them in `insert_rows`. Rows may be passed more than once.
+        """
+        return
+
+    @abstractmethod
+    def get_totals(
+        self, user_id: str, session_id: str, subject: str, chapter: str
+    ) -> dict[str, Any]:
+        """
+        Returns `total_student_score`, `total_max_score` and `total_percentage` of
+        a user's session for a subject and chapter, all None without answers.
+        """
+
+    @abstractmethod
+    def get_asked_questions(
+        self, user_id: str, subject: str, chapter: str, limit: int
+    ) -> list[str]:
+        """
+        Returns the last `limit` questions a user answered for a subject and
+        chapter over all sessions, oldest first.
+        """
+
+
+class BigQueryResultStore(ResultStore):
+    """
+    Stores results in the `question_answer` table and its score rollup.
+
+    Rows are streamed into the results table as they are flushed, the rollup is
+    merged separately in larger batches by `update_totals`, which keeps the
+    number of concurrent DML statements on the rollup table down.
+    """
+
+    def insert_rows(self, rows: list[dict[str, Any]]) -> None:
+        project_id = bq_client_pool.default_project()
+        bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
+        bq_table_id = os.getenv("TABLE_ID", "question_answer")
+
+        table = bq_client_pool.get_table(
+            f"{project_id}.{bq_dataset_id}.{bq_table_id}", LOCATION, project_id
+        )
+        rows = [{**row, "row_id": row_id(row)} for row in rows]
+        errors = bq_client_pool.get_client(LOCATION, project_id).insert_rows(
+            table, rows, row_ids=[row["row_id"] for row in rows]
+        )
+        if errors:
+            raise RuntimeError(f"BigQuery rejected rows: {errors}")
+
+    def update_totals(self, rows: list[dict[str, Any]]) -> None:
+        merge_into_rollup(rows)
+
+    def get_totals(
+        self, user_id: str, session_id: str, subject: str, chapter: str
+    ) -> dict[str, Any]:
+        return get_rollup_totals(user_id, session_id, subject, chapter)
+
+    def get_asked_questions(
+        self, user_id: str, subject: str, chapter: str, limit: int
+    ) -> list[str]:
+        project_id = bq_client_pool.default_project()
+        bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
+        bq_table_id = os.getenv("TABLE_ID", "question_answer")
+
+        results = (
+            bq_client_pool.get_client(LOCATION, project_id)
+            .query(
+                f"""
+                SELECT question FROM `{project_id}.{bq_dataset_id}.{bq_table_id}`
+                WHERE userId = @user_id AND subject = @subject AND chapter = @chapter
+                ORDER BY timestamp DESC
+                LIMIT @limit
+                """,
+                job_config=bigquery.QueryJobConfig(
+                    query_parameters=[
+                        bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                        bigquery.ScalarQueryParameter(
+                            "subject", "STRING", format_bq_string(subject)
+                        ),
+                        bigquery.ScalarQueryParameter(
+                            "chapter", "STRING", format_bq_string(chapter)
+                        ),
+                        bigquery.ScalarQueryParameter("limit", "INT64", limit),
+                    ]
+                ),
+            )
+            .result()
+        )
+        return [row["question"] for row in results][::-1]
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    Stores results in a local SQLite database, mirroring the BigQuery tables.
+
+    Useful for local runs, tests and load tests that should not depend on a live
+    project.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        :param path: Location of the SQLite database file
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS question_answer (
+                userId TEXT NOT NULL,
+                sessionId TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                student_score INTEGER NOT NULL,
+                max_score INTEGER NOT NULL,
+                difficulty INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                correct_answer TEXT,
+                rubric TEXT
+            );
+            CREATE TABLE IF NOT EXISTS question_answer_rollup (
+                userId TEXT NOT NULL,
+                sessionId TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                chapter TEXT NOT NULL,
+                total_student_score INTEGER NOT NULL,
+                total_max_score INTEGER NOT NULL,
+                answered_questions INTEGER NOT NULL,
+                PRIMARY KEY (userId, sessionId, subject, chapter)
+            );
+            """
+        )
+        # Databases created before the correct answer and rubric were stored.
+        columns = {
+            column[1]
+            for column in self._connection.execute("PRAGMA table_info(question_answer)")
+        }
+        for column in ("correct_answer", "rubric"):
+            if column not in columns:
+                self._connection.execute(
+                    f"ALTER TABLE question_answer ADD COLUMN {column} TEXT"
+                )
+
+    def insert_rows(self, rows: list[dict[str, Any]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT INTO question_answer VALUES (
+                    :userId, :sessionId, :subject, :chapter, :question, :answer,
+                    :student_score, :max_score, :difficulty, :timestamp,
+                    :correct_answer, :rubric
+                )
+                """,
+                [
+                    {
+                        "correct_answer": None,
+                        "rubric": None,
+                        **row,
+                        "timestamp": str(row["timestamp"]),
+                    }
+                    for row in rows
+                ],
+            )
+            self._connection.executemany(
+                """
+                INSERT INTO question_answer_rollup VALUES (
+                    :userId, :sessionId, :subject, :chapter,
+                    :student_score, :max_score, 1
+                )
+                ON CONFLICT (userId, sessionId, subject, chapter) DO UPDATE SET
+                    total_student_score = total_student_score + excluded.total_student_score,
+                    total_max_score = total_max_score + excluded.total_max_score,
+                    answered_questions = answered_questions + 1
+                """,
+                rows,
+            )
+
+    def get_totals(
+        self, user_id: str, session_id: str, subject: str, chapter: str
+    ) -> dict[str, Any]:
+        with self._lock:
+            row = self._connection.execute(
+                """
+                SELECT total_student_score, total_max_score
+                FROM question_answer_rollup
+                WHERE userId = ? AND sessionId = ? AND subject = ? AND chapter = ?
+                """,
+                (
+                    user_id,
+                    session_id,
+                    format_bq_string(subject),
+                    format_bq_string(chapter),
+                ),
+            ).fetchone()
+        return build_score_totals(*row) if row else build_score_totals(None, None)
+
+    def get_asked_questions(
+        self, user_id: str, subject: str, chapter: str, limit: int
+    ) -> list[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT question FROM question_answer
+                WHERE userId = ? AND subject = ? AND chapter = ?
+                ORDER BY timestamp DESC, rowid DESC
+                LIMIT ?
+                """,
+                (
+                    user_id,
+                    format_bq_string(subject),
+                    format_bq_string(chapter),
+                    limit,
+                ),
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+
+class InMemoryResultStore(ResultStore):
+    """Keeps results in process memory, e.g. for unit tests and benchmarks."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.rows: list[dict[str, Any]] = []
+        self._rollup: dict[tuple[str, str, str, str], tuple[int, int]] = {}
+
+    def insert_rows(self, rows: list[dict[str, Any]]) -> None:
+        with self._lock:
+            self.rows.extend(rows)
+            for row in rows:
+                key = (row["userId"], row["sessionId"], row["subject"], row["chapter"])
+                student_score, max_score = self._rollup.get(key, (0, 0))
+                self._rollup[key] = (
+                    student_score + row["student_score"],
+                    max_score + row["max_score"],
+                )
+
+    def get_totals(
+        self, user_id: str, session_id: str, subject: str, chapter: str
+    ) -> dict[str, Any]:
+        key = (
+            user_id,
+            session_id,
+            format_bq_string(subject),
+            format_bq_string(chapter),
+        )
+        with self._lock:
+            totals = self._rollup.get(key)
+        return build_score_totals(*totals) if totals else build_score_totals(None, None)
+
+    def get_asked_questions(
+        self, user_id: str, subject: str, chapter: str, limit: int
+    ) -> list[str]:
+        key = (user_id, format_bq_string(subject), format_bq_string(chapter))
+        with self._lock:
+            questions = [
+                row["question"]
+                for row in self.rows
+                if (row["userId"], row["subject"], row["chapter"]) == key
+            ]
+        return questions[-limit:] if limit else []
+
+
+def create_result_store(backend: str | None = None) -> ResultStore:
+    """
+    Builds the result store selected by `RESULTS_BACKEND`.
+
+    Args:
+        backend: One of "bigquery" (default), "sqlite" or "memory"
+    """
+    backend = backend or os.getenv("RESULTS_BACKEND", "bigquery")
+    if backend == "bigquery":
+        return BigQueryResultStore()
+    if backend == "sqlite":
+        return SQLiteResultStore(os.getenv("RESULTS_SQLITE_PATH", "results.sqlite3"))
+    if backend == "memory":
+        return InMemoryResultStore()
+    raise ValueError(f"Unknown results backend: {backend}")
+
+
+result_store = create_result_store()
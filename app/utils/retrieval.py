@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import re
+from collections.abc import Callable
+from typing import Any
+
+import vertexai
+from google.adk.models import LlmRequest
+from google.adk.tools import ToolContext
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
+from google.cloud.aiplatform import initializer
+from google.genai import types
+from vertexai.preview import rag
+
+from app.utils.cache import LruTtlCache
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes case, whitespace and trailing punctuation of a retrieval query."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").casefold()
+
+
+def scoped_declaration(name: str, description: str) -> types.FunctionDeclaration:
+    """Declares a retrieval tool taking an optional subject and chapter scope."""
+    return types.FunctionDeclaration(
+        name=name,
+        description=description,
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING, description="The query to retrieve."
+                ),
+                "subject": types.Schema(
+                    type=types.Type.STRING,
+                    description="The subject to restrict the retrieval to.",
+                ),
+                "chapter": types.Schema(
+                    type=types.Type.STRING,
+                    description="The chapter of the subject to restrict the retrieval to.",
+                ),
+            },
+            required=["query"],
+        ),
+    )
+
+
+class CachedVertexAiRagRetrieval(VertexAiRagRetrieval):
+    """
+    `VertexAiRagRetrieval` that serves repeated queries from an LRU/TTL cache.
+
+    Gemini 2 models normally get the corpus attached as built-in retrieval, which
+    runs server side and cannot be cached. This tool always exposes itself as a
+    function declaration instead, so every retrieval goes through `run_async`
+    and its results are cached per normalized query and rag resources. Entries
+    are tagged with their corpus so `invalidate_corpus` can drop them after a
+    re-import.
+
+    With a `scope_fn` the tool also takes a subject and chapter and only searches
+    the files of that chapter. With a `corpus_fn` the corpus is resolved on the
+    first retrieval instead of when the tool is built.
+    """
+
+    def __init__(
+        self,
+        *,
+        cache: LruTtlCache,
+        project: str | None = None,
+        location: str | None = None,
+        scope_fn: Callable[[str, str | None], list[str]] | None = None,
+        corpus_fn: Callable[[], str] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param cache: Cache holding the retrieved contexts
+        :param project: Project of the RAG corpus
+        :param location: Location of the RAG corpus, re-applied before a query
+            when Vertex AI was initialised elsewhere
+        :param scope_fn: Optional callable returning the RAG file resource names
+            of a subject and chapter
+        :param corpus_fn: Optional callable returning the resource name of the
+            corpus, used instead of `rag_resources`
+        :param kwargs: Arguments of `VertexAiRagRetrieval`
+        """
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.project = project
+        self.location = location
+        self.scope_fn = scope_fn
+        self.corpus_fn = corpus_fn
+
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        if self.scope_fn is None:
+            return super()._get_declaration()
+        return scoped_declaration(self.name, self.description)
+
+    async def process_llm_request(
+        self, *, tool_context: ToolContext, llm_request: LlmRequest
+    ) -> None:
+        await BaseRetrievalTool.process_llm_request(
+            self, tool_context=tool_context, llm_request=llm_request
+        )
+
+    async def run_async(
+        self, *, args: dict[str, Any], tool_context: ToolContext
+    ) -> Any:
+        # Resolving the corpus and scope and querying it block, so they run off
+        # the event loop.
+        contexts = await asyncio.to_thread(
+            self.retrieve,
+            args["query"],
+            subject=args.get("subject"),
+            chapter=args.get("chapter"),
+        )
+        if not contexts:
+            return f"No matching result found with the config: {self.vertex_rag_store}"
+        return [text for _, text in contexts]
+
+    def retrieve(
+        self,
+        query: str,
+        subject: str | None = None,
+        chapter: str | None = None,
+        top_k: int | None = None,
+    ) -> list[tuple[str, str]]:
+        """
+        Returns the (source uri, text) of the contexts matching a query, scoped
+        to the files of a subject and chapter when those are known.
+
+        :param top_k: Number of contexts to return instead of the tool's
+            `similarity_top_k`
+        """
+        rag_resources = self._rag_resources(subject, chapter)
+        top_k = top_k or self.vertex_rag_store.similarity_top_k
+        key = (
+            normalize_query(query),
+            self._resource_key(rag_resources),
+            top_k,
+            self.vertex_rag_store.vector_distance_threshold,
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self._ensure_location()
+        response = rag.retrieval_query(
+            text=query,
+            rag_resources=rag_resources,
+            rag_corpora=self.vertex_rag_store.rag_corpora,
+            similarity_top_k=top_k,
+            vector_distance_threshold=self.vertex_rag_store.vector_distance_threshold,
+        )
+        contexts = [
+            (context.source_uri, context.text) for context in response.contexts.contexts
+        ]
+        # Don't pin misses, so newly imported files are found on the next call.
+        if contexts:
+            self.cache.put(
+                key,
+                contexts,
+                tags=[resource.rag_corpus for resource in rag_resources]
+                + list(self.vertex_rag_store.rag_corpora or []),
+            )
+        return contexts
+
+    def invalidate_corpus(self, corpus: str | None = None) -> None:
+        """Drops the cached contexts of a corpus, or of all corpora."""
+        dropped = self.cache.invalidate(corpus)
+        logging.info(
+            f"Dropped {dropped} cached retrievals of {corpus or 'all corpora'}"
+        )
+
+    def _ensure_location(self) -> None:
+        # The root agent initialises Vertex AI in its own location, so switch
+        # back only when the global location isn't the corpus location.
+        if self.location and initializer.global_config.location != self.location:
+            vertexai.init(project=self.project, location=self.location)
+
+    def _rag_resources(self, subject: str | None, chapter: str | None) -> list:
+        if self.corpus_fn is not None:
+            resources = [rag.RagResource(rag_corpus=self.corpus_fn())]
+        else:
+            resources = self.vertex_rag_store.rag_resources or []
+        if self.scope_fn is None or not subject:
+            return resources
+        files = self.scope_fn(subject, chapter)
+        if not files:
+            # Unknown subject or chapter, search the whole corpus.
+            return resources
+        file_ids = [name.rsplit("/", 1)[-1] for name in files]
+        return [
+            rag.RagResource(rag_corpus=resource.rag_corpus, rag_file_ids=file_ids)
+            for resource in resources
+        ]
+
+    def _resource_key(self, rag_resources: list) -> tuple:
+        return tuple(
+            (resource.rag_corpus, tuple(sorted(resource.rag_file_ids or ())))
+            for resource in rag_resources
+        ) + tuple(self.vertex_rag_store.rag_corpora or [])
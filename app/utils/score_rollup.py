@@ -0,0 +1,300 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+from typing import Any
+
+from google.cloud import bigquery
+
+from app.utils.bigquery import bq_client_pool
+from app.utils.formatting import format_bq_string
+
+LOCATION = "europe-west1"
+# A row is merged after it was answered, so only merged ids recorded since the
+# batch's first answer, minus this margin for clock and time zone skew, are
+# looked up. The merged ids table expires its partitions after 30 days.
+MERGED_LOOKBACK = datetime.timedelta(days=1)
+
+_ROLLUP_COLUMNS = """
+    total_student_score,
+    total_max_score,
+    answered_questions,
+    last_answer_at
+"""
+
+
+def row_id(row: dict[str, Any]) -> str:
+    """
+    Deterministic id of a question/answer row, so retried and replayed rows are
+    deduplicated by the streaming insert and counted once in the rollup.
+    """
+    fields = {key: value for key, value in row.items() if key != "row_id"}
+    return hashlib.sha1(
+        json.dumps(fields, default=str, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def _table_ids(project_id: str) -> tuple[str, str, str]:
+    bq_dataset_id = os.getenv("DATASET_ID", "student_helper")
+    bq_table_id = os.getenv("TABLE_ID", "question_answer")
+    bq_rollup_table_id = os.getenv("ROLLUP_TABLE_ID", "question_answer_rollup")
+    bq_merged_table_id = os.getenv(
+        "ROLLUP_MERGED_TABLE_ID", "question_answer_rollup_merged"
+    )
+    return (
+        f"{project_id}.{bq_dataset_id}.{bq_table_id}",
+        f"{project_id}.{bq_dataset_id}.{bq_rollup_table_id}",
+        f"{project_id}.{bq_dataset_id}.{bq_merged_table_id}",
+    )
+
+
+def _transaction(*statements: str) -> str:
+    body = ";\n".join(statements)
+    return f"BEGIN TRANSACTION;\n{body};\nCOMMIT TRANSACTION;"
+
+
+def _merge_statement(rollup_table: str, source: str, matched_update: str) -> str:
+    return f"""
+        MERGE `{rollup_table}` T
+        USING ({source}) S
+        ON T.answer_date = S.answer_date
+            AND T.userId = S.userId
+            AND T.sessionId = S.sessionId
+            AND T.subject = S.subject
+            AND T.chapter = S.chapter
+        WHEN MATCHED THEN UPDATE SET {matched_update}
+        WHEN NOT MATCHED THEN INSERT (
+            userId, sessionId, subject, chapter, answer_date, {_ROLLUP_COLUMNS}
+        ) VALUES (
+            S.userId, S.sessionId, S.subject, S.chapter, S.answer_date,
+            S.total_student_score, S.total_max_score, S.answered_questions,
+            S.last_answer_at
+        )
+    """
+
+
+def merge_into_rollup(rows: list[dict[str, Any]]) -> None:
+    """
+    Adds a batch of question/answer rows to the per user/session/subject/chapter
+    totals of the rollup table.
+
+    The ids of merged rows are recorded in the same transaction, and rows whose
+    id is already recorded are skipped, so a batch that is retried or replayed
+    from the journal is only counted once. Only the partitions of the merged ids
+    since the batch's first answer are read, which keeps the lookup independent
+    of the length of the history.
+    """
+    if not rows:
+        return
+    project_id = bq_client_pool.default_project()
+    _, rollup_table, merged_table = _table_ids(project_id)
+    merged_since = (
+        min(datetime.datetime.fromisoformat(str(row["timestamp"])) for row in rows)
+        - MERGED_LOOKBACK
+    )
+
+    new_rows = f"""
+        SELECT DISTINCT *
+        FROM UNNEST(@rows)
+        WHERE row_id NOT IN (
+            SELECT row_id FROM `{merged_table}` WHERE merged_at >= @merged_since
+        )
+    """
+    source = f"""
+        SELECT
+            userId,
+            sessionId,
+            subject,
+            chapter,
+            DATE(TIMESTAMP(timestamp)) AS answer_date,
+            SUM(student_score) AS total_student_score,
+            SUM(max_score) AS total_max_score,
+            COUNT(*) AS answered_questions,
+            MAX(TIMESTAMP(timestamp)) AS last_answer_at
+        FROM ({new_rows})
+        GROUP BY userId, sessionId, subject, chapter, answer_date
+    """
+    matched_update = """
+        total_student_score = T.total_student_score + S.total_student_score,
+        total_max_score = T.total_max_score + S.total_max_score,
+        answered_questions = T.answered_questions + S.answered_questions,
+        last_answer_at = GREATEST(T.last_answer_at, S.last_answer_at)
+    """
+    rows_parameter = bigquery.ArrayQueryParameter(
+        "rows",
+        "STRUCT",
+        [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter("row_id", "STRING", row_id(row)),
+                bigquery.ScalarQueryParameter("userId", "STRING", row["userId"]),
+                bigquery.ScalarQueryParameter("sessionId", "STRING", row["sessionId"]),
+                bigquery.ScalarQueryParameter("subject", "STRING", row["subject"]),
+                bigquery.ScalarQueryParameter("chapter", "STRING", row["chapter"]),
+                bigquery.ScalarQueryParameter(
+                    "student_score", "INT64", row["student_score"]
+                ),
+                bigquery.ScalarQueryParameter("max_score", "INT64", row["max_score"]),
+                bigquery.ScalarQueryParameter(
+                    "timestamp", "STRING", str(row["timestamp"])
+                ),
+            )
+            for row in rows
+        ],
+    )
+    bq_client_pool.get_client(LOCATION, project_id).query(
+        _transaction(
+            _merge_statement(rollup_table, source, matched_update),
+            f"""
+            INSERT INTO `{merged_table}` (row_id, merged_at)
+            SELECT DISTINCT row_id, CURRENT_TIMESTAMP() FROM ({new_rows})
+            """,
+        ),
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[
+                rows_parameter,
+                bigquery.ScalarQueryParameter(
+                    "merged_since", "TIMESTAMP", merged_since
+                ),
+            ]
+        ),
+    ).result()
+
+
+def get_rollup_totals(
+    user_id: str, session_id: str, subject: str, chapter: str
+) -> dict[str, Any]:
+    """Reads the score totals of a user's session for a subject and chapter."""
+    project_id = bq_client_pool.default_project()
+    _, rollup_table, _ = _table_ids(project_id)
+
+    sql_query = f"""
+        SELECT
+            SUM(total_student_score) AS total_student_score,
+            SUM(total_max_score) AS total_max_score,
+            (SUM(total_student_score) * 100.0 / SUM(total_max_score)) AS total_percentage
+        FROM `{rollup_table}`
+        WHERE userId = @user_id
+            AND sessionId = @session_id
+            AND subject = @subject
+            AND chapter = @chapter
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("session_id", "STRING", session_id),
+            bigquery.ScalarQueryParameter(
+                "subject", "STRING", format_bq_string(subject)
+            ),
+            bigquery.ScalarQueryParameter(
+                "chapter", "STRING", format_bq_string(chapter)
+            ),
+        ]
+    )
+    results = (
+        bq_client_pool.get_client(LOCATION, project_id)
+        .query(sql_query, job_config=job_config)
+        .result()
+    )
+    return dict(next(iter(results)).items())
+
+
+def backfill_rollup(project_id: str, since: str | None = None) -> None:
+    """
+    Recomputes the rollup table from the raw question/answer table.
+
+    Totals of the days that are backfilled are replaced, so the job can be rerun
+    safely, e.g. to repair the rollup after failed merges. Raw rows stored more
+    than once are counted once, and their ids are recorded as merged so later
+    merges of the same rows are skipped.
+
+    Args:
+        project_id: Project holding the dataset
+        since: Optional first day (YYYY-MM-DD) to recompute, defaults to all days
+    """
+    raw_table, rollup_table, merged_table = _table_ids(project_id)
+    merged_filter = (
+        "WHERE merged_at >= "
+        f"TIMESTAMP(DATE_SUB(@since, INTERVAL {MERGED_LOOKBACK.days} DAY))"
+        if since
+        else ""
+    )
+    # Rows written before row ids were stored have none and are kept as is.
+    raw_rows = f"""
+        SELECT * EXCEPT (copy)
+        FROM (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY IFNULL(row_id, GENERATE_UUID())
+                ) AS copy
+            FROM `{raw_table}`
+            WHERE @since IS NULL OR DATE(timestamp) >= @since
+        )
+        WHERE copy = 1
+    """
+    source = f"""
+        SELECT
+            userId,
+            sessionId,
+            subject,
+            chapter,
+            DATE(timestamp) AS answer_date,
+            SUM(student_score) AS total_student_score,
+            SUM(max_score) AS total_max_score,
+            COUNT(*) AS answered_questions,
+            MAX(timestamp) AS last_answer_at
+        FROM ({raw_rows})
+        GROUP BY userId, sessionId, subject, chapter, answer_date
+    """
+    matched_update = """
+        total_student_score = S.total_student_score,
+        total_max_score = S.total_max_score,
+        answered_questions = S.answered_questions,
+        last_answer_at = S.last_answer_at
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("since", "DATE", since)]
+    )
+    bq_client_pool.get_client(LOCATION, project_id).query(
+        _transaction(
+            _merge_statement(rollup_table, source, matched_update),
+            f"""
+            INSERT INTO `{merged_table}` (row_id, merged_at)
+            SELECT row_id, CURRENT_TIMESTAMP()
+            FROM ({raw_rows})
+            WHERE row_id IS NOT NULL
+                AND row_id NOT IN (
+                    SELECT row_id FROM `{merged_table}` {merged_filter}
+                )
+            """,
+        ),
+        job_config=job_config,
+    ).result()
+    logging.info(f"Backfilled {rollup_table} since {since or 'the first answer'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Backfill the score rollup table from the raw results table"
+    )
+    parser.add_argument(
+        "--project",
+        default=None,
+        help="GCP project ID (defaults to application default credentials)",
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        help="First day (YYYY-MM-DD) to recompute, defaults to the full history",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backfill_rollup(
+        project_id=args.project or bq_client_pool.default_project(),
+        since=args.since,
+    )
@@ -0,0 +1,82 @@
+import json
+from typing import Any
+
+from app.utils.formatting import format_bq_string
+from app.utils.session_state import set_state_entry
+
+SCORE_TOTALS_KEY = "score_totals"
+
+
+def _totals_key(subject: str, chapter: str) -> str:
+    return f"{format_bq_string(subject)}/{format_bq_string(chapter)}"
+
+
+def get_cached_score(state: Any, subject: str, chapter: str) -> dict[str, int] | None:
+    """Returns the running totals kept in the session state, if any."""
+    return state.get(SCORE_TOTALS_KEY, {}).get(_totals_key(subject, chapter))
+
+
+def seed_score(
+    state: Any,
+    subject: str,
+    chapter: str,
+    total_student_score: int,
+    total_max_score: int,
+) -> None:
+    """Stores totals fetched from BigQuery for a cold or resumed session."""
+    set_state_entry(
+        state,
+        SCORE_TOTALS_KEY,
+        _totals_key(subject, chapter),
+        {
+            "total_student_score": total_student_score,
+            "total_max_score": total_max_score,
+        },
+    )
+
+
+def record_score(
+    state: Any, subject: str, chapter: str, student_score: int, max_score: int
+) -> None:
+    """
+    Adds a graded answer to the running totals of its subject and chapter.
+
+    Totals are kept per session and persisted with the session state, so a
+    session without totals in its state starts from zero instead of reading
+    the results store while the student waits.
+    """
+    cached = get_cached_score(state, subject, chapter) or {
+        "total_student_score": 0,
+        "total_max_score": 0,
+    }
+    seed_score(
+        state,
+        subject,
+        chapter,
+        total_student_score=cached["total_student_score"] + student_score,
+        total_max_score=cached["total_max_score"] + max_score,
+    )
+
+
+def build_score_totals(
+    total_student_score: int | None, total_max_score: int | None
+) -> dict[str, Any]:
+    """Builds totals shaped like a row of the score aggregate query."""
+    if not total_max_score:
+        return {
+            "total_student_score": None,
+            "total_max_score": None,
+            "total_percentage": None,
+        }
+    return {
+        "total_student_score": total_student_score,
+        "total_max_score": total_max_score,
+        "total_percentage": (total_student_score or 0) * 100.0 / total_max_score,
+    }
+
+
+def format_score_result(
+    total_student_score: int | None, total_max_score: int | None
+) -> str:
+    """Formats totals like a row of the `get_bq_data` aggregate query, as JSON."""
+    return json.dumps(build_score_totals(total_student_score, total_max_score))
@@ -0,0 +1,22 @@
+from typing import Any
+
+
+def set_state_entry(
+    state: Any, key: str, entry: str, value: Any, max_entries: int | None = None
+) -> None:
+    """
+    Sets an entry of the dict kept under `key` in the session state, moving it
+    to the end, and keeps the last `max_entries` entries if given.
+
+    The session service only records the delta of state keys that are
+    assigned, so the dict is copied and reassigned instead of mutated.
+    """
+    entries = {
+        name: current
+        for name, current in (state.get(key) or {}).items()
+        if name != entry
+    }
+    entries[entry] = value
+    if max_entries is not None:
+        entries = dict(list(entries.items())[-max_entries:])
+    state[key] = entries
@@ -13,11 +13,18 @@
 # limitations under the License.
 
 from typing import (
+    Any,
     Literal,
 )
 
 from pydantic import (
     BaseModel,
+    Field,
+    ValidationError,
+    ValidationInfo,
+    ValidatorFunctionWrapHandler,
+    field_validator,
+    model_validator,
 )
 
 
@@ -30,3 +37,149 @@ class Feedback(BaseModel):
     log_type: Literal["feedback"] = "feedback"
     service_name: Literal["study-helper-agent"] = "study-helper-agent"
     user_id: str = ""
+
+
+class RubricPoint(BaseModel):
+    """
+    Represents a key point of a full-credit answer and the points it is worth.
+    A missing or invalid weight counts as 1.
+    """
+
+    point: str = Field(min_length=1)
+    weight: int = Field(default=1, ge=1)
+
+    @field_validator("weight", mode="wrap")
+    @classmethod
+    def _default_invalid_weight(
+        cls, value: Any, handler: ValidatorFunctionWrapHandler
+    ) -> int:
+        try:
+            return handler(value)
+        except ValidationError:
+            return 1
+
+
+def rubric_points(rubric: Any) -> list[RubricPoint]:
+    """Returns the valid points of a rubric, dropping points without a text."""
+    points = []
+    for point in rubric if isinstance(rubric, list) else []:
+        try:
+            points.append(RubricPoint.model_validate(point))
+        except ValidationError:
+            continue
+    return points
+
+
+class GeneratedQuestion(BaseModel):
+    """Represents a question of the question generation agent."""
+
+    subject: str
+    chapter: str
+    question: str
+    answer: str
+    difficulty: int = Field(ge=1, le=5)
+    max_score: int = Field(ge=1)
+    rubric: list[RubricPoint] = Field(default_factory=list)
+
+    @field_validator("rubric", mode="before")
+    @classmethod
+    def _drop_invalid_points(cls, value: Any) -> list[RubricPoint]:
+        return rubric_points(value)
+
+
+class GeneratedQuestionBatch(BaseModel):
+    """Represents the questions of the question generation agent in batch mode."""
+
+    questions: list[GeneratedQuestion]
+
+
+class AnswerEvaluation(BaseModel):
+    """Represents the grading of an answer by the question evaluation agent."""
+
+    question: str
+    answer: str
+    subject: str
+    chapter: str
+    evaluation: str
+    score: int = Field(ge=0)
+    difficulty: int = Field(ge=1, le=5)
+    max_score: int = Field(ge=1)
+    feedback: str
+    correct_answer: str | None = None
+    provisional_score: int | None = None
+
+
+class AnswerScore(BaseModel):
+    """Represents the score of the scoring agent of the two-stage evaluation."""
+
+    evaluation: str
+    score: int = Field(ge=0)
+    correct_answer: str | None = None
+
+
+def _check_score_within_max(score: int, max_score: int) -> None:
+    if score > max_score:
+        raise ValueError(f"score {score} is higher than max_score {max_score}")
+
+
+class QuestionEvaluation(AnswerEvaluation):
+    """
+    Represents an evaluation together with the next question to ask. A next
+    question that doesn't validate is dropped instead of failing the evaluation.
+    """
+
+    next_question: GeneratedQuestion | None = None
+
+    @field_validator("next_question", mode="wrap")
+    @classmethod
+    def _drop_invalid_next_question(
+        cls, value: Any, handler: ValidatorFunctionWrapHandler
+    ) -> GeneratedQuestion | None:
+        try:
+            return handler(value)
+        except ValidationError:
+            return None
+
+    @model_validator(mode="after")
+    def _check_score(self) -> "QuestionEvaluation":
+        _check_score_within_max(self.score, self.max_score)
+        return self
+
+
+class GradedAnswer(BaseModel):
+    """
+    Represents the graded fields of an evaluation, which are stored even when
+    the rest of the evaluation doesn't validate.
+    """
+
+    subject: str
+    chapter: str
+    score: int = Field(ge=0)
+    max_score: int = Field(ge=1)
+    question: str = ""
+    answer: str = ""
+    difficulty: int = Field(default=3, ge=1, le=5)
+    correct_answer: str | None = None
+
+    @field_validator("question", "answer", "difficulty", "correct_answer", mode="wrap")
+    @classmethod
+    def _default_invalid_field(
+        cls, value: Any, handler: ValidatorFunctionWrapHandler, info: ValidationInfo
+    ) -> Any:
+        try:
+            return handler(value)
+        except ValidationError:
+            return cls.model_fields[str(info.field_name)].default
+
+    @model_validator(mode="after")
+    def _check_score(self) -> "GradedAnswer":
+        _check_score_within_max(self.score, self.max_score)
+        return self
+
+
+class ScoreTotals(BaseModel):
+    """Represents the score totals returned by `get_bq_data`."""
+
+    total_student_score: int | None
+    total_max_score: int | None
+    total_percentage: float | None
@@ -4,6 +4,7 @@ import functions_framework
 import vertexai
 from cloudevents.http import CloudEvent
 from google import auth
+from google.cloud import storage
 from vertexai import rag
 
 _, project_id = auth.default()
@@ -11,6 +12,8 @@ _, project_id = auth.default()
 rag_corpus_name = os.getenv("RAG_CORPUS_NAME")
 region = "europe-west3"
 EMBEDDING_MODEL = "text-embedding-005"
+# Rewritten after every import so agents know their corpus catalog is stale.
+CATALOG_VERSION_BLOB = "_catalog/version"
 
 vertexai.init(project=project_id, location=region)
 
@@ -21,6 +24,8 @@ def main(cloud_event: CloudEvent) -> None:
     data = cloud_event.data
     bucket = data["bucket"]
     file_name = data["name"]
+    if file_name == CATALOG_VERSION_BLOB:
+        return
     file_path = f"gs://{bucket}/{file_name}"
     embedding_model_config = rag.RagEmbeddingModelConfig(
         vertex_prediction_endpoint=rag.VertexPredictionEndpoint(
@@ -57,3 +62,7 @@ def main(cloud_event: CloudEvent) -> None:
             transformation_config=transformation_config,
         )
     )
+
+    storage.Client().bucket(bucket).blob(CATALOG_VERSION_BLOB).upload_from_string(
+        file_path
+    )
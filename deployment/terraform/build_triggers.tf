@@ -66,11 +66,12 @@ resource "google_cloudbuild_trigger" "cd_pipeline" {
   substitutions = {
     _STAGING_PROJECT_ID            = var.staging_project_id
     _BUCKET_NAME_LOAD_TEST_RESULTS = resource.google_storage_bucket.bucket_load_test_results.name
-    _REGION                        = var.region
-    _RAG_CORPUS_NAME               = var.rag_cropus_name
+    _REGION              = var.region
+    _RAG_CORPUS_NAME     = var.rag_cropus_name
     _BUILD_SA_ID                   = google_service_account.build_sa["staging"].id
     _CF_SA_EMAIL                   = google_service_account.cf_sa["staging"].email
     _KNOWLEDGE_BUCKET              = google_storage_bucket.knowledge_bucket["staging"].name
+    _RESULT_JOURNAL_PATH           = var.result_journal_path
     # Your other CD Pipeline substitutions
   }
   depends_on = [resource.google_project_service.cicd_services, resource.google_project_service.shared_services]
@@ -92,12 +93,13 @@ resource "google_cloudbuild_trigger" "deploy_to_prod_pipeline" {
     approval_required = true
   }
   substitutions = {
-    _PROD_PROJECT_ID  = var.prod_project_id
-    _REGION           = var.region
-    _RAG_CORPUS_NAME  = var.rag_cropus_name
-    _BUILD_SA_ID      = google_service_account.build_sa["prod"].id
-    _CF_SA_EMAIL      = google_service_account.cf_sa["prod"].email
-    _KNOWLEDGE_BUCKET = google_storage_bucket.knowledge_bucket["prod"].name
+    _PROD_PROJECT_ID     = var.prod_project_id
+    _REGION              = var.region
+    _RAG_CORPUS_NAME     = var.rag_cropus_name
+    _BUILD_SA_ID         = google_service_account.build_sa["prod"].id
+    _CF_SA_EMAIL         = google_service_account.cf_sa["prod"].email
+    _KNOWLEDGE_BUCKET    = google_storage_bucket.knowledge_bucket["prod"].name
+    _RESULT_JOURNAL_PATH = var.result_journal_path
     # Your other Deploy to Prod Pipeline substitutions
   }
   depends_on = [resource.google_project_service.cicd_services, resource.google_project_service.shared_services]
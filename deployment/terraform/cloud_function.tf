@@ -71,6 +71,14 @@ resource "google_project_iam_member" "aiplatform_user" {
   depends_on = [google_project_iam_member.event_receiving]
 }
 
+# Lets the function bump the corpus catalog version marker after an import
+resource "google_storage_bucket_iam_member" "catalog_version_writer" {
+  for_each = local.deploy_project_ids
+  bucket   = google_storage_bucket.knowledge_bucket[each.key].name
+  role     = "roles/storage.objectUser"
+  member   = "serviceAccount:${google_service_account.cf_sa[each.key].email}"
+}
+
 resource "google_service_account" "build_sa" {
   for_each     = local.deploy_project_ids
   account_id   = "build-sa-${each.key}"
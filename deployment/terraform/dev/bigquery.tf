@@ -63,6 +63,164 @@ resource "google_bigquery_table" "dev-question-answer-table" {
         "name": "timestamp",
         "type": "TIMESTAMP",
         "mode": "REQUIRED"
+    },
+    {
+        "name": "row_id",
+        "type": "STRING",
+        "mode": "NULLABLE"
+    },
+    {
+        "name": "correct_answer",
+        "type": "STRING",
+        "mode": "NULLABLE"
+    },
+    {
+        "name": "rubric",
+        "type": "STRING",
+        "mode": "NULLABLE"
+    }
+]
+EOF
+  depends_on = [resource.google_project_service.services]
+}
+
+resource "google_bigquery_table" "dev-question-answer-rollup-table" {
+  dataset_id = google_bigquery_dataset.dev-study-helper-dataset.dataset_id
+  table_id   = "question_answer_rollup"
+  project    = var.dev_project_id
+
+  # Score lookups filter on user, session, subject and chapter but not on a
+  # date, so the table is clustered only; date partitions would all be read.
+  clustering = ["userId", "sessionId", "subject", "chapter"]
+
+  schema = <<EOF
+[
+    {
+        "name": "userId",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "sessionId",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "subject",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "chapter",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "answer_date",
+        "type": "DATE",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "total_student_score",
+        "type": "INTEGER",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "total_max_score",
+        "type": "INTEGER",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "answered_questions",
+        "type": "INTEGER",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "last_answer_at",
+        "type": "TIMESTAMP",
+        "mode": "REQUIRED"
+    }
+]
+EOF
+  depends_on = [resource.google_project_service.services]
+}
+
+resource "google_bigquery_table" "dev-question-answer-rollup-merged-table" {
+  dataset_id = google_bigquery_dataset.dev-study-helper-dataset.dataset_id
+  table_id   = "question_answer_rollup_merged"
+  project    = var.dev_project_id
+
+  # Ids of the rows counted in the rollup, so replayed rows are merged once.
+  # Merges only read the partitions since their first answer, and ids expire
+  # after 30 days, long after a journaled row would be replayed.
+  time_partitioning {
+    type          = "DAY"
+    field         = "merged_at"
+    expiration_ms = 2592000000
+  }
+  clustering = ["row_id"]
+
+  schema = <<EOF
+[
+    {
+        "name": "row_id",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "merged_at",
+        "type": "TIMESTAMP",
+        "mode": "REQUIRED"
+    }
+]
+EOF
+  depends_on = [resource.google_project_service.services]
+}
+
+resource "google_bigquery_table" "dev-question-bank-table" {
+  dataset_id = google_bigquery_dataset.dev-study-helper-dataset.dataset_id
+  table_id   = "question_bank"
+  project    = var.dev_project_id
+
+  # Pre-generated questions are looked up per subject, chapter and difficulty.
+  clustering = ["subject", "chapter", "difficulty"]
+
+  schema = <<EOF
+[
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "subject",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "chapter",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "difficulty",
+        "type": "INTEGER",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "question",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "payload",
+        "type": "STRING",
+        "mode": "REQUIRED"
+    },
+    {
+        "name": "created_at",
+        "type": "TIMESTAMP",
+        "mode": "REQUIRED"
     }
 ]
 EOF
@@ -103,3 +103,9 @@ variable "rag_cropus_name" {
   description = "The name of the RAG corpus"
   default     = "study-helper-rag-corpus"
 }
+
+variable "result_journal_path" {
+  type        = string
+  description = "Path of the local journal of buffered quiz results. It outlives the agent's processes but not the instance, so point it at a persistent volume where the runtime offers one."
+  default     = "/var/lib/student_helper/results.sqlite3"
+}
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Counts the parse failures, and so the extra root agent turns, per
+`--evaluations` evaluations of the former chained-replace parsing of
+`before_model_callback` against the validated decode of `parse_agent_output`,
+and times both. The evaluations are emulated with Dutch feedback of which a
+`--apostrophe-rate` fraction contains apostrophes, as fenced JSON of a
+free-form answer or as the plain JSON of a schema-enforced answer.
+"""
+
+import argparse
+import json
+import random
+from typing import Any
+
+from bench_utils import summarize, time_calls
+
+from app.utils.formatting import parse_agent_output
+from app.utils.typing import QuestionEvaluation
+
+FEEDBACK = (
+    "Je antwoord is correct.",
+    "Je antwoord is gedeeltelijk correct, de oorzaak ontbreekt.",
+    "Goed zo, je hebt 't juiste antwoord gegeven.",
+    "Je vergeet z'n rol in de revolutie te vermelden.",
+    "Zo'n antwoord is onvolledig.",
+)
+
+
+def legacy_parse(result: str) -> dict[str, Any] | None:
+    """The parsing `before_model_callback` did before the output schemas."""
+    if "json" in result:
+        return json.loads(
+            result.replace("\n", "").replace("None", "null").strip("`json ")
+        )
+    elif result.startswith("{"):
+        return json.loads(
+            result.replace("\n", "").replace("None", "null").replace("'", '"')
+        )
+    return None
+
+
+def evaluation(rng: random.Random, apostrophe_rate: float) -> dict[str, Any]:
+    with_apostrophe = rng.random() < apostrophe_rate
+    return {
+        "question": "Wat waren de oorzaken van de Belgische Revolutie?",
+        "answer": "De onvrede over de taal en de godsdienst",
+        "subject": "Geschiedenis",
+        "chapter": "De Belgische Revolutie",
+        "evaluation": "Gedeeltelijk correct",
+        "score": rng.randint(0, 4),
+        "difficulty": rng.randint(1, 5),
+        "max_score": 4,
+        "feedback": rng.choice(FEEDBACK[2:] if with_apostrophe else FEEDBACK[:2]),
+        "correct_answer": None if rng.random() < 0.5 else "Politieke onvrede",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--evaluations", type=int, default=1000)
+    parser.add_argument("--apostrophe-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    outputs = {
+        "fenced": [
+            f"```json\n{json.dumps(evaluation(rng, args.apostrophe_rate), indent=2)}\n```"
+            for _ in range(args.evaluations)
+        ],
+        "schema-enforced": [
+            json.dumps(evaluation(rng, args.apostrophe_rate))
+            for _ in range(args.evaluations)
+        ],
+    }
+
+    def legacy(output: str) -> bool:
+        try:
+            return legacy_parse(output) is not None
+        except ValueError:
+            return False
+
+    def validated(output: str) -> bool:
+        return parse_agent_output(output, QuestionEvaluation) is not None
+
+    for shape, texts in outputs.items():
+        for name, parse in (("chained replace", legacy), ("validated", validated)):
+            failures = sum(not parse(text) for text in texts)
+            per_thousand = failures * 1000 / len(texts)
+            print(
+                f"{shape:<16} {name:<16} parse failures / retry turns per 1000: "
+                f"{per_thousand:.0f}"
+            )
+            it = iter(texts * 2)
+            print(
+                "  "
+                + summarize(
+                    f"{name} decode",
+                    time_calls(lambda it=it, parse=parse: parse(next(it)), len(texts)),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the time to the first token of an answer turn when the root agent's
+final answer waits for the whole evaluation and next question with streaming
+the score line, feedback and next question as they are produced.
+
+The evaluation agent is emulated: its JSON answer starts after
+`--first-token-ms` and arrives in chunks of `--chunk-chars` characters every
+`--ms-per-chunk`, after which the next question takes `--generation-ms`.
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from app.utils.answer_stream import (
+    AnswerStreams,
+    EvaluationStreamer,
+    format_next_question,
+    format_score_line,
+)
+
+EVALUATION: dict[str, Any] = {
+    "question": "Wat waren de oorzaken van de Belgische Revolutie?",
+    "answer": "De onvrede over de taal en de godsdienst",
+    "subject": "Geschiedenis",
+    "chapter": "De Belgische Revolutie",
+    "evaluation": "Gedeeltelijk correct",
+    "score": 2,
+    "difficulty": 3,
+    "max_score": 4,
+    "feedback": (
+        "Je noemt twee belangrijke oorzaken, maar de politieke onvrede over de "
+        "ondervertegenwoordiging van het zuiden en de economische tegenstellingen "
+        "ontbreken nog in je antwoord."
+    ),
+}
+NEXT_QUESTION: dict[str, Any] = {
+    "question": "Wie was Charles Rogier?",
+    "difficulty": 3,
+    "max_score": 2,
+}
+
+
+def turn(
+    args: argparse.Namespace, streams: AnswerStreams, streaming: bool
+) -> Iterator[dict[str, Any]]:
+    """Emulates the events of an answer turn."""
+    yield {
+        "author": "root_agent",
+        "content": {"parts": [{"function_call": {"name": "question_eval_agent"}}]},
+    }
+    stream = streams.get("session") if streaming else None
+    streamer = EvaluationStreamer(stream) if stream is not None else None
+    text = json.dumps(EVALUATION, ensure_ascii=False)
+    time.sleep(args.first_token_ms / 1000)
+    for index in range(0, len(text), args.chunk_chars):
+        time.sleep(args.ms_per_chunk / 1000)
+        if streamer is not None:
+            streamer.feed(text[index : index + args.chunk_chars])
+    time.sleep(args.generation_ms / 1000)
+    if streamer is not None:
+        streamer.evaluation(EVALUATION)
+        streamer.next_question(NEXT_QUESTION)
+    final = (
+        format_score_line(2, 4, 3)
+        + EVALUATION["feedback"]
+        + format_next_question(**NEXT_QUESTION)
+    )
+    yield {"author": "root_agent", "content": {"parts": [{"text": final}]}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--first-token-ms", type=float, default=400.0)
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    parser.add_argument("--ms-per-chunk", type=float, default=15.0)
+    parser.add_argument("--generation-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    for name, streaming in (("final answer only", False), ("streamed", True)):
+        streams = AnswerStreams()
+        start = time.perf_counter()
+        for _ in range(args.turns):
+            for _ in streams.stream(
+                "session", turn(args, streams, streaming), author="root_agent"
+            ):
+                pass
+        turn_ms = (time.perf_counter() - start) * 1000 / args.turns
+        stats = streams.stats()
+        print(
+            f"{name:<18} answer ttft mean={stats['answer_ttft_ms_mean']:7.0f}ms "
+            f"max={stats['answer_ttft_ms_max']:7.0f}ms turn={turn_ms:7.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
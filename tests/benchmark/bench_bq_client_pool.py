@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the BigQuery overhead of one quiz turn (`store_results` followed by
+`get_bq_data`) when every call builds its own client against the shared
+`BigQueryClientPool`. BigQuery is replaced by an in-process fake that sleeps to
+emulate the auth, client construction, metadata, insert and query round trips.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest.mock import patch
+
+from bench_utils import summarize, time_calls
+
+from app.utils.bigquery import BigQueryClientPool
+
+LOCATION = "europe-west1"
+TABLE_ID = "fake-project.student_helper.question_answer"
+ROW = ("user", "session", "wiskunde", "vergelijkingen", "1+1?", "2", 1, 1, 1, "now")
+
+
+class Latency:
+    """Emulated round-trip latencies in seconds."""
+
+    auth = 0.020
+    client = 0.015
+    get_table = 0.060
+    insert = 0.080
+    query = 0.250
+
+
+class FakeQueryJob:
+    def result(self) -> list:
+        time.sleep(Latency.query)
+        return []
+
+
+class FakeBigQueryClient:
+    def __init__(self, project: str, location: str) -> None:
+        time.sleep(Latency.client)
+        self.project = project
+        self.location = location
+
+    def get_table(self, table_id: str) -> Any:
+        time.sleep(Latency.get_table)
+        return {"table_id": table_id}
+
+    def insert_rows(self, table: Any, rows: list) -> list:
+        time.sleep(Latency.insert)
+        return []
+
+    def query(self, sql: str) -> FakeQueryJob:
+        return FakeQueryJob()
+
+
+def fake_auth_default() -> tuple[None, str]:
+    time.sleep(Latency.auth)
+    return None, "fake-project"
+
+
+def legacy_turn() -> None:
+    """Mirrors the previous code: auth, client and `get_table` on every call."""
+    _, project_id = fake_auth_default()
+    client = FakeBigQueryClient(project=project_id, location=LOCATION)
+    table = client.get_table(TABLE_ID)
+    client.insert_rows(table, [ROW])
+    client = FakeBigQueryClient(project=project_id, location=LOCATION)
+    client.query("SELECT 1").result()
+
+
+def pooled_turn(pool: BigQueryClientPool) -> None:
+    project_id = pool.default_project()
+    client = pool.get_client(LOCATION, project_id)
+    client.insert_rows(pool.get_table(TABLE_ID, LOCATION, project_id), [ROW])
+    pool.get_client(LOCATION, project_id).query("SELECT 1").result()
+
+
+def run_concurrent(func: Any, turns: int, concurrency: int) -> list[float]:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(
+            lambda _: time_calls(func, 1)[0], range(turns * concurrency)
+        )
+        return list(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of students running turns in parallel",
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiplier applied to every emulated round trip",
+    )
+    args = parser.parse_args()
+
+    for name in ("auth", "client", "get_table", "insert", "query"):
+        setattr(Latency, name, getattr(Latency, name) * args.latency_scale)
+
+    with patch("google.auth.default", fake_auth_default):
+        pool = BigQueryClientPool(client_factory=FakeBigQueryClient)
+        before = run_concurrent(legacy_turn, args.turns, args.concurrency)
+        after = run_concurrent(lambda: pooled_turn(pool), args.turns, args.concurrency)
+
+    print(summarize("per-client turn (before)", before))
+    print(summarize("pooled turn (after)", after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the latency of the evaluation turn of the nested, concurrent and
+speculative evaluation pipelines. Grading and generation are emulated by sleeps
+of `--grading-latency` and `--generation-latency` seconds, and the student takes
+`--think-time` seconds to answer each question. Scores are drawn at random, so
+the next difficulty goes up, stays or goes down.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+from bench_utils import summarize
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.eval_pipeline import (
+    ConcurrentEvalAgentTool,
+    SpeculativeQuestionGenerator,
+)
+from app.utils.formatting import format_agent_json, parse_agent_json
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grading-latency", type=float, default=1.0)
+    parser.add_argument("--generation-latency", type=float, default=2.0)
+    parser.add_argument("--think-time", type=float, default=3.0)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=3)
+    args = parser.parse_args()
+    scores = random.Random(0)
+    grading_latency, generation_latency = args.grading_latency, args.generation_latency
+
+    def question(difficulty: int) -> dict[str, Any]:
+        return {
+            "subject": "Wiskunde",
+            "chapter": "Vergelijkingen",
+            "question": f"vraag {time.perf_counter()}",
+            "answer": "antwoord",
+            "difficulty": difficulty,
+            "max_score": 4,
+        }
+
+    def generate(subject: str, chapter: str, difficulty: int) -> dict[str, Any]:
+        time.sleep(generation_latency)
+        return question(difficulty)
+
+    # The tool arguments are called `args` too, hence the latencies above.
+    async def generation_tool_run(*, args: dict, tool_context: Any) -> str:
+        difficulty = json.loads(args["request"])["difficulty"]
+        return format_agent_json(await asyncio.to_thread(generate, "", "", difficulty))
+
+    async def grade(*, args: dict, tool_context: Any) -> str:
+        await asyncio.sleep(grading_latency)
+        return format_agent_json(
+            {**json.loads(args["request"]), "score": scores.randint(0, 4)}
+        )
+
+    generation_tool = Mock(run_async=generation_tool_run)
+    agent = Agent(name="question_eval_agent", model="gemini-2.0-flash-001")
+
+    async def session(
+        tool: ConcurrentEvalAgentTool | None,
+        speculator: SpeculativeQuestionGenerator | None,
+    ) -> list[float]:
+        latencies = []
+        current = question(3)
+        context = Mock(state={"session_id": "sessie"})
+        for _ in range(args.questions):
+            if speculator is not None:
+                speculator.speculate(
+                    "sessie",
+                    current["subject"],
+                    current["chapter"],
+                    current["question"],
+                    current["difficulty"],
+                )
+            await asyncio.sleep(args.think_time)
+            request = {"request": json.dumps(current)}
+            start = time.perf_counter()
+            if tool is None:
+                evaluation = parse_agent_json(
+                    await grade(args=request, tool_context=None)
+                )
+                evaluation["next_question"] = parse_agent_json(
+                    await generation_tool_run(args=request, tool_context=None)
+                )
+            else:
+                evaluation = parse_agent_json(
+                    await tool.run_async(args=request, tool_context=context)
+                )
+            latencies.append((time.perf_counter() - start) * 1000)
+            current = evaluation["next_question"]
+        return latencies
+
+    with patch.object(AgentTool, "run_async", AsyncMock(side_effect=grade)):
+        print(summarize("nested", asyncio.run(session(None, None))))
+        tool = ConcurrentEvalAgentTool(agent=agent, generation_tool=generation_tool)
+        print(summarize("concurrent", asyncio.run(session(tool, None))))
+        print(f"  {tool.stats()}")
+        speculator = SpeculativeQuestionGenerator(
+            generate_fn=generate, max_candidates=args.candidates
+        )
+        tool = ConcurrentEvalAgentTool(
+            agent=agent, generation_tool=generation_tool, speculator=speculator
+        )
+        print(summarize("speculative", asyncio.run(session(tool, speculator))))
+        speculator.close()
+        stats = speculator.stats()
+        print(
+            f"  used up/same/down {stats['used_up']}/{stats['used_same']}/"
+            f"{stats['used_down']}, misses {stats['misses']}, "
+            f"waste rate {stats['waste_rate']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
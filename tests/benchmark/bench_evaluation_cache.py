@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the grading calls and time per answer saved by the evaluation cache
+when a class answers the same banked questions.
+
+Every student answers `--questions` questions. Answers are drawn from
+`--distinct-answers` answers per question with Zipf-like weights, so a few
+common answers ("Parijs", "x = 4") make up most of them, written in varying
+case and punctuation. A grading call of the evaluation agent is emulated with
+`--grading-ms`.
+"""
+
+import argparse
+import random
+import time
+
+from app.utils.cache import LruTtlCache
+from app.utils.evaluation_cache import EvaluationCache
+
+
+def answers(args: argparse.Namespace) -> list[dict]:
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(args.distinct_answers)]
+    requests = []
+    for _ in range(args.students):
+        for number in range(args.questions):
+            answer = rng.choices(range(args.distinct_answers), weights)[0]
+            text = f"antwoord {answer}"
+            requests.append(
+                {
+                    "subject": "Aardrijkskunde",
+                    "chapter": "Hoofdsteden van Europa",
+                    "question": f"Wat is de hoofdstad van land {number}?",
+                    "correct_answer": "antwoord 0",
+                    "answer": rng.choice([text, text.capitalize(), f"{text}."]),
+                    "difficulty": 2,
+                    "max_score": 1,
+                }
+            )
+    return requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--distinct-answers", type=int, default=6)
+    parser.add_argument("--grading-ms", type=float, default=1800.0)
+    args = parser.parse_args()
+
+    requests = answers(args)
+    cache = EvaluationCache(LruTtlCache(max_bytes=16 * 1024 * 1024, ttl=86400))
+    calls = 0
+    lookup_s = 0.0
+    for request in requests:
+        start = time.perf_counter()
+        evaluation = cache.get(request)
+        lookup_s += time.perf_counter() - start
+        if evaluation is None:
+            calls += 1
+            score = int(request["answer"].lower().rstrip(".") == "antwoord 0")
+            cache.put(
+                request,
+                {"evaluation": "", "score": score, "max_score": 1, "feedback": ""},
+            )
+
+    n = len(requests)
+    stats = cache.stats()
+    print(
+        f"answers={n} grading calls={calls} (without cache {n}) "
+        f"hit ratio={stats['hit_ratio']:.2f} "
+        f"lookup={lookup_s * 1e6 / n:.1f}us "
+        f"mean grading time={calls * args.grading_ms / n:.0f}ms "
+        f"(without cache {args.grading_ms:.0f}ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the fast-path coverage of `LocalGrader`, the share of answers graded
+without the evaluation agent, and its grading latency, over a mix of emulated
+answers: simple equations and one-word answers in correct, incorrect and
+differently written forms, and open answers that are left to the agent.
+"""
+
+import argparse
+import random
+
+from bench_utils import summarize, time_calls
+
+from app.utils.grading import LocalGrader
+
+# (correct answer, answers a student may give), per kind of question.
+ANSWERS = {
+    "equation": [
+        ("x = 5", ["5", "x=5", "x = 6", "x = 5,0", "vijf"]),
+        ("x = 2 of x = -2", ["x = 2 of x = -2", "-2 en 2", "2", "x = 3 of x = -3"]),
+        ("0,33", ["1/3", "0,33", "0,3", "0,5"]),
+        ("2x + 6", ["2(x+3)", "6 + 2x", "2x + 3", "x + x + 6"]),
+        ("(x+1)(x-1)", ["x^2 - 1", "x² - 1", "(x-1)(x+1)", "x^2 + 1"]),
+    ],
+    "factual": [
+        ("Parijs", ["parijs", "Parijs.", "Brussel", "de hoofdstad van Frankrijk"]),
+        ("1830", ["1830", "in 1830", "1831"]),
+        ("Leopold I", ["Leopold I", "leopold 1", "Leopold II"]),
+    ],
+    "open": [
+        (
+            "De onvrede over de taal, de godsdienst en de politieke achterstelling",
+            ["De taal", "Godsdienst en politiek", "Ik weet het niet"],
+        ),
+    ],
+}
+
+
+def request(correct_answer: str, answer: str) -> dict:
+    return {
+        "subject": "Wiskunde",
+        "chapter": "Vergelijkingen",
+        "question": "Los op",
+        "correct_answer": correct_answer,
+        "answer": answer,
+        "difficulty": 3,
+        "max_score": 2,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--answers", type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    requests = {
+        kind: [
+            request(correct_answer, rng.choice(answers))
+            for correct_answer, answers in (
+                rng.choice(pairs) for _ in range(args.answers // len(ANSWERS))
+            )
+        ]
+        for kind, pairs in ANSWERS.items()
+    }
+
+    for kind, kind_requests in requests.items():
+        grader = LocalGrader()
+        iterator = iter(kind_requests)
+        latencies = time_calls(
+            lambda grader=grader, iterator=iterator: grader.grade(next(iterator)),
+            len(kind_requests),
+        )
+        stats = grader.stats()
+        print(summarize(kind, latencies))
+        print(
+            f"{'':<32} coverage={stats['coverage_rate']:.1%} "
+            f"exact={stats['graded_exact']} numeric={stats['graded_numeric']} "
+            f"symbolic={stats['graded_symbolic']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
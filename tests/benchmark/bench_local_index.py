@@ -0,0 +1,134 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the local vector index. With `--synthetic` a random corpus of the given
+size is searched to show the brute-force latency. With `--index` the queries in
+`--queries` (one per line) are run against both the local index and the Vertex
+AI RAG corpus, and recall@k of the local results against the remote results is
+reported next to the latency of both. A local chunk matches a remote chunk when
+their word sets overlap for at least `--match-overlap` (Jaccard), since the two
+chunkers don't cut at exactly the same place.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+from typing import Any
+from unittest.mock import Mock
+
+import numpy as np
+from bench_utils import summarize, time_calls
+
+from app.utils.local_index import (
+    CHUNKS_FILE,
+    EMBEDDINGS_FILE,
+    LocalIndexRetrieval,
+    LocalVectorIndex,
+)
+
+
+def jaccard(a: str, b: str) -> float:
+    words_a, words_b = set(a.lower().split()), set(b.lower().split())
+    return len(words_a & words_b) / (len(words_a | words_b) or 1)
+
+
+def recall(local: list[str], remote: list[str], overlap: float) -> float:
+    if not remote:
+        return 1.0
+    found = sum(
+        any(jaccard(chunk, remote_chunk) >= overlap for chunk in local)
+        for remote_chunk in remote
+    )
+    return found / len(remote)
+
+
+def run_synthetic(chunks: int, dimensions: int, top_k: int, iterations: int) -> None:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        embeddings = rng.standard_normal((chunks, dimensions), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), embeddings)
+        with open(os.path.join(tmp_dir, CHUNKS_FILE), "w") as f:
+            f.writelines(
+                f'{{"uri": "gs://b/s/c/{i}.pdf", "text": "{i}"}}\n'
+                for i in range(chunks)
+            )
+        index = LocalVectorIndex(tmp_dir)
+        queries = iter(rng.standard_normal((iterations, dimensions)))
+        latencies = time_calls(lambda: index.search(next(queries), top_k), iterations)
+        print(summarize(f"local search n={chunks}", latencies))
+
+
+def run_comparison(index_dir: str, queries: list[str], overlap: float) -> None:
+    import app.tools
+    from app.utils.local_index import vertex_embedder
+
+    remote = app.tools.student_helper_retrieval
+    local = LocalIndexRetrieval(
+        name="student_helper_retrieval",
+        description="local",
+        index=LocalVectorIndex(index_dir),
+        embed_query=vertex_embedder("RETRIEVAL_QUERY", location="europe-west3"),
+        similarity_top_k=5,
+        vector_distance_threshold=0.5,
+    )
+    results: dict[str, list] = {"local": [], "remote": []}
+
+    def retrieve(tool: Any, name: str, query: str) -> None:
+        if hasattr(tool, "cache"):
+            tool.cache.invalidate()
+        result = asyncio.run(tool.run_async(args={"query": query}, tool_context=Mock()))
+        results[name].append(result if isinstance(result, list) else [])
+
+    for name, tool in (("remote", remote), ("local", local)):
+        pending = iter(queries)
+        latencies = time_calls(
+            lambda tool=tool, name=name, pending=pending: retrieve(
+                tool, name, next(pending)
+            ),
+            len(queries),
+        )
+        print(summarize(f"{name} retrieval", latencies))
+
+    recalls = [
+        recall(local_chunks, remote_chunks, overlap)
+        for local_chunks, remote_chunks in zip(
+            results["local"], results["remote"], strict=True
+        )
+    ]
+    print(f"recall@5 of the local index: {sum(recalls) / len(recalls):.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--index", help="Directory of a built local index")
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--match-overlap", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.chunks, args.dimensions, 5, args.iterations)
+    if args.index:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+        run_comparison(args.index, queries, args.match_overlap)
+
+
+if __name__ == "__main__":
+    main()
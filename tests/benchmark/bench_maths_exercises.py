@@ -0,0 +1,55 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the generation latency and throughput of the local maths exercise
+generator per difficulty, and how many distinct exercises it draws, against
+the `--agent-ms` a question of the question generation agent takes.
+"""
+
+import argparse
+
+from bench_utils import summarize, time_calls
+
+from app.utils.maths_exercises import MathsExerciseGenerator
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--exercises", type=int, default=10000)
+    parser.add_argument("--chapter", default="Vergelijkingen")
+    parser.add_argument("--agent-ms", type=float, default=2500.0)
+    args = parser.parse_args()
+
+    for difficulty in range(1, 6):
+        generator = MathsExerciseGenerator(seed=difficulty)
+        questions: set[str] = set()
+        latencies = time_calls(
+            lambda generator=generator, difficulty=difficulty, questions=questions: (
+                questions.add(
+                    generator.generate("Wiskunde", args.chapter, difficulty)["question"]
+                )
+            ),
+            args.exercises,
+        )
+        print(summarize(f"difficulty {difficulty}", latencies))
+        print(
+            f"{'':<32} {len(latencies) / (sum(latencies) / 1000):,.0f} exercises/s, "
+            f"{len(questions) / len(latencies):.1%} distinct, "
+            f"{args.agent_ms / (sum(latencies) / len(latencies)):,.0f}x faster "
+            "than the agent"
+        )
+
+
+if __name__ == "__main__":
+    main()
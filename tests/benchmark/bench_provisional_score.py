@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the latency of the provisional score, and per confidence threshold
+the share of answers it would grade without the evaluation agent and how often
+it agrees with the agent's score there.
+
+The answers are synthetic but graded like the agent would: exact and
+reworded correct answers, wrong answers, and answers that cover part of the
+rubric's key points, of which `--vague-rate` are worded too loosely to match.
+"""
+
+import argparse
+import random
+import time
+
+from app.utils.provisional_score import (
+    DEFAULT_THRESHOLDS,
+    ProvisionalScorer,
+    calibrate,
+    recommend_threshold,
+)
+
+CAPITALS = {
+    "Frankrijk": "Parijs",
+    "Duitsland": "Berlijn",
+    "Spanje": "Madrid",
+    "Italië": "Rome",
+    "Oostenrijk": "Wenen",
+    "Portugal": "Lissabon",
+}
+RUBRIC = [
+    {"point": "Politieke onvrede met het Verenigd Koninkrijk", "weight": 2},
+    {"point": "Culturele verschillen tussen noord en zuid", "weight": 1},
+    {"point": "Invloed van de Franse Revolutie", "weight": 1},
+]
+COVERED = [
+    "politieke onvrede over het Verenigd Koninkrijk",
+    "culturele verschillen tussen het noorden en het zuiden",
+    "de invloed van de Franse Revolutie",
+]
+VAGUE = [
+    "ruzie met de koning",
+    "de mensen waren anders",
+    "wat er in Frankrijk gebeurde",
+]
+
+
+def samples(args: argparse.Namespace) -> list[tuple[dict, int]]:
+    rng = random.Random(0)
+    result = []
+    for _ in range(args.answers):
+        if rng.random() < 0.5:
+            country, capital = rng.choice(list(CAPITALS.items()))
+            wrong = rng.choice([c for c in CAPITALS.values() if c != capital])
+            answer, score = rng.choice(
+                [(capital, 1), (f"de stad {capital.lower()}", 1), (wrong, 0)]
+            )
+            request = {
+                "question": f"Wat is de hoofdstad van {country}?",
+                "correct_answer": capital,
+                "max_score": 1,
+            }
+        else:
+            covered = [index for index in range(3) if rng.random() < 0.6]
+            vague = rng.random() < args.vague_rate
+            answer = " en ".join(
+                VAGUE[index] if vague else COVERED[index] for index in covered
+            )
+            score = sum(RUBRIC[index]["weight"] for index in covered)
+            request = {
+                "question": "Wat waren de oorzaken van de Belgische Revolutie?",
+                "correct_answer": "Politieke onvrede, culturele verschillen en "
+                "de Franse Revolutie",
+                "rubric": RUBRIC,
+                "max_score": 4,
+            }
+        result.append(({**request, "answer": answer or "weet ik niet"}, score))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--vague-rate", type=float, default=0.3)
+    parser.add_argument("--grading-ms", type=float, default=1800.0)
+    args = parser.parse_args()
+
+    data = samples(args)
+    scorer = ProvisionalScorer()
+    start = time.perf_counter()
+    for request, _ in data:
+        scorer.score(request)
+    latency_us = (time.perf_counter() - start) * 1e6 / len(data)
+    print(
+        f"provisional score latency={latency_us:.1f}us "
+        f"(evaluation agent {args.grading_ms:.0f}ms)"
+    )
+    results = calibrate(data, DEFAULT_THRESHOLDS)
+    for result in results:
+        print(
+            f"threshold={result['threshold']:.2f} coverage={result['coverage']:.2f} "
+            f"accuracy={result['accuracy']:.3f}"
+        )
+    print(f"recommended threshold: {recommend_threshold(results)}")
+
+
+if __name__ == "__main__":
+    main()
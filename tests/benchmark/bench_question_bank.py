@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the time-to-question of live generation with serving from the question
+bank. Generation is emulated by a function sleeping `--generation-latency`
+seconds. A student session takes `--questions` questions from one chapter;
+without the bank every question is generated live, with the bank only the
+questions missing from the warm bank are.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from itertools import count
+from typing import Any
+
+from bench_utils import summarize, time_calls
+
+from app.utils.question_bank import QuestionBank
+from app.utils.question_bank_store import (
+    InMemoryQuestionBankStore,
+    SQLiteQuestionBankStore,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--generation-latency", type=float, default=2.0)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--target-size", type=int, default=10)
+    args = parser.parse_args()
+
+    numbers = count()
+
+    def generate(subject: str, chapter: str, difficulty: int) -> dict[str, Any]:
+        time.sleep(args.generation_latency)
+        return {"question": f"vraag {next(numbers)}", "answer": "antwoord"}
+
+    print(
+        summarize(
+            "live generation",
+            time_calls(lambda: generate("wiskunde", "h1", 2), args.questions),
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stores = {
+            "memory": InMemoryQuestionBankStore(),
+            "sqlite": SQLiteQuestionBankStore(os.path.join(tmp_dir, "bank.db")),
+        }
+        for name, store in stores.items():
+            bank = QuestionBank(
+                store=store,
+                generate_fn=lambda *key: {
+                    "question": f"vraag {next(numbers)}",
+                    "answer": "antwoord",
+                },
+                target_size=args.target_size,
+            )
+            # Warm the bank like a previous student on this chapter would have.
+            bank.request_refill("wiskunde", "h1", 2)
+            while store.count("wiskunde", "h1", 2) < args.target_size:
+                time.sleep(0.01)
+            bank.generate_fn = generate
+
+            def take(bank: QuestionBank = bank) -> None:
+                if bank.take("wiskunde", "h1", 2) is None:
+                    generate("wiskunde", "h1", 2)
+
+            print(summarize(f"bank ({name})", time_calls(take, args.questions)))
+            print(f"  hit rate {bank.stats()['hit_rate']:.2f}")
+            bank.close(timeout=0)
+
+
+if __name__ == "__main__":
+    main()
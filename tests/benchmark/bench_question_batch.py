@@ -0,0 +1,137 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the tokens and the time per delivered question of generating one
+question per agent call with generating `--batch-size` questions per call,
+over a practice session of `--questions` questions whose difficulty follows
+random scores.
+
+The question generation agent is emulated: a call reads the instructions, the
+pinned chapter context of `--context-chars` characters and the request (about
+four characters per token), and takes `--first-token-ms` plus `--ms-per-token`
+per generated token, `--tokens-per-question` per question.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.instructions import question_generation_agent_instructions
+from app.utils.eval_pipeline import next_difficulty
+from app.utils.formatting import format_agent_json, parse_agent_json
+from app.utils.question_history import (
+    QuestionHistoryAgentTool,
+    record_question,
+    seed_question_history,
+)
+
+WORDS = (
+    "wat waarom hoe welke oorzaak gevolg revolutie koning grondwet verdrag "
+    "parlement opstand onafhankelijkheid provincie leger handel taal kerk"
+).split()
+
+
+async def run_session(options: argparse.Namespace, batch_size: int) -> dict[str, float]:
+    rng = random.Random(0)
+    totals = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "ms": 0.0}
+    turn_ms: list[float] = []
+
+    def question(difficulty: int) -> dict[str, Any]:
+        return {
+            "subject": "Geschiedenis",
+            "chapter": "H1",
+            "question": " ".join(rng.choices(WORDS, k=12)).capitalize() + "?",
+            "answer": "antwoord",
+            "difficulty": difficulty,
+            "max_score": 2,
+        }
+
+    async def generate(*, args: dict[str, Any], tool_context: Any) -> str:
+        request = json.loads(args["request"])
+        difficulties = request.get("difficulties") or [request["difficulty"]]
+        output_tokens = options.tokens_per_question * len(difficulties)
+        totals["calls"] += 1
+        totals["input_tokens"] += (
+            len(question_generation_agent_instructions)
+            + options.context_chars
+            + len(args["request"])
+        ) // 4
+        totals["output_tokens"] += output_tokens
+        totals["ms"] += options.first_token_ms + options.ms_per_token * output_tokens
+        if "difficulties" not in request:
+            return format_agent_json(question(request["difficulty"]))
+        return format_agent_json({"questions": [question(d) for d in difficulties]})
+
+    tool = QuestionHistoryAgentTool(
+        agent=Agent(name="question_generation_agent", model="gemini-2.0-flash-001"),
+        batch_size=batch_size,
+    )
+    state: dict = {}
+    seed_question_history(state, "Geschiedenis", "H1", [])
+    difficulty = 3
+    with patch.object(AgentTool, "run_async", AsyncMock(side_effect=generate)):
+        for _ in range(options.questions):
+            start_ms = totals["ms"]
+            result = await tool.run_async(
+                args={
+                    "request": json.dumps(
+                        {
+                            "subject": "Geschiedenis",
+                            "chapter": "H1",
+                            "difficulty": difficulty,
+                        }
+                    )
+                },
+                tool_context=Mock(state=state),
+            )
+            turn_ms.append(totals["ms"] - start_ms)
+            asked = parse_agent_json(result)
+            record_question(state, "Geschiedenis", "H1", asked["question"])
+            difficulty = next_difficulty(rng.randint(0, 2), 2, asked["difficulty"])
+    return {**totals, **tool.stats(), "max_turn_ms": max(turn_ms)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--context-chars", type=int, default=20000)
+    parser.add_argument("--tokens-per-question", type=int, default=120)
+    parser.add_argument("--first-token-ms", type=float, default=900.0)
+    parser.add_argument("--ms-per-token", type=float, default=6.0)
+    args = parser.parse_args()
+
+    for name, batch_size in (
+        ("one at a time", 1),
+        (f"batch of {args.batch_size}", args.batch_size),
+    ):
+        totals = asyncio.run(run_session(args, batch_size))
+        print(
+            f"{name:<16} agent calls={totals['calls']:<4} "
+            f"input tokens/question={totals['input_tokens'] / args.questions:8.0f} "
+            f"output tokens/question={totals['output_tokens'] / args.questions:6.0f} "
+            f"ms/question={totals['ms'] / args.questions:7.0f} "
+            f"slowest turn={totals['max_turn_ms']:6.0f}ms "
+            f"batched served={totals['batched_served']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the size of the question generation request over a long practice
+session when the full `previous_questions` list is passed with the fixed-size
+hint of the question history, and measures the near-duplicate lookup latency
+against a full history.
+"""
+
+import argparse
+import json
+import random
+
+from bench_utils import summarize, time_calls
+from google.adk.agents import Agent
+
+from app.utils.question_history import (
+    QuestionHistoryAgentTool,
+    find_near_duplicate,
+    record_question,
+    seed_question_history,
+)
+
+WORDS = (
+    "wat waarom hoe welke oorzaak gevolg revolutie koning grondwet verdrag "
+    "parlement opstand onafhankelijkheid provincie leger handel taal kerk"
+).split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--hint-size", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+    words = random.Random(0)
+
+    def question() -> str:
+        return " ".join(words.choices(WORDS, k=12)).capitalize() + "?"
+
+    tool = QuestionHistoryAgentTool(
+        agent=Agent(name="question_generation_agent", model="gemini-2.0-flash-001"),
+        hint_size=args.hint_size,
+    )
+    state: dict = {}
+    seed_question_history(state, "Geschiedenis", "H1", [])
+    full_sizes, hint_sizes = [], []
+    for _ in range(args.questions):
+        request = {"subject": "Geschiedenis", "chapter": "H1", "difficulty": 3}
+        previous = state["question_history"]["geschiedenis/h1"]
+        full_sizes.append(len(json.dumps({**request, "previous_questions": previous})))
+        hint_sizes.append(
+            len(
+                json.dumps({**request, "previous_questions": tool.hint(state, request)})
+            )
+        )
+        record_question(state, "Geschiedenis", "H1", question(), args.questions)
+
+    for name, sizes in (("previous_questions", full_sizes), ("hint", hint_sizes)):
+        print(
+            f"{name:<20} request bytes first={sizes[0]} "
+            f"middle={sizes[len(sizes) // 2]} last={sizes[-1]}"
+        )
+    print(
+        summarize(
+            f"near-duplicate lookup (n={args.questions})",
+            time_calls(
+                lambda: find_near_duplicate(state, "Geschiedenis", "H1", question()),
+                args.lookups,
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
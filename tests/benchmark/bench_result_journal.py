@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Measures the cost of journaling a quiz result before it is acknowledged and the
+throughput of replaying a journal left behind by a crashed process. Flushes go
+to a fake sink that sleeps `--insert-ms` per batch to emulate `insert_rows`.
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+from typing import Any
+
+from bench_utils import summarize, time_calls
+
+from app.utils.result_journal import ResultJournal
+from app.utils.result_sink import BufferedResultWriter
+
+
+def make_row(i: int) -> dict[str, Any]:
+    return {
+        "userId": f"user_{i % 30}",
+        "sessionId": f"session_{i % 30}",
+        "subject": "geschiedenis",
+        "chapter": "de_belgische_revolutie",
+        "question": "Wat waren de belangrijkste oorzaken van de Belgische Revolutie?",
+        "answer": "Onvrede met het bestuur van Willem I en religieuze verschillen.",
+        "student_score": i % 4,
+        "max_score": 4,
+        "difficulty": 3,
+        "timestamp": datetime.datetime.now(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--insert-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "journal.sqlite3")
+
+        journal = ResultJournal(path)
+        rows = iter(range(args.rows))
+        append_latencies = time_calls(
+            lambda: journal.append(make_row(next(rows))), args.rows
+        )
+        journal.close()
+
+        def sink(batch: list[dict[str, Any]]) -> None:
+            time.sleep(args.insert_ms / 1000)
+
+        writer = BufferedResultWriter(
+            flush_fn=sink,
+            max_batch_size=args.batch_size,
+            max_batch_age=0.05,
+            journal=ResultJournal(path),
+        )
+        start = time.perf_counter()
+        replayed = writer.replay_journal()
+        writer.close(timeout=None)
+        elapsed = time.perf_counter() - start
+
+        stats = writer.stats()
+        left = len(ResultJournal(path).pending())
+
+    print(summarize("journal append (ack latency)", append_latencies))
+    print(
+        f"replayed {replayed} rows in {elapsed:.3f}s "
+        f"({replayed / elapsed:,.0f} rows/s, {stats['batches_flushed']} batches, "
+        f"{left} left in journal)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Runs the same insert/aggregate workload against each results backend: batches of
+graded answers are inserted, each followed by a score lookup for one of the
+sessions in the batch. The bigquery backend needs a live project and is only
+run when listed explicitly.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import tempfile
+from typing import Any
+
+from bench_utils import summarize, time_calls
+
+from app.utils.result_store import (
+    BigQueryResultStore,
+    InMemoryResultStore,
+    ResultStore,
+    SQLiteResultStore,
+)
+
+
+def make_batch(batch_size: int, sessions: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "userId": f"user_{session}",
+            "sessionId": f"session_{session}",
+            "subject": "wiskunde",
+            "chapter": "vergelijkingen",
+            "question": "Los op: 3x + 4 = 19",
+            "answer": "x = 5",
+            "student_score": random.randint(0, 2),
+            "max_score": 2,
+            "difficulty": 2,
+            "timestamp": datetime.datetime.now(),
+        }
+        for session in random.choices(range(sessions), k=batch_size)
+    ]
+
+
+def run_workload(
+    store: ResultStore, batches: int, batch_size: int, sessions: int
+) -> tuple[list[float], list[float]]:
+    workload = [make_batch(batch_size, sessions) for _ in range(batches)]
+    pending = iter(workload)
+    insert_latencies = time_calls(lambda: store.insert_rows(next(pending)), batches)
+    lookups = iter(workload)
+
+    def lookup() -> None:
+        row = next(lookups)[0]
+        store.get_totals(
+            row["userId"], row["sessionId"], row["subject"], row["chapter"]
+        )
+
+    return insert_latencies, time_calls(lookup, batches)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["memory", "sqlite"],
+        choices=["memory", "sqlite", "bigquery"],
+    )
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=30)
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stores: dict[str, Any] = {
+            "memory": InMemoryResultStore,
+            "sqlite": lambda: SQLiteResultStore(os.path.join(tmp_dir, "bench.db")),
+            "bigquery": BigQueryResultStore,
+        }
+        for backend in args.backends:
+            inserts, lookups = run_workload(
+                stores[backend](), args.batches, args.batch_size, args.sessions
+            )
+            print(summarize(f"{backend} insert x{args.batch_size}", inserts))
+            print(summarize(f"{backend} get_totals", lookups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares corpus-wide and chapter-scoped retrieval per chapter of the corpus
+catalog. For every chapter the query "<subject> <chapter>" is retrieved with and
+without the subject/chapter scope, and the precision (the share of returned
+chunks whose source file belongs to the chapter) and the latency are reported.
+The retrieval cache is cleared before every call. Runs against the backend
+selected by `RETRIEVAL_BACKEND`, so it needs a live project for Vertex AI RAG.
+"""
+
+import argparse
+from collections.abc import Callable
+
+from bench_utils import summarize, time_calls
+
+from app.utils.catalog import parse_corpus_path
+from app.utils.formatting import format_bq_string
+
+
+def precision(contexts: list[tuple[str, str]], subject: str, chapter: str) -> float:
+    if not contexts:
+        return 0.0
+    expected = (format_bq_string(subject), format_bq_string(chapter))
+    hits = 0
+    for uri, _ in contexts:
+        parsed = parse_corpus_path(uri)
+        if parsed and tuple(map(format_bq_string, parsed)) == expected:
+            hits += 1
+    return hits / len(contexts)
+
+
+def measure(
+    retrieve: Callable[[], list[tuple[str, str]]], iterations: int
+) -> tuple[list[float], list[tuple[str, str]]]:
+    results: list[tuple[str, str]] = []
+
+    def call() -> None:
+        results[:] = retrieve()
+
+    return time_calls(call, iterations), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--subjects", nargs="*", help="Only these subjects")
+    args = parser.parse_args()
+
+    from app.tools import corpus_catalog, retrieval_cache, student_helper_retrieval
+
+    def retrieve(subject: str, chapter: str, scoped: bool) -> list[tuple[str, str]]:
+        retrieval_cache.invalidate()
+        return student_helper_retrieval.retrieve(
+            f"{subject} {chapter}",
+            subject=subject if scoped else None,
+            chapter=chapter if scoped else None,
+        )
+
+    totals: dict[str, list[float]] = {"corpus": [], "scoped": []}
+    for subject in args.subjects or corpus_catalog.subjects():
+        for chapter in corpus_catalog.chapters(subject):
+            for mode in totals:
+                latencies, contexts = measure(
+                    lambda subject=subject, chapter=chapter, mode=mode: retrieve(
+                        subject, chapter, mode == "scoped"
+                    ),
+                    args.iterations,
+                )
+                score = precision(contexts, subject, chapter)
+                totals[mode].append(score)
+                print(
+                    summarize(f"{mode} {subject}/{chapter}"[:32], latencies)
+                    + f" precision={score:.2f}"
+                )
+
+    for mode, scores in totals.items():
+        if scores:
+            print(f"mean precision {mode}: {sum(scores) / len(scores):.3f}")
+
+
+if __name__ == "__main__":
+    main()
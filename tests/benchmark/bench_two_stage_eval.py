@@ -0,0 +1,167 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares single-stage evaluation, where one call returns the score and the
+feedback, with two-stage evaluation, where a short scoring call returns the
+score and the feedback is elaborated in a separate call while the next question
+is generated.
+
+The agents are emulated: a call takes `--first-token-ms` plus `--ms-per-token`
+per output token, with `--eval-tokens` for the single-stage answer,
+`--score-tokens` for the scoring answer and `--feedback-tokens` for the
+feedback. A share of `--full-score-rate` of the answers gets the full score,
+which needs no feedback in two stages. The throughput per grader is the number
+of evaluations per second a grading call occupies the evaluation agent.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any
+from unittest.mock import Mock, patch
+
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.eval_pipeline import ConcurrentEvalAgentTool
+from app.utils.formatting import format_agent_json
+
+REQUEST = {
+    "subject": "Geschiedenis",
+    "chapter": "De Belgische Revolutie",
+    "question": "Wat waren de oorzaken van de Belgische Revolutie?",
+    "correct_answer": "Taal, godsdienst, politieke en economische onvrede",
+    "answer": "De onvrede over de taal en de godsdienst",
+    "difficulty": 3,
+    "max_score": 4,
+}
+
+
+class FakeGenerationTool:
+    def __init__(self, generation_ms: float) -> None:
+        self.generation_ms = generation_ms
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: Any) -> str:
+        request = json.loads(args["request"])
+        await asyncio.sleep(self.generation_ms / 1000)
+        return format_agent_json(
+            {
+                "subject": request["subject"],
+                "chapter": request["chapter"],
+                "question": "Wie was Charles Rogier?",
+                "answer": "Een leider van de revolutie",
+                "difficulty": request["difficulty"],
+                "max_score": 2,
+            }
+        )
+
+
+def emulated_agents(
+    options: argparse.Namespace, two_stage: bool, tokens: Counter, timings: dict
+) -> Any:
+    async def run_async(
+        self: AgentTool, *, args: dict[str, Any], tool_context: Any
+    ) -> str:
+        name = self.agent.name
+        if name == "answer_feedback_agent":
+            count = options.feedback_tokens
+        else:
+            count = options.score_tokens if two_stage else options.eval_tokens
+        busy = options.first_token_ms + options.ms_per_token * count
+        await asyncio.sleep(busy / 1000)
+        tokens[name] += count
+        if name == "answer_feedback_agent":
+            return "Je vergeet de politieke en economische oorzaken."
+        timings["scored"] = time.perf_counter()
+        timings["grader_ms"] += busy
+        score = timings["scores"].pop()
+        evaluation = {"evaluation": "Gedeeltelijk correct", "score": score}
+        if not two_stage:
+            evaluation = {
+                **REQUEST,
+                **evaluation,
+                "feedback": "Je vergeet de politieke en economische oorzaken.",
+            }
+        return format_agent_json(evaluation)
+
+    return run_async
+
+
+async def run(args: argparse.Namespace, two_stage: bool) -> None:
+    rng = random.Random(0)
+    tokens: Counter = Counter()
+    timings: dict[str, Any] = {
+        "grader_ms": 0.0,
+        "scores": [
+            REQUEST["max_score"] if rng.random() < args.full_score_rate else 2
+            for _ in range(args.evaluations)
+        ],
+    }
+    tool = ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=FakeGenerationTool(args.generation_ms),
+        feedback_agent=(
+            Agent(name="answer_feedback_agent", model="gemini-2.0-flash-001")
+            if two_stage
+            else None
+        ),
+        feedback_timeout=args.feedback_timeout_ms / 1000,
+    )
+    score_ms = turn_ms = 0.0
+    with patch.object(
+        AgentTool, "run_async", emulated_agents(args, two_stage, tokens, timings)
+    ):
+        for _ in range(args.evaluations):
+            start = time.perf_counter()
+            await tool.run_async(
+                args={"request": json.dumps(REQUEST)}, tool_context=Mock(state={})
+            )
+            turn_ms += (time.perf_counter() - start) * 1000
+            score_ms += (timings["scored"] - start) * 1000
+
+    n = args.evaluations
+    stats = tool.stats()
+    print(
+        f"{'two-stage' if two_stage else 'single-stage':<13} "
+        f"score={score_ms / n:6.0f}ms turn={turn_ms / n:6.0f}ms "
+        f"grader={1000 * n / timings['grader_ms']:5.2f} eval/s "
+        f"grading tokens={tokens['question_eval_agent'] / n:5.0f} "
+        f"feedback tokens={tokens['answer_feedback_agent'] / n:5.0f} "
+        f"elaborated={stats['feedback_elaborated']} "
+        f"cancelled={stats['feedback_cancelled']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--evaluations", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-token", type=float, default=6.0)
+    parser.add_argument("--eval-tokens", type=int, default=260)
+    parser.add_argument("--score-tokens", type=int, default=30)
+    parser.add_argument("--feedback-tokens", type=int, default=120)
+    parser.add_argument("--full-score-rate", type=float, default=0.4)
+    parser.add_argument("--generation-ms", type=float, default=900.0)
+    parser.add_argument("--feedback-timeout-ms", type=float, default=3000.0)
+    args = parser.parse_args()
+
+    for two_stage in (False, True):
+        asyncio.run(run(args, two_stage))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import statistics
+import time
+from collections.abc import Callable
+
+
+def time_calls(func: Callable[[], object], iterations: int) -> list[float]:
+    """Calls `func` `iterations` times and returns the latencies in milliseconds."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name: str, latencies: list[float]) -> str:
+    """Formats mean/p50/p95/max of a list of millisecond latencies as one line."""
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (
+        f"{name:<32} n={len(ordered):<6} mean={statistics.fmean(ordered):9.3f}ms "
+        f"p50={statistics.median(ordered):9.3f}ms p95={p95:9.3f}ms "
+        f"max={ordered[-1]:9.3f}ms"
+    )
@@ -0,0 +1,144 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import Mock
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from app import callbacks
+from app.utils.scores import get_cached_score
+
+EVALUATION: dict[str, Any] = {
+    "question": "Wat is de hoofdstad van Frankrijk?",
+    "answer": "Parijs",
+    "subject": "Aardrijkskunde",
+    "chapter": "Hoofdsteden van Europa",
+    "evaluation": "Correct",
+    "score": 2,
+    "difficulty": 1,
+    "max_score": 2,
+    "feedback": "Je antwoord is correct.",
+}
+
+
+@pytest.fixture
+def store_results(monkeypatch: pytest.MonkeyPatch) -> Mock:
+    store_results = Mock()
+    monkeypatch.setattr(callbacks, "store_results", store_results)
+    return store_results
+
+
+def _context() -> Any:
+    return SimpleNamespace(state={"user_id": "user", "session_id": "session"})
+
+
+def _request(name: str, result: Any) -> LlmRequest:
+    return LlmRequest(
+        contents=[
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part(
+                        function_response=types.FunctionResponse(
+                            name=name, response={"result": result}
+                        )
+                    )
+                ],
+            )
+        ]
+    )
+
+
+def _text(response: Any) -> str:
+    return response.content.parts[0].text
+
+
+def test_evaluation_is_stored_and_answered(store_results: Mock) -> None:
+    """A valid evaluation is stored, added to the totals and answered."""
+    context = _context()
+    response = callbacks.before_model_callback(
+        context, _request("question_eval_agent", EVALUATION)
+    )
+
+    assert response is not None and EVALUATION["feedback"] in _text(response)
+    assert store_results.call_args.kwargs["student_score"] == 2
+    assert get_cached_score(context.state, "Aardrijkskunde", "Hoofdsteden van Europa")
+
+
+def test_invalid_next_question_is_dropped(store_results: Mock) -> None:
+    """A next question that doesn't validate doesn't fail the evaluation."""
+    response = callbacks.before_model_callback(
+        _context(),
+        _request(
+            "question_eval_agent",
+            {**EVALUATION, "next_question": {"question": "Wat is de hoofdstad?"}},
+        ),
+    )
+
+    assert response is not None and "Wat is de hoofdstad?" not in _text(response)
+    store_results.assert_called_once()
+
+
+def test_graded_fields_are_stored_when_the_evaluation_is_invalid(
+    store_results: Mock,
+) -> None:
+    """The grade is stored even when other fields of the evaluation are missing."""
+    evaluation = {
+        key: value
+        for key, value in EVALUATION.items()
+        if key not in ("feedback", "difficulty")
+    }
+    response = callbacks.before_model_callback(
+        _context(), _request("question_eval_agent", evaluation)
+    )
+
+    assert response is None
+    assert store_results.call_args.kwargs["student_score"] == 2
+    assert store_results.call_args.kwargs["difficulty"] == 3
+
+
+def test_score_above_max_score_is_rejected(store_results: Mock) -> None:
+    """A score higher than the maximum is neither stored nor answered."""
+    response = callbacks.before_model_callback(
+        _context(), _request("question_eval_agent", {**EVALUATION, "score": 3})
+    )
+
+    assert response is None
+    store_results.assert_not_called()
+
+
+def test_score_totals_are_answered() -> None:
+    """The totals of `get_bq_data` are answered, or the lack of them."""
+    totals = {
+        "total_student_score": 3,
+        "total_max_score": 4,
+        "total_percentage": 75.0,
+    }
+    response = callbacks.before_model_callback(
+        _context(), _request("get_bq_data", totals)
+    )
+    assert response is not None and "3/4 (75%)" in _text(response)
+
+    response = callbacks.before_model_callback(
+        _context(),
+        _request(
+            "get_bq_data",
+            dict.fromkeys(totals),
+        ),
+    )
+    assert response is not None and "nog geen vragen" in _text(response)
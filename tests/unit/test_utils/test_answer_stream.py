@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import random
+from typing import Any
+
+from app.utils.answer_stream import (
+    AnswerStream,
+    AnswerStreams,
+    EvaluationStreamer,
+    format_next_question,
+    format_score_line,
+)
+from app.utils.incremental_json import IncrementalJsonParser
+
+EVALUATION: dict[str, Any] = {
+    "question": 'Wat is de hoofdstad van "België"?',
+    "answer": "Brussel",
+    "subject": "Aardrijkskunde",
+    "chapter": "België",
+    "evaluation": "Correct",
+    "score": 2,
+    "difficulty": 3,
+    "max_score": 2,
+    "feedback": "Goed zo, 't is Brussel 🇧🇪.\nGa zo door!",
+    "next_question": {"question": "Wat is de hoofdstad van {Frankrijk}?"},
+    "correct_answer": None,
+}
+
+
+def test_parser_reports_values_and_string_deltas_across_chunks() -> None:
+    """Any chunking of a fenced answer yields the same values and deltas."""
+    text = f"```json\n{json.dumps(EVALUATION, indent=2)}\n```"
+    for seed in range(50):
+        rng = random.Random(seed)
+        parser = IncrementalJsonParser()
+        values: dict[str, Any] = {}
+        feedback = ""
+        index = 0
+        while index < len(text):
+            size = rng.randint(1, 8)
+            for kind, key, value in parser.feed(text[index : index + size]):
+                if kind == "value":
+                    values[key] = value
+                elif key == "feedback":
+                    feedback += value
+            index += size
+
+        assert values == EVALUATION
+        assert feedback == EVALUATION["feedback"]
+        assert parser.done
+
+
+class FakeStream(AnswerStream):
+    def __init__(self) -> None:
+        super().__init__()
+        self.pieces: list[str] = []
+
+    def put(self, text: str) -> None:
+        self.pieces.append(text)
+
+
+def test_streamer_sends_the_score_line_before_the_feedback() -> None:
+    """The score line goes out once parsed, then the feedback as it arrives."""
+    stream = FakeStream()
+    streamer = EvaluationStreamer(stream)
+    text = json.dumps(EVALUATION)
+    feedback_start = text.index("Goed zo")
+
+    streamer.feed(text[: feedback_start + 5])
+    assert stream.pieces == [format_score_line(2, 2, 3), "Goed "]
+
+    streamer.feed(text[feedback_start + 5 :])
+    streamer.evaluation(EVALUATION)
+    streamer.next_question(
+        {"question": "Wat is 2 + 2?", "difficulty": 4, "max_score": 1}
+    )
+
+    assert "".join(stream.pieces) == (
+        format_score_line(2, 2, 3)
+        + EVALUATION["feedback"]
+        + format_next_question("Wat is 2 + 2?", 4, 1)
+    )
+
+
+def test_streamer_sends_a_local_evaluation_at_once() -> None:
+    """An evaluation that wasn't streamed is sent whole."""
+    stream = FakeStream()
+    streamer = EvaluationStreamer(stream)
+    streamer.evaluation({**EVALUATION, "score": 0})
+
+    assert stream.pieces == [format_score_line(0, 2, 3), EVALUATION["feedback"]]
+
+
+def test_streamer_coerces_the_next_question() -> None:
+    """Numeric strings are streamed as numbers, incomplete questions not at all."""
+    stream = FakeStream()
+    streamer = EvaluationStreamer(stream)
+    streamer.evaluation(EVALUATION)
+    streamer.next_question({"question": "Wat is 2 + 2?", "difficulty": "4"})
+    streamer.next_question(
+        {"question": "Wat is 2 + 2?", "difficulty": "4", "max_score": "1"}
+    )
+
+    assert stream.pieces[-1] == format_next_question("Wat is 2 + 2?", 4, 1)
+    assert len(stream.pieces) == 3
+
+
+def event(text: str | None = None, call: str | None = None) -> dict[str, Any]:
+    part: dict[str, Any] = (
+        {"text": text} if call is None else {"function_call": {"name": call}}
+    )
+    return {"author": "root_agent", "content": {"role": "model", "parts": [part]}}
+
+
+def test_streams_are_merged_and_not_repeated() -> None:
+    """Streamed text arrives before the final answer, which drops the repeat."""
+    streams = AnswerStreams()
+    final = format_score_line(2, 2, 3) + "Goed zo."
+
+    def events() -> Any:
+        yield event(call="question_eval_agent")
+        stream = streams.get("session")
+        assert stream is not None
+        stream.put(format_score_line(2, 2, 3))
+        stream.put("Goed zo.")
+        yield event(final)
+
+    received = list(streams.stream("session", events(), author="root_agent"))
+
+    assert [e.get("partial", False) for e in received] == [False, True, True, False]
+    assert (
+        "".join(
+            part.get("text", "") for e in received for part in e["content"]["parts"]
+        )
+        == final
+    )
+    assert received[-1]["content"]["parts"] == [{"text": ""}]
+    assert streams.get("session") is None
+    stats = streams.stats()
+    assert (stats["turns"], stats["answer_turns"], stats["streamed_answers"]) == (
+        1,
+        1,
+        1,
+    )
+    assert stats["answer_ttft_ms_mean"] > 0
@@ -0,0 +1,68 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Generator
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.utils.bigquery import BigQueryClientPool
+
+
+@pytest.fixture
+def client_factory() -> Mock:
+    """Create a factory returning a new mock client per call."""
+    return Mock(side_effect=lambda **kwargs: Mock(**kwargs))
+
+
+@pytest.fixture
+def patch_auth() -> Generator[Mock, None, None]:
+    """Patch the google.auth.default function."""
+    with patch("google.auth.default", return_value=(Mock(), "project")) as mock_auth:
+        yield mock_auth
+
+
+@pytest.fixture
+def pool(client_factory: Mock, patch_auth: Mock) -> BigQueryClientPool:
+    """Create a BigQueryClientPool backed by mock clients."""
+    return BigQueryClientPool(client_factory=client_factory)
+
+
+def test_client_built_once_per_project_and_location(
+    pool: BigQueryClientPool, client_factory: Mock, patch_auth: Mock
+) -> None:
+    """Clients are shared per (project, location) key."""
+    first = pool.get_client("europe-west1")
+    assert pool.get_client("europe-west1", "project") is first
+    assert pool.get_client("europe-west3") is not first
+    assert client_factory.call_count == 2
+    patch_auth.assert_called_once()
+
+
+def test_table_metadata_is_cached(pool: BigQueryClientPool) -> None:
+    """get_table only hits BigQuery once per table id."""
+    table = pool.get_table("project.dataset.table", "europe-west1")
+    assert pool.get_table("project.dataset.table", "europe-west1") is table
+    pool.get_client("europe-west1").get_table.assert_called_once_with(
+        "project.dataset.table"
+    )
+
+
+def test_unhealthy_client_is_evicted(pool: BigQueryClientPool) -> None:
+    """A failing health check drops the client so it gets rebuilt."""
+    client = pool.get_client("europe-west1")
+    client.query.side_effect = RuntimeError("connection reset")
+    assert pool.check_health("europe-west1") is False
+    assert pool.get_client("europe-west1") is not client
+    assert pool.check_health("europe-west1") is True
@@ -0,0 +1,176 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from unittest.mock import Mock, patch
+
+import pytest
+from vertexai import rag
+
+from app.utils.cache import LruTtlCache
+from app.utils.retrieval import CachedVertexAiRagRetrieval, normalize_query
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Entries beyond the byte budget are evicted oldest-used first."""
+    cache = LruTtlCache(max_bytes=30, ttl=60, size_fn=len)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 10)
+    cache.put("c", "x" * 10)
+    assert cache.get("a") is not None
+    cache.put("d", "x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_bytes"] == 30
+
+
+def test_cache_expires_entries() -> None:
+    """Entries older than the ttl are misses."""
+    cache = LruTtlCache(max_bytes=1000, ttl=60)
+    with patch("app.utils.cache.time.monotonic", return_value=0):
+        cache.put("a", "value")
+    with patch("app.utils.cache.time.monotonic", return_value=30):
+        assert cache.get("a") == "value"
+    with patch("app.utils.cache.time.monotonic", return_value=61):
+        assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_cache_invalidates_by_tag() -> None:
+    """Only entries carrying the tag are dropped."""
+    cache = LruTtlCache(max_bytes=1000, ttl=60)
+    cache.put("a", "1", tags=["corpus/1"])
+    cache.put("b", "2", tags=["corpus/2"])
+
+    assert cache.invalidate("corpus/1") == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == "2"
+
+
+@pytest.fixture
+def retrieval() -> CachedVertexAiRagRetrieval:
+    return CachedVertexAiRagRetrieval(
+        name="student_helper_retrieval",
+        description="retrieval",
+        rag_resources=[rag.RagResource(rag_corpus="ragCorpora/1")],
+        similarity_top_k=5,
+        cache=LruTtlCache(max_bytes=10_000, ttl=60),
+    )
+
+
+def retrieval_response(*texts: str) -> Mock:
+    return Mock(
+        contexts=Mock(
+            contexts=[Mock(text=text, source_uri="gs://b/s/c/f.pdf") for text in texts]
+        )
+    )
+
+
+def test_normalize_query() -> None:
+    """Case, whitespace and trailing punctuation don't change the key."""
+    assert normalize_query("  Wat is  een Vergelijking? ") == "wat is een vergelijking"
+
+
+@pytest.mark.asyncio
+async def test_retrieval_is_served_from_cache(
+    retrieval: CachedVertexAiRagRetrieval,
+) -> None:
+    """A repeated query doesn't reach the vector search."""
+    with patch(
+        "google.adk.tools.retrieval.vertex_ai_rag_retrieval.rag.retrieval_query",
+        return_value=retrieval_response("chunk"),
+    ) as retrieval_query:
+        first = await retrieval.run_async(
+            args={"query": "Vergelijkingen"}, tool_context=Mock()
+        )
+        second = await retrieval.run_async(
+            args={"query": "vergelijkingen?"}, tool_context=Mock()
+        )
+
+    assert first == second == ["chunk"]
+    retrieval_query.assert_called_once()
+    assert retrieval.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_retrieval_cache_skips_misses_and_invalidates(
+    retrieval: CachedVertexAiRagRetrieval,
+) -> None:
+    """Empty results aren't cached and a corpus invalidation drops its entries."""
+    with patch(
+        "google.adk.tools.retrieval.vertex_ai_rag_retrieval.rag.retrieval_query",
+        side_effect=[retrieval_response(), retrieval_response("chunk")] * 2,
+    ) as retrieval_query:
+        await retrieval.run_async(args={"query": "q"}, tool_context=Mock())
+        await retrieval.run_async(args={"query": "q"}, tool_context=Mock())
+        retrieval.invalidate_corpus("ragCorpora/1")
+        await retrieval.run_async(args={"query": "q"}, tool_context=Mock())
+
+    assert retrieval_query.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_retrieval_is_scoped_to_chapter_files(
+    retrieval: CachedVertexAiRagRetrieval,
+) -> None:
+    """A known subject and chapter restrict the search to their files."""
+    retrieval.scope_fn = Mock(
+        side_effect=lambda subject, chapter: (
+            ["ragCorpora/1/ragFiles/7"] if chapter == "Integralen" else []
+        )
+    )
+    with patch(
+        "google.adk.tools.retrieval.vertex_ai_rag_retrieval.rag.retrieval_query",
+        return_value=retrieval_response("chunk"),
+    ) as retrieval_query:
+        await retrieval.run_async(
+            args={"query": "q", "subject": "Wiskunde", "chapter": "Integralen"},
+            tool_context=Mock(),
+        )
+        await retrieval.run_async(
+            args={"query": "q", "subject": "Wiskunde", "chapter": "Onbekend"},
+            tool_context=Mock(),
+        )
+
+    scoped, unscoped = (
+        call.kwargs["rag_resources"][0] for call in retrieval_query.call_args_list
+    )
+    assert scoped.rag_file_ids == ["7"]
+    assert not unscoped.rag_file_ids
+
+
+@pytest.mark.asyncio
+async def test_retrieval_only_initialises_a_changed_location(
+    retrieval: CachedVertexAiRagRetrieval,
+) -> None:
+    """Vertex AI is initialised only when the global location differs."""
+    retrieval.location = "europe-west1"
+    with (
+        patch(
+            "google.adk.tools.retrieval.vertex_ai_rag_retrieval.rag.retrieval_query",
+            return_value=retrieval_response("chunk"),
+        ),
+        patch("app.utils.retrieval.initializer") as initializer,
+        patch("app.utils.retrieval.vertexai.init") as init,
+    ):
+        initializer.global_config.location = "europe-west1"
+        await retrieval.run_async(args={"query": "a"}, tool_context=Mock())
+        init.assert_not_called()
+
+        initializer.global_config.location = "us-central1"
+        await retrieval.run_async(args={"query": "b"}, tool_context=Mock())
+        init.assert_called_once_with(project=None, location="europe-west1")
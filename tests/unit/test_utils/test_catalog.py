@@ -0,0 +1,129 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from unittest.mock import Mock, patch
+
+from app.utils.catalog import CorpusCatalog, gcs_generation_version, parse_corpus_path
+
+
+def rag_file(name: str, uri: str) -> Mock:
+    file = Mock(gcs_source=Mock(uris=[uri]))
+    file.name = name
+    return file
+
+
+FILES = [
+    rag_file("files/1", "gs://bucket/Wiskunde/Vergelijkingen/deel1.pdf"),
+    rag_file("files/2", "gs://bucket/Wiskunde/Vergelijkingen/deel2.pdf"),
+    rag_file("files/3", "gs://bucket/Wiskunde/Integralen/integralen.pdf"),
+    rag_file("files/4", "gs://bucket/Geschiedenis/Romeinse Rijk.pdf"),
+]
+
+
+def test_parse_corpus_path() -> None:
+    """Subject and chapter come from the folders, else from the file name."""
+    assert parse_corpus_path("gs://b/Wiskunde/Integralen/a.pdf") == (
+        "Wiskunde",
+        "Integralen",
+    )
+    assert parse_corpus_path("gs://b/Geschiedenis/Romeinse Rijk.pdf") == (
+        "Geschiedenis",
+        "Romeinse Rijk",
+    )
+    assert parse_corpus_path("gs://b/los.pdf") is None
+
+
+def test_catalog_lists_subjects_chapters_and_files() -> None:
+    """The index is built once and answers all lookups."""
+    list_files = Mock(return_value=FILES)
+    catalog = CorpusCatalog(list_files=list_files)
+
+    assert catalog.subjects() == ["Geschiedenis", "Wiskunde"]
+    assert catalog.chapters("wiskunde") == ["Integralen", "Vergelijkingen"]
+    assert catalog.chapters("Aardrijkskunde") == []
+    assert catalog.files("Wiskunde", "vergelijkingen") == ["files/1", "files/2"]
+    assert catalog.files("Wiskunde") == ["files/1", "files/2", "files/3"]
+    list_files.assert_called_once()
+
+
+def test_catalog_rebuilds_after_version_change() -> None:
+    """A new corpus version invalidates the index."""
+    list_files = Mock(return_value=FILES)
+    version = Mock(return_value=1)
+    on_change = Mock()
+    catalog = CorpusCatalog(
+        list_files=list_files,
+        version_fn=version,
+        version_check_interval=0,
+        on_change=on_change,
+    )
+
+    catalog.subjects()
+    catalog.subjects()
+    assert list_files.call_count == 1
+    on_change.assert_not_called()
+
+    version.return_value = 2
+    catalog.subjects()
+    assert list_files.call_count == 2
+    on_change.assert_called_once()
+
+
+def test_lookups_are_served_while_the_version_is_read() -> None:
+    """A slow version read doesn't block other lookups."""
+    reading = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_version() -> int:
+        calls.append(1)
+        # The first read is the build's, the second one blocks.
+        if len(calls) == 2:
+            reading.set()
+            release.wait(5)
+        return 1
+
+    catalog = CorpusCatalog(
+        list_files=Mock(return_value=FILES),
+        version_fn=slow_version,
+        version_check_interval=0,
+    )
+    catalog.subjects()
+
+    checker = threading.Thread(target=catalog.subjects)
+    checker.start()
+    assert reading.wait(5)
+    lookup = threading.Thread(target=catalog.chapters, args=("Wiskunde",))
+    lookup.start()
+    lookup.join(1)
+    assert not lookup.is_alive()
+    release.set()
+    checker.join(5)
+
+
+def test_version_client_is_built_on_the_first_check() -> None:
+    """Building the version function doesn't look up credentials."""
+    with patch("google.cloud.storage.Client") as client:
+        client.return_value.bucket.return_value.get_blob.return_value = Mock(
+            generation=7
+        )
+        version = gcs_generation_version("gs://bucket/_catalog/version")
+        client.assert_not_called()
+
+        assert version() == 7
+        assert version() == 7
+
+    client.assert_called_once_with()
+    client.return_value.bucket.assert_called_once_with("bucket")
@@ -0,0 +1,72 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from app.utils.chapter_context import (
+    advance_context_window,
+    get_context_window,
+    get_pinned_context,
+    pin_chapter_context,
+    remove_function_declaration,
+)
+
+
+def test_pin_chapter_context_caps_size() -> None:
+    """Whole chunks are pinned up to the character cap, per chapter."""
+    state: dict = {}
+    pin_chapter_context(state, "Wiskunde", "Integralen", ["a" * 6, "b" * 6], 10)
+
+    assert get_pinned_context(state, "wiskunde", "integralen") == ["a" * 6]
+    assert get_pinned_context(state, "Wiskunde", "Vergelijkingen") is None
+
+
+def test_context_window_moves_through_the_pinned_chunks() -> None:
+    """Each question gets the next chunks, until every chunk was used."""
+    state: dict = {}
+    pin_chapter_context(state, "Wiskunde", "Integralen", ["a", "b", "c"], 100)
+    assert get_context_window(state, "Wiskunde", "Integralen") == []
+
+    advance_context_window(state, "Wiskunde", "Integralen", 2)
+    assert get_context_window(state, "wiskunde", "integralen") == ["a", "b"]
+    advance_context_window(state, "Wiskunde", "Integralen", 2)
+    assert get_context_window(state, "Wiskunde", "Integralen") == ["c"]
+    advance_context_window(state, "Wiskunde", "Integralen", 2)
+    assert get_context_window(state, "Wiskunde", "Integralen") == []
+    assert get_context_window(state, "Wiskunde", "Vergelijkingen") == []
+
+
+def test_remove_function_declaration() -> None:
+    """The retrieval declaration is hidden while other tools stay."""
+    llm_request = LlmRequest(
+        config=types.GenerateContentConfig(
+            tools=[
+                types.Tool(
+                    function_declarations=[
+                        types.FunctionDeclaration(name="student_helper_retrieval")
+                    ]
+                ),
+                types.Tool(
+                    function_declarations=[types.FunctionDeclaration(name="other")]
+                ),
+            ]
+        )
+    )
+    remove_function_declaration(llm_request, "student_helper_retrieval")
+
+    assert [
+        declaration.name
+        for tool in llm_request.config.tools
+        for declaration in tool.function_declarations
+    ] == ["other"]
@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.utils.corpus import CorpusResolver
+
+
+def corpus(display_name: str, name: str) -> Mock:
+    mock = Mock(display_name=display_name)
+    mock.name = name
+    return mock
+
+
+@pytest.fixture
+def list_corpora() -> Iterator[Mock]:
+    with (
+        patch("app.utils.corpus.vertexai.init"),
+        patch(
+            "app.utils.corpus.rag.list_corpora",
+            return_value=[
+                corpus("other", "ragCorpora/1"),
+                corpus("student-helper-rag-corpus", "ragCorpora/2"),
+            ],
+        ) as list_corpora,
+    ):
+        yield list_corpora
+
+
+def test_resolves_once_on_first_use(list_corpora: Mock) -> None:
+    """Corpora are only listed on the first call."""
+    resolver = CorpusResolver("student-helper-rag-corpus", location="europe-west3")
+    list_corpora.assert_not_called()
+
+    assert resolver() == "ragCorpora/2"
+    assert resolver() == "ragCorpora/2"
+    list_corpora.assert_called_once()
+
+
+def test_resolution_is_persisted(list_corpora: Mock, tmp_path: Path) -> None:
+    """A second resolver reads the name from the cache file."""
+    cache_path = str(tmp_path / "corpus.json")
+    CorpusResolver("student-helper-rag-corpus", "europe-west3", cache_path=cache_path)()
+
+    resolver = CorpusResolver(
+        "student-helper-rag-corpus", "europe-west3", cache_path=cache_path
+    )
+    assert resolver() == "ragCorpora/2"
+    list_corpora.assert_called_once()
+
+    resolver.invalidate()
+    assert resolver() == "ragCorpora/2"
+    assert list_corpora.call_count == 2
+
+
+def test_known_resource_name_and_missing_corpus(list_corpora: Mock) -> None:
+    """A configured resource name skips listing, an unknown corpus raises."""
+    assert CorpusResolver("x", "europe-west3", resource_name="ragCorpora/9")() == (
+        "ragCorpora/9"
+    )
+    list_corpora.assert_not_called()
+
+    with pytest.raises(LookupError):
+        CorpusResolver("missing", "europe-west3")()
@@ -0,0 +1,491 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import json
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.cache import LruTtlCache
+from app.utils.eval_pipeline import (
+    ConcurrentEvalAgentTool,
+    SpeculativeQuestionGenerator,
+    next_difficulty,
+)
+from app.utils.evaluation_cache import EvaluationCache
+from app.utils.formatting import format_agent_json, parse_agent_json
+from app.utils.grading import LocalGrader
+from app.utils.provisional_score import ProvisionalScorer
+
+REQUEST: dict[str, Any] = {
+    "subject": "Wiskunde",
+    "chapter": "Vergelijkingen",
+    "question": "Los op: 2x = 10",
+    "correct_answer": "x = 5",
+    "answer": "x = 5",
+    "difficulty": 3,
+    "max_score": 4,
+    "previous_questions": ["Los op: x + 1 = 2"],
+}
+
+
+class FakeGenerationTool:
+    """Generates a question per difficulty after a short delay."""
+
+    def __init__(self) -> None:
+        self.requests: list[dict[str, Any]] = []
+        self.cancelled = 0
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: Any) -> str:
+        request = json.loads(args["request"])
+        self.requests.append(request)
+        try:
+            await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return format_agent_json(
+            {
+                "subject": request["subject"],
+                "chapter": request["chapter"],
+                "question": f"vraag {request['difficulty']}",
+                "answer": "antwoord",
+                "difficulty": request["difficulty"],
+                "max_score": 4,
+            }
+        )
+
+
+def make_tool(
+    generation_tool: Any, speculator: SpeculativeQuestionGenerator | None = None
+) -> ConcurrentEvalAgentTool:
+    return ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=generation_tool,
+        speculator=speculator,
+    )
+
+
+def generate(subject: str, chapter: str, difficulty: int) -> dict:
+    return {
+        "subject": subject,
+        "chapter": chapter,
+        "question": f"kandidaat {difficulty}",
+        "answer": "antwoord",
+        "difficulty": difficulty,
+        "max_score": 4,
+    }
+
+
+def grader(score: int) -> AsyncMock:
+    """Grades every answer with `score` after a short delay."""
+
+    async def grade(*, args: dict[str, Any], tool_context: Any) -> str:
+        await asyncio.sleep(0.005)
+        return format_agent_json(
+            {**REQUEST, "evaluation": "Correct", "score": score, "feedback": "Goed."}
+        )
+
+    return AsyncMock(side_effect=grade)
+
+
+@pytest.mark.parametrize(
+    "score,max_score,difficulty,expected",
+    [(4, 4, 3, 4), (4, 4, 5, 5), (1, 4, 3, 2), (0, 4, 1, 1), (3, 4, 3, 3)],
+)
+def test_next_difficulty(
+    score: int, max_score: int, difficulty: int, expected: int
+) -> None:
+    """The difficulty follows the score, within 1-5."""
+    assert next_difficulty(score, max_score, difficulty) == expected
+
+
+@pytest.mark.asyncio
+async def test_next_question_is_reused_when_difficulty_stays() -> None:
+    """The question generated during grading becomes `next_question`."""
+    generation_tool = FakeGenerationTool()
+    tool = make_tool(generation_tool)
+    with patch.object(AgentTool, "run_async", grader(3)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock()
+        )
+
+    result = parse_agent_json(result)
+    assert result["score"] == 3
+    assert result["next_question"]["question"] == "vraag 3"
+    assert generation_tool.requests[0]["previous_questions"] == [
+        "Los op: x + 1 = 2",
+        "Los op: 2x = 10",
+    ]
+    assert tool.stats() == {
+        "evaluations": 1,
+        "next_questions_reused": 1,
+        "next_questions_speculated": 0,
+        "regenerations": 0,
+        "feedback_elaborated": 0,
+        "feedback_cancelled": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_next_question_is_regenerated_when_difficulty_changes() -> None:
+    """A score above 80% discards the question and generates a harder one."""
+    generation_tool = FakeGenerationTool()
+    tool = make_tool(generation_tool)
+    with patch.object(AgentTool, "run_async", grader(4)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock()
+        )
+
+    assert parse_agent_json(result)["next_question"]["question"] == "vraag 4"
+    assert [r["difficulty"] for r in generation_tool.requests] == [3, 4]
+    assert generation_tool.cancelled == 1
+    assert tool.stats()["regenerations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_returns_evaluation_only() -> None:
+    """The evaluation is still returned when no next question could be made."""
+    generation_tool = Mock(run_async=AsyncMock(side_effect=RuntimeError("quota")))
+    tool = make_tool(generation_tool)
+    with patch.object(AgentTool, "run_async", grader(3)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock()
+        )
+
+    result = parse_agent_json(result)
+    assert result["score"] == 3
+    assert "next_question" not in result
+
+
+@pytest.mark.asyncio
+async def test_speculator_serves_candidate_matching_the_score() -> None:
+    """All neighbouring difficulties are generated and the right one is used."""
+    speculator = SpeculativeQuestionGenerator(generate_fn=Mock(side_effect=generate))
+    speculator.speculate("sessie", "Wiskunde", "Vergelijkingen", "vraag", 3)
+
+    assert speculator.claim("sessie", "andere vraag") is None
+    candidates = speculator.claim("sessie", "vraag")
+    assert candidates is not None
+    assert sorted(candidates) == [2, 3, 4]
+    for future in candidates.values():
+        future.result()
+    question = await speculator.take(candidates, 3, 4)
+    speculator.close()
+
+    assert question is not None
+    assert question["question"] == "kandidaat 4"
+    stats = speculator.stats()
+    assert (stats["used_up"], stats["used_same"], stats["used_down"]) == (1, 0, 0)
+    assert stats["candidates_generated"] == 3
+    assert stats["pending"] == 0
+
+
+def test_speculator_caps_candidates_by_usage() -> None:
+    """With one candidate, the offset the scores asked for most is generated."""
+    speculator = SpeculativeQuestionGenerator(
+        generate_fn=Mock(side_effect=generate), max_candidates=1
+    )
+    speculator.speculate("sessie", "Wiskunde", "Vergelijkingen", "vraag 1", 3)
+    candidates = speculator.claim("sessie", "vraag 1")
+    assert candidates is not None
+    assert list(candidates) == [3]
+    candidates[3].result()
+    assert asyncio.run(speculator.take(candidates, 3, 2)) is None
+
+    speculator.speculate("sessie", "Wiskunde", "Vergelijkingen", "vraag 2", 3)
+    candidates = speculator.claim("sessie", "vraag 2")
+    assert candidates is not None
+    assert list(candidates) == [2]
+    speculator.close()
+
+    stats = speculator.stats()
+    assert (stats["misses"], stats["candidates_wasted"]) == (1, 1)
+
+
+def test_speculator_skips_when_too_many_pending() -> None:
+    """Speculation is skipped rather than queueing beyond `max_pending`."""
+    speculator = SpeculativeQuestionGenerator(
+        generate_fn=Mock(side_effect=generate), max_pending=2
+    )
+    speculator.speculate("sessie", "Wiskunde", "Vergelijkingen", "vraag", 3)
+    speculator.close()
+
+    assert speculator.claim("sessie", "vraag") is None
+    assert speculator.stats()["speculations_skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_eval_tool_uses_speculated_question() -> None:
+    """A speculated candidate replaces generating during grading."""
+    speculator = SpeculativeQuestionGenerator(generate_fn=Mock(side_effect=generate))
+    speculator.speculate("sessie", "Wiskunde", "Vergelijkingen", REQUEST["question"], 3)
+    generation_tool = FakeGenerationTool()
+    tool = make_tool(generation_tool, speculator)
+    with patch.object(AgentTool, "run_async", grader(1)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)},
+            tool_context=Mock(state={"session_id": "sessie"}),
+        )
+    speculator.close()
+
+    assert parse_agent_json(result)["next_question"]["question"] == "kandidaat 2"
+    assert generation_tool.requests == []
+    assert tool.stats()["next_questions_speculated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_locally_graded_answer_skips_the_evaluation_agent() -> None:
+    """A decided answer is graded without the agent and then gets a question."""
+    generation_tool = FakeGenerationTool()
+    tool = ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=generation_tool,
+        grader=LocalGrader(),
+    )
+    with patch.object(AgentTool, "run_async", grader(0)) as evaluation_agent:
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock()
+        )
+
+    result = parse_agent_json(result)
+    evaluation_agent.assert_not_called()
+    assert (result["score"], result["evaluation"]) == (4, "Correct")
+    assert result["next_question"]["question"] == "vraag 4"
+    assert [r["difficulty"] for r in generation_tool.requests] == [4]
+
+
+@pytest.mark.asyncio
+async def test_streams_score_line_before_the_next_question() -> None:
+    """With an answer stream, the graded score goes out before generation ends."""
+    evaluation = json.dumps(
+        {
+            **{k: REQUEST[k] for k in ("question", "answer", "subject", "chapter")},
+            "evaluation": "Gedeeltelijk correct",
+            "score": 2,
+            "difficulty": 3,
+            "max_score": 4,
+            "feedback": "Bijna goed.",
+        }
+    )
+    stream = Mock()
+
+    async def grade_streaming(args: Any, tool_context: Any, streamer: Any) -> str:
+        for index in range(0, len(evaluation), 7):
+            streamer.feed(evaluation[index : index + 7])
+        return evaluation
+
+    tool = make_tool(FakeGenerationTool())
+    with (
+        patch("app.utils.eval_pipeline.answer_streams.get", return_value=stream),
+        patch.object(
+            ConcurrentEvalAgentTool,
+            "_grade_streaming",
+            AsyncMock(side_effect=grade_streaming),
+        ),
+    ):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock(state={})
+        )
+
+    pieces = [call.args[0] for call in stream.put.call_args_list]
+    text = "".join(pieces)
+    assert pieces[0] == "Score: 2/4\n\nMoeilijkheid: 3/5\n\n"
+    assert text.startswith("Score: 2/4\n\nMoeilijkheid: 3/5\n\nBijna goed.")
+    assert text.endswith("vraag 3\n\nMoeilijkheid: 3/5\n\nScore: /4")
+    assert parse_agent_json(result)["next_question"]["question"] == "vraag 3"
+
+
+def two_stage_agents(score: int, feedback_delay: float) -> Any:
+    """Scores every answer with `score` and elaborates feedback after a delay."""
+
+    async def run_async(
+        self: AgentTool, *, args: dict[str, Any], tool_context: Any
+    ) -> str:
+        if self.agent.name == "answer_feedback_agent":
+            await asyncio.sleep(feedback_delay)
+            return "Je vergat te delen door 2."
+        return format_agent_json(
+            {"evaluation": "Incorrect", "score": score, "correct_answer": "x = 5"}
+        )
+
+    return run_async
+
+
+def make_two_stage_tool(feedback_timeout: float) -> ConcurrentEvalAgentTool:
+    return ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=FakeGenerationTool(),
+        feedback_agent=Agent(
+            name="answer_feedback_agent", model="gemini-2.0-flash-001"
+        ),
+        feedback_timeout=feedback_timeout,
+    )
+
+
+@pytest.mark.asyncio
+async def test_two_stage_evaluation_elaborates_feedback() -> None:
+    """The scoring agent's score gets the feedback agent's feedback."""
+    tool = make_two_stage_tool(feedback_timeout=1.0)
+    stream = Mock()
+    with (
+        patch("app.utils.eval_pipeline.answer_streams.get", return_value=stream),
+        patch.object(AgentTool, "run_async", two_stage_agents(0, 0.0)),
+        patch.object(
+            ConcurrentEvalAgentTool,
+            "_grade_streaming",
+            AsyncMock(
+                return_value=format_agent_json(
+                    {"evaluation": "Incorrect", "score": 0, "correct_answer": "x = 5"}
+                )
+            ),
+        ),
+    ):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock(state={})
+        )
+
+    result = parse_agent_json(result)
+    assert (result["score"], result["max_score"]) == (0, 4)
+    assert result["question"] == REQUEST["question"]
+    assert result["correct_answer"] == "x = 5"
+    assert result["feedback"] == "Je vergat te delen door 2."
+    assert result["next_question"]["question"] == "vraag 2"
+    pieces = [call.args[0] for call in stream.put.call_args_list]
+    assert pieces[:2] == [
+        "Score: 0/4\n\nMoeilijkheid: 3/5\n\n",
+        "Je vergat te delen door 2.",
+    ]
+    assert tool.stats()["feedback_elaborated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_two_stage_evaluation_cancels_late_feedback() -> None:
+    """Feedback missing the deadline falls back to the one-line feedback."""
+    tool = make_two_stage_tool(feedback_timeout=0.02)
+    with patch.object(AgentTool, "run_async", two_stage_agents(0, 1.0)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock(state={})
+        )
+
+    result = parse_agent_json(result)
+    assert result["feedback"] == (
+        "Je antwoord is niet correct. Het juiste antwoord is: x = 5."
+    )
+    assert tool.stats()["feedback_cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_two_stage_evaluation_skips_feedback_for_full_scores() -> None:
+    """A full score is answered without the feedback agent."""
+    tool = make_two_stage_tool(feedback_timeout=1.0)
+    with patch.object(AgentTool, "run_async", two_stage_agents(4, 0.0)):
+        result = await tool.run_async(
+            args={"request": json.dumps(REQUEST)}, tool_context=Mock(state={})
+        )
+
+    result = parse_agent_json(result)
+    assert (result["score"], result["feedback"]) == (4, "Je antwoord is correct.")
+    assert "correct_answer" not in result
+    assert tool.stats()["feedback_elaborated"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cached_evaluation_skips_the_evaluation_agent() -> None:
+    """The same answer to the same question is graded by the agent once."""
+    tool = ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=FakeGenerationTool(),
+        cache=EvaluationCache(LruTtlCache(max_bytes=1 << 20, ttl=60)),
+    )
+    request = {**REQUEST, "answer": "x = 6"}
+    with patch.object(AgentTool, "run_async", grader(1)) as evaluation_agent:
+        for _ in range(3):
+            result = await tool.run_async(
+                args={"request": json.dumps(request)}, tool_context=Mock()
+            )
+
+    result = parse_agent_json(result)
+    assert evaluation_agent.call_count == 1
+    assert (result["score"], result["feedback"]) == (1, "Goed.")
+    assert result["next_question"]["question"] == "vraag 2"
+    assert tool.cache is not None
+    assert tool.cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_streams_provisional_score_before_grading() -> None:
+    """The provisional score goes out first and stays in the evaluation."""
+    request = {
+        **REQUEST,
+        "correct_answer": "De Franse Revolutie",
+        "answer": "De Franse Revolutie",
+    }
+    stream = Mock()
+
+    async def grade_streaming(args: Any, tool_context: Any, streamer: Any) -> str:
+        assert stream.put.call_args_list[0].args[0] == "Voorlopige score: 4/4\n\n"
+        return format_agent_json(
+            {**request, "evaluation": "Correct", "score": 3, "feedback": "Goed."}
+        )
+
+    tool = ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=FakeGenerationTool(),
+        provisional=ProvisionalScorer(),
+    )
+    with (
+        patch("app.utils.eval_pipeline.answer_streams.get", return_value=stream),
+        patch.object(
+            ConcurrentEvalAgentTool,
+            "_grade_streaming",
+            AsyncMock(side_effect=grade_streaming),
+        ),
+    ):
+        result = await tool.run_async(
+            args={"request": json.dumps(request)}, tool_context=Mock(state={})
+        )
+
+    result = parse_agent_json(result)
+    assert (result["provisional_score"], result["score"]) == (4, 3)
+    assert tool.provisional is not None
+    assert tool.provisional.stats()["corrected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_confident_provisional_score_skips_the_evaluation_agent() -> None:
+    """Above the threshold the provisional score is the grade."""
+    request = {
+        **REQUEST,
+        "correct_answer": "Parijs, de stad aan de Seine",
+        "answer": "Lyon aan de Rhône",
+    }
+    tool = ConcurrentEvalAgentTool(
+        agent=Agent(name="question_eval_agent", model="gemini-2.0-flash-001"),
+        generation_tool=FakeGenerationTool(),
+        provisional=ProvisionalScorer(threshold=0.9),
+    )
+    with patch.object(AgentTool, "run_async", grader(4)) as evaluation_agent:
+        result = await tool.run_async(
+            args={"request": json.dumps(request)}, tool_context=Mock()
+        )
+
+    result = parse_agent_json(result)
+    evaluation_agent.assert_not_called()
+    assert result["score"] == 0
+    assert result["correct_answer"] == request["correct_answer"]
+    assert "provisional_score" not in result
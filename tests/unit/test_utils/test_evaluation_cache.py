@@ -0,0 +1,83 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from typing import Any
+
+from app.utils.cache import LruTtlCache
+from app.utils.evaluation_cache import EvaluationCache
+
+REQUEST = {
+    "subject": "Aardrijkskunde",
+    "chapter": "Hoofdsteden van Europa",
+    "question": "Wat is de hoofdstad van Frankrijk?",
+    "correct_answer": "Parijs",
+    "answer": "Lyon",
+    "difficulty": 2,
+    "max_score": 1,
+}
+EVALUATION = {
+    **REQUEST,
+    "evaluation": "Incorrect",
+    "score": 0,
+    "feedback": "Lyon is een grote stad, maar niet de hoofdstad.",
+    "correct_answer": "Parijs",
+}
+
+
+def make_cache(**kwargs: Any) -> EvaluationCache:
+    return EvaluationCache(LruTtlCache(max_bytes=1 << 20, ttl=60), **kwargs)
+
+
+def test_same_answer_to_the_same_question_hits() -> None:
+    """Answers that only differ in case, accents or articles share an entry."""
+    cache = make_cache()
+    assert cache.get(REQUEST) is None
+    cache.put(REQUEST, EVALUATION)
+
+    hit = cache.get({**REQUEST, "answer": "lyon.", "difficulty": 3})
+    assert hit == {**EVALUATION, "answer": "lyon.", "difficulty": 3}
+    assert cache.get({**REQUEST, "answer": "Marseille"}) is None
+    assert cache.get({**REQUEST, "correct_answer": "Parijs, Frankrijk"}) is None
+    assert cache.stats()["hit_ratio"] == 0.25
+
+
+def test_rubric_is_part_of_the_fingerprint() -> None:
+    """A question graded against another rubric is graded again."""
+    cache = make_cache()
+    cache.put(REQUEST, EVALUATION)
+    rubric = [{"point": "Parijs", "weight": 1}]
+    assert cache.get({**REQUEST, "rubric": rubric}) is None
+
+
+def test_disabled_subjects_and_long_answers_are_not_cached() -> None:
+    """Disabled subjects and answers that rarely repeat skip the cache."""
+    cache = make_cache(disabled_subjects=["aardrijkskunde"], max_answer_words=3)
+    cache.put(REQUEST, EVALUATION)
+    assert cache.get(REQUEST) is None
+
+    cache = make_cache(max_answer_words=3)
+    long_answer = {**REQUEST, "answer": "Ik denk dat het Lyon is"}
+    cache.put(long_answer, EVALUATION)
+    assert cache.get(long_answer) is None
+    assert cache.stats()["skipped"] == 1
+    assert cache.stats()["cache"]["entries"] == 0
+
+
+def test_subject_is_invalidated() -> None:
+    """The evaluations of a subject can be dropped at once."""
+    cache = make_cache()
+    cache.put(REQUEST, EVALUATION)
+    cache.put({**REQUEST, "subject": "Geschiedenis"}, EVALUATION)
+    assert cache.invalidate("Aardrijkskunde") == 1
+    assert cache.get(REQUEST) is None
+    assert cache.get({**REQUEST, "subject": "Geschiedenis"}) is not None
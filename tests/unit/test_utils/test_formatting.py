@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+from app.utils.formatting import parse_agent_json, parse_agent_output
+from app.utils.typing import GeneratedQuestion, QuestionEvaluation, ScoreTotals
+
+EVALUATION = {
+    "question": "Wat is de hoofdstad van Frankrijk?",
+    "answer": "'t Is Parijs",
+    "subject": "Aardrijkskunde",
+    "chapter": "Hoofdsteden van Europa",
+    "evaluation": "Correct",
+    "score": 1,
+    "difficulty": 1,
+    "max_score": 1,
+    "feedback": "Je antwoord is correct, Parijs is de hoofdstad van z'n land.",
+}
+
+
+def test_parse_agent_json() -> None:
+    """Plain and fenced JSON requests are parsed, anything else is empty."""
+    assert parse_agent_json('{"subject": "Wiskunde"}') == {"subject": "Wiskunde"}
+    assert parse_agent_json('```json\n{"chapter": "A"}\n```') == {"chapter": "A"}
+    assert parse_agent_json("Geef een vraag") == {}
+
+
+def test_parse_agent_output_keeps_apostrophes() -> None:
+    """Fenced JSON with Dutch apostrophes and newlines decodes unchanged."""
+    output = f"```json\n{json.dumps(EVALUATION, indent=2)}\n```"
+    result = parse_agent_output(output, QuestionEvaluation)
+
+    assert result is not None
+    assert result.answer == "'t Is Parijs"
+    assert result.feedback == EVALUATION["feedback"]
+    assert result.next_question is None
+
+
+def test_parse_agent_output_validates_nested_and_dict_outputs() -> None:
+    """Dict outputs, nested questions and numeric strings are validated."""
+    next_question = {
+        "subject": "Aardrijkskunde",
+        "chapter": "Hoofdsteden van Europa",
+        "question": "Wat is de hoofdstad van België?",
+        "answer": "Brussel",
+        "difficulty": "2",
+        "max_score": 1,
+    }
+    result = parse_agent_output(
+        {**EVALUATION, "next_question": next_question}, QuestionEvaluation
+    )
+
+    assert result is not None and result.next_question is not None
+    assert result.next_question.difficulty == 2
+    assert parse_agent_output(
+        json.dumps(next_question), GeneratedQuestion
+    ) == GeneratedQuestion.model_validate({**next_question, "difficulty": 2})
+
+
+def test_parse_agent_output_rejects_invalid_output() -> None:
+    """Text, missing fields and out-of-range values don't match the schema."""
+    assert (
+        parse_agent_output(
+            "Ik heb geen vragen meer om te genereren.", GeneratedQuestion
+        )
+        is None
+    )
+    assert parse_agent_output({**EVALUATION, "score": -1}, QuestionEvaluation) is None
+    assert parse_agent_output({"total_student_score": 1}, ScoreTotals) is None
+    assert parse_agent_output(
+        '{"total_student_score": null, "total_max_score": null, '
+        '"total_percentage": null}',
+        ScoreTotals,
+    ) == ScoreTotals(
+        total_student_score=None, total_max_score=None, total_percentage=None
+    )
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from app.utils.grading import LocalGrader, normalize_answer, parse_numbers
+
+
+def request(correct_answer: str, answer: str) -> dict:
+    return {
+        "subject": "Wiskunde",
+        "chapter": "Vergelijkingen",
+        "question": "Los op",
+        "correct_answer": correct_answer,
+        "answer": answer,
+        "difficulty": 2,
+        "max_score": 2,
+    }
+
+
+def test_normalize_answer() -> None:
+    """Case, accents, punctuation and leading articles don't matter."""
+    assert normalize_answer("De Brusselse Ommegang!") == "brusselse ommegang"
+    assert normalize_answer("Québec.") == "quebec"
+
+
+def test_parse_numbers() -> None:
+    """Solutions, Dutch decimal commas and fractions are parsed as numbers."""
+    solutions = parse_numbers("x = 2 of x = -2")
+    decimal = parse_numbers("3,25")
+
+    assert solutions is not None and decimal is not None
+    assert [float(n) for n, _ in solutions] == [2, -2]
+    assert [(float(n), d) for n, d in decimal] == [(3.25, 2)]
+    assert parse_numbers("ongeveer 5 cm") is None
+
+
+@pytest.mark.parametrize(
+    "correct_answer,answer,score",
+    [
+        ("Parijs", "parijs.", 2),
+        ("x = 5", "5", 2),
+        ("x = 5", "x=6", 0),
+        ("0,33", "1/3", 2),
+        ("x = 2 of x = -2", "-2 en 2", 2),
+        ("2x + 2", "2(x+1)", 2),
+        ("(x+1)(x-1)", "x^2 - 1", 2),
+        ("y = 2x + 3", "3 + 2x", 2),
+        ("x^2", "2x", 0),
+    ],
+)
+def test_grades_certain_answers(correct_answer: str, answer: str, score: int) -> None:
+    """Matches, numbers and equivalent expressions are graded locally."""
+    evaluation = LocalGrader().grade(request(correct_answer, answer))
+
+    assert evaluation is not None
+    assert evaluation["score"] == score
+    assert evaluation["evaluation"] == ("Correct" if score else "Incorrect")
+    assert ("correct_answer" in evaluation) == (score == 0)
+    assert evaluation["max_score"] == 2 and evaluation["difficulty"] == 2
+
+
+@pytest.mark.parametrize(
+    "correct_answer,answer",
+    [
+        ("Parijs", "Brussel"),
+        ("1/3", "0,333"),
+        ("x = 2 of x = -2", "2"),
+        ("De onvrede over de taal en de godsdienst", "De taal"),
+        ("12", "twaalf"),
+        ("x = sqrt(2)", "1,41"),
+        ("2x + 3", "2y + 3"),
+        ("5 cm", "5"),
+        ("5 m", "5"),
+        ("1.000", "1000"),
+        ("1000", "1,000"),
+    ],
+)
+def test_leaves_uncertain_answers_to_the_agent(
+    correct_answer: str, answer: str
+) -> None:
+    """Other wordings, partial and differently rounded answers aren't graded."""
+    assert LocalGrader().grade(request(correct_answer, answer)) is None
+
+
+def test_invalid_difficulty_defaults_to_3() -> None:
+    """A difficulty that isn't a number doesn't fail the local grading."""
+    evaluation = LocalGrader().grade(
+        {**request("x = 5", "5"), "difficulty": "moeilijk"}
+    )
+
+    assert evaluation is not None and evaluation["difficulty"] == 3
+
+
+def test_coverage_rate() -> None:
+    """The coverage counts the answers graded without the evaluation agent."""
+    grader = LocalGrader()
+    grader.grade(request("x = 5", "5"))
+    grader.grade(request("2x", "x + x"))
+    grader.grade(request("Parijs", "Brussel"))
+    grader.grade(request("Parijs", "Parijs"))
+
+    stats = grader.stats()
+    assert (stats["graded_exact"], stats["graded_numeric"]) == (1, 1)
+    assert stats["graded_symbolic"] == 1
+    assert stats["coverage_rate"] == 0.75
@@ -0,0 +1,84 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from app.utils.local_index import (
+    LocalIndexRetrieval,
+    LocalVectorIndex,
+    build_index,
+    chunk_text,
+)
+
+VOCABULARY = ["integraal", "afgeleide", "romeinen", "keizer"]
+
+
+def fake_embed(texts: list[str]) -> list[list[float]]:
+    """Bag-of-words embedding over a tiny vocabulary."""
+    return [[float(text.lower().count(word)) for word in VOCABULARY] for text in texts]
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> LocalVectorIndex:
+    documents = [
+        ("gs://b/Wiskunde/Integralen/a.txt", "integraal integraal afgeleide"),
+        ("gs://b/Wiskunde/Afgeleiden/b.txt", "afgeleide afgeleide"),
+        ("gs://b/Geschiedenis/Rome/c.txt", "romeinen keizer"),
+    ]
+    assert build_index(documents, fake_embed, str(tmp_path)) == 3
+    return LocalVectorIndex(str(tmp_path))
+
+
+def test_chunk_text_overlaps() -> None:
+    """Chunks have the configured size and overlap."""
+    words = [str(i) for i in range(25)]
+    chunks = chunk_text(" ".join(words), chunk_size=10, chunk_overlap=2)
+
+    assert [chunk.split()[0] for chunk in chunks] == ["0", "8", "16"]
+    assert chunks[-1].split()[-1] == "24"
+    assert chunk_text("") == []
+
+
+def test_search_returns_nearest_chunks(index: LocalVectorIndex) -> None:
+    """Chunks are ranked by cosine distance and filtered by distance and scope."""
+    results = index.search(fake_embed(["integraal afgeleide"])[0], top_k=2)
+    assert [chunk["uri"] for _, chunk in results] == [
+        "gs://b/Wiskunde/Integralen/a.txt",
+        "gs://b/Wiskunde/Afgeleiden/b.txt",
+    ]
+
+    assert len(index.search(fake_embed(["integraal"])[0], 3, max_distance=0.5)) == 1
+    scoped = index.search(
+        fake_embed(["integraal"])[0], 3, subject="wiskunde", chapter="afgeleiden"
+    )
+    assert [chunk["uri"] for _, chunk in scoped] == ["gs://b/Wiskunde/Afgeleiden/b.txt"]
+    unknown = index.search(fake_embed(["integraal"])[0], 3, subject="Latijn")
+    assert len(unknown) == 3
+
+
+@pytest.mark.asyncio
+async def test_local_retrieval_tool(index: LocalVectorIndex) -> None:
+    """The tool returns chunk texts like the Vertex AI RAG retrieval."""
+    tool = LocalIndexRetrieval(
+        name="student_helper_retrieval",
+        description="retrieval",
+        index=index,
+        embed_query=fake_embed,
+        similarity_top_k=1,
+    )
+
+    result = await tool.run_async(args={"query": "keizer"}, tool_context=Mock())
+    assert result == ["romeinen keizer"]
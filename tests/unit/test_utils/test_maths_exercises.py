@@ -0,0 +1,118 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.formatting import parse_agent_json
+from app.utils.grading import LocalGrader, _evaluate, parse_expression, parse_numbers
+from app.utils.maths_exercises import MathsExerciseGenerator
+from app.utils.question_history import QuestionHistoryAgentTool, seed_question_history
+from app.utils.typing import GeneratedQuestion
+
+
+def evaluate_side(side: str, x: float) -> float:
+    expression = parse_expression(side.replace("²", "^2").strip() + " + 0")
+    assert expression is not None
+    return _evaluate(expression[0], {"x": x})
+
+
+@pytest.mark.parametrize(
+    "chapter", ["Vergelijkingen", "Breuken", "Kwadratische vergelijkingen"]
+)
+@pytest.mark.parametrize("difficulty", [1, 2, 3, 4, 5])
+def test_exercises_are_solved_by_their_answer(chapter: str, difficulty: int) -> None:
+    """Every solution in the answer satisfies the equation of the question."""
+    generator = MathsExerciseGenerator(seed=difficulty)
+    for _ in range(200):
+        exercise = GeneratedQuestion.model_validate(
+            generator.generate("Wiskunde", chapter, difficulty)
+        )
+        left, right = exercise.question.removeprefix("Los op: ").split("=")
+        solutions = parse_numbers(exercise.answer)
+
+        assert exercise.difficulty == difficulty
+        assert solutions
+        for solution, _ in solutions:
+            assert evaluate_side(left, float(solution)) == pytest.approx(
+                evaluate_side(right, float(solution))
+            )
+
+
+def test_answers_are_graded_locally() -> None:
+    """The answers of the exercises are decided by the local grader."""
+    generator = MathsExerciseGenerator(seed=0)
+    grader = LocalGrader()
+    for difficulty in range(1, 6):
+        exercise = generator.generate("Wiskunde", "Vergelijkingen", difficulty)
+        assert exercise is not None
+        evaluation = grader.grade({**exercise, "correct_answer": exercise["answer"]})
+
+        assert evaluation is not None
+        assert evaluation["score"] == exercise["max_score"]
+
+
+def test_only_maths_subjects_are_generated() -> None:
+    """Other subjects, and excluded exercises, are left to the agent."""
+    generator = MathsExerciseGenerator(subjects=["Wiskunde"], seed=0, max_attempts=5)
+    exercise = generator.generate("wiskunde", "Breuken", 1)
+
+    assert generator.generate("Geschiedenis", "De Belgische Revolutie", 1) is None
+    assert exercise is not None
+    assert exercise["subject"] == "wiskunde"
+    assert "x/" in exercise["question"]
+    assert (
+        generator.generate("Wiskunde", "Breuken", 1, exclude=[exercise["question"]])
+        != exercise
+    )
+    assert generator.stats() == {"exercises": 2, "exhausted": 0}
+
+
+@pytest.mark.asyncio
+async def test_tool_serves_exercises_without_the_agent() -> None:
+    """Maths questions skip the agent and aren't rejected as near duplicates."""
+    state: dict[str, Any] = {}
+    seed_question_history(state, "Wiskunde", "Vergelijkingen", ["Los op: x + 1 = 3"])
+    tool = QuestionHistoryAgentTool(
+        agent=Agent(name="question_generation_agent", model="gemini-2.0-flash-001"),
+        exercise_generator=MathsExerciseGenerator(seed=0),
+    )
+    with patch.object(AgentTool, "run_async", AsyncMock()) as agent:
+        result = await tool.run_async(
+            args={
+                "request": json.dumps(
+                    {
+                        "subject": "Wiskunde",
+                        "chapter": "Vergelijkingen",
+                        "difficulty": 1,
+                    }
+                )
+            },
+            tool_context=Mock(state=state),
+        )
+
+    question = parse_agent_json(result)
+    agent.assert_not_called()
+    assert question["question"].startswith("Los op: ")
+    assert not tool.is_duplicate(state, question)
+    assert tool.stats() == {
+        "generations": 0,
+        "duplicates_rejected": 0,
+        "batched_questions": 0,
+        "batched_served": 0,
+    }
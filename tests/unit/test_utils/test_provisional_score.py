@@ -0,0 +1,193 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+import pytest
+
+from app.utils.provisional_score import (
+    ProvisionalScorer,
+    calibrate,
+    coverage,
+    history_samples,
+    recommend_threshold,
+)
+
+REQUEST = {
+    "subject": "Aardrijkskunde",
+    "chapter": "Hoofdsteden van Europa",
+    "question": "Wat is de hoofdstad van Frankrijk?",
+    "correct_answer": "Parijs",
+    "difficulty": 2,
+    "max_score": 1,
+}
+LONG_REQUEST = {**REQUEST, "correct_answer": "Parijs, de stad aan de Seine"}
+RUBRIC = [
+    {"point": "Politieke onvrede met het Verenigd Koninkrijk", "weight": 2},
+    {"point": "Culturele verschillen tussen noord en zuid", "weight": 1},
+    {"point": "Invloed van de Franse Revolutie", "weight": 1},
+]
+
+
+def test_coverage_ignores_stopwords_and_word_endings() -> None:
+    """Content words match on a shared prefix, stopwords don't count."""
+    assert coverage("De oorzaken waren de revolutie", "oorzaak en revolutionair") == 1
+    assert coverage("Lyon", "Parijs") == 0
+    assert coverage("Parijs", "de het een") is None
+
+
+@pytest.mark.parametrize(
+    "answer,score,confidence",
+    [
+        ("Parijs, de stad aan de Seine", 1, 1.0),
+        ("De stad Parijs aan de Seine!", 1, 1.0),
+        ("Lyon aan de Rhône", 0, 1.0),
+    ],
+)
+def test_scores_against_the_correct_answer(
+    answer: str, score: int, confidence: float
+) -> None:
+    """Without a rubric the overlap with the correct answer is scored."""
+    provisional = ProvisionalScorer().score({**LONG_REQUEST, "answer": answer})
+    assert provisional == {"score": score, "max_score": 1, "confidence": confidence}
+
+
+def test_short_answers_and_key_points_have_no_confidence() -> None:
+    """A one-word correct answer or key point is all or nothing, so not final."""
+    for answer, score in (("Parijs", 1), ("Lyon", 0)):
+        provisional = ProvisionalScorer().score({**REQUEST, "answer": answer})
+        assert provisional == {"score": score, "max_score": 1, "confidence": 0.0}
+
+    request = {
+        **LONG_REQUEST,
+        "max_score": 2,
+        "rubric": [{"point": "Seine"}, {"point": "Parijs, de stad aan de Seine"}],
+        "answer": "Parijs, de stad aan de Seine",
+    }
+    provisional = ProvisionalScorer().score(request)
+    assert provisional == {"score": 2, "max_score": 2, "confidence": 0.0}
+    assert ProvisionalScorer(threshold=0.9).grade(request, provisional) is None
+
+
+def test_scores_the_covered_key_points_of_the_rubric() -> None:
+    """Every key point the answer covers adds its weight."""
+    request = {
+        **REQUEST,
+        "max_score": 4,
+        "rubric": RUBRIC,
+        "answer": "Er was politieke onvrede over het Verenigd Koninkrijk en de "
+        "invloed van de Franse Revolutie",
+    }
+    provisional = ProvisionalScorer().score(request)
+    assert provisional is not None
+    assert (provisional["score"], provisional["confidence"]) == (3, 1.0)
+
+    unclear = ProvisionalScorer().score(
+        {**request, "answer": "Politieke problemen en de Franse invloed"}
+    )
+    assert unclear is not None and unclear["confidence"] < 0.5
+
+
+def test_numeric_answers_are_not_scored() -> None:
+    """Numbers are left to the local grader and the evaluation agent."""
+    request = {**REQUEST, "correct_answer": "x = -3", "answer": "x = 3"}
+    assert ProvisionalScorer().score(request) is None
+
+
+def test_grades_confident_scores_only() -> None:
+    """The provisional score is final from the threshold on."""
+    scorer = ProvisionalScorer(threshold=0.9)
+    request = {**LONG_REQUEST, "answer": "Lyon aan de Rhône"}
+    provisional = scorer.score(request)
+    assert provisional is not None
+    evaluation = scorer.grade(request, provisional)
+    assert evaluation is not None
+    assert evaluation["score"] == 0
+    assert evaluation["correct_answer"] == LONG_REQUEST["correct_answer"]
+    assert evaluation["difficulty"] == 2
+    invalid = scorer.grade({**request, "difficulty": "moeilijk"}, provisional)
+    assert invalid is not None and invalid["difficulty"] == 3
+    assert scorer.grade(request, {**provisional, "confidence": 0.5}) is None
+    assert ProvisionalScorer().grade(request, scorer.score(request)) is None
+
+    scorer.record({"score": 1}, 1)
+    scorer.record({"score": 1}, 0)
+    assert scorer.stats()["agreement_rate"] == 0.5
+
+
+def test_calibration_recommends_the_lowest_accurate_threshold() -> None:
+    """Historical rows are joined with their questions and measured."""
+    rows = [
+        {
+            "question": REQUEST["question"],
+            "answer": "Parijs, de stad aan de Seine",
+            "student_score": 1,
+        },
+        {
+            "question": REQUEST["question"],
+            "answer": "Lyon aan de Rhône",
+            "student_score": 0,
+        },
+        {
+            "question": REQUEST["question"],
+            "answer": "De stad Parijs aan de Seine!",
+            "student_score": 1,
+        },
+        {"question": "Onbekende vraag?", "answer": "Parijs", "student_score": 0},
+    ]
+    rows = [{**row, "max_score": 1} for row in rows]
+    questions = [
+        {
+            "question": "Wat is de hoofdstad van Frankrijk",
+            "answer": LONG_REQUEST["correct_answer"],
+        }
+    ]
+    samples = list(history_samples(rows, questions))
+    assert len(samples) == 3
+
+    results = calibrate(samples, thresholds=[0.5, 1.0])
+    assert results[0] == {"threshold": 0.5, "coverage": 1.0, "accuracy": 1.0}
+    assert recommend_threshold(results) == 0.5
+    assert (
+        recommend_threshold([{"threshold": 1.0, "coverage": 0.5, "accuracy": 0.5}])
+        is None
+    )
+
+
+def test_calibration_reads_the_stored_correct_answer_and_rubric() -> None:
+    """Rows stored with their correct answer and rubric need no questions."""
+    rows = [
+        {
+            "question": "Wat waren de oorzaken van de Belgische Revolutie?",
+            "answer": "Politieke onvrede met het Verenigd Koninkrijk",
+            "student_score": 2,
+            "max_score": 4,
+            "correct_answer": "Politieke onvrede en culturele verschillen",
+            "rubric": json.dumps(RUBRIC),
+        },
+        {**REQUEST, "answer": "Parijs", "student_score": 1, "correct_answer": None},
+    ]
+    samples = list(history_samples(rows))
+
+    assert samples == [
+        (
+            {
+                "question": rows[0]["question"],
+                "answer": rows[0]["answer"],
+                "correct_answer": rows[0]["correct_answer"],
+                "rubric": RUBRIC,
+                "max_score": 4,
+            },
+            2,
+        )
+    ]
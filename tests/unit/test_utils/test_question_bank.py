@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from unittest.mock import Mock
+
+import pytest
+from google.adk.agents import Agent
+
+from app.utils.question_bank import QuestionBank, QuestionBankAgentTool
+from app.utils.question_bank_store import (
+    InMemoryQuestionBankStore,
+    QuestionBankStore,
+    SQLiteQuestionBankStore,
+)
+
+
+def make_question(text: str) -> dict:
+    return {
+        "subject": "Wiskunde",
+        "chapter": "Vergelijkingen",
+        "question": text,
+        "answer": "x = 5",
+        "difficulty": 2,
+        "max_score": 2,
+    }
+
+
+@pytest.fixture(params=[InMemoryQuestionBankStore, SQLiteQuestionBankStore])
+def store(request: pytest.FixtureRequest) -> QuestionBankStore:
+    return request.param()
+
+
+def test_store_pops_oldest_question_not_excluded(store: QuestionBankStore) -> None:
+    """Questions are served once, oldest first, skipping excluded ones."""
+    store.add("Wiskunde", "Vergelijkingen", 2, [make_question("a"), make_question("b")])
+    store.add("wiskunde", "vergelijkingen", 2, [make_question("a")])
+    assert store.count("Wiskunde", "Vergelijkingen", 2) == 2
+
+    assert store.pop("Wiskunde", "Vergelijkingen", 2, exclude=["a"]) == make_question(
+        "b"
+    )
+    assert store.pop("Wiskunde", "Vergelijkingen", 2) == make_question("a")
+    assert store.pop("Wiskunde", "Vergelijkingen", 2) is None
+    assert store.pop("Wiskunde", "Vergelijkingen", 3) is None
+
+
+def test_bank_refills_in_background() -> None:
+    """A miss triggers a refill up to the target size and later takes hit."""
+    generated = iter(range(100))
+    bank = QuestionBank(
+        store=InMemoryQuestionBankStore(),
+        generate_fn=lambda subject, chapter, difficulty: make_question(
+            f"vraag {next(generated)}"
+        ),
+        target_size=3,
+    )
+
+    assert bank.take("Wiskunde", "Vergelijkingen", 2) is None
+    bank.close()
+    assert bank.store.count("Wiskunde", "Vergelijkingen", 2) == 3
+    assert bank.take("Wiskunde", "Vergelijkingen", 2) == make_question("vraag 0")
+
+    stats = bank.stats()
+    assert (stats["hits"], stats["misses"], stats["questions_generated"]) == (1, 1, 3)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_bank_gives_up_after_failed_generations() -> None:
+    """A chapter without questions doesn't keep the filler busy."""
+    generate = Mock(return_value=None)
+    bank = QuestionBank(
+        store=InMemoryQuestionBankStore(), generate_fn=generate, target_size=3
+    )
+    bank.take("Wiskunde", "Leeg", 1)
+    bank.close()
+
+    assert generate.call_count == bank.max_generation_attempts
+    assert bank.stats()["generation_failures"] == bank.max_generation_attempts
+
+
+@pytest.mark.asyncio
+async def test_agent_tool_serves_from_bank() -> None:
+    """A ready question is returned in the agent's output format."""
+    store = InMemoryQuestionBankStore()
+    store.add("Wiskunde", "Vergelijkingen", 2, [make_question("a")])
+    bank = QuestionBank(store=store, generate_fn=Mock(return_value=None))
+    tool = QuestionBankAgentTool(
+        agent=Agent(name="question_generation_agent", model="gemini-2.0-flash-001"),
+        bank=bank,
+    )
+
+    result = await tool.run_async(
+        args={
+            "request": json.dumps(
+                {"subject": "Wiskunde", "chapter": "Vergelijkingen", "difficulty": 2}
+            )
+        },
+        tool_context=Mock(state={}),
+    )
+    bank.close()
+
+    assert result.startswith("```json")
+    assert json.loads(result.strip("`json \n")) == make_question("a")
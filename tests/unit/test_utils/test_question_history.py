@@ -0,0 +1,333 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.tools.agent_tool import AgentTool
+
+from app.utils.formatting import format_agent_json, parse_agent_json
+from app.utils.question_bank import QuestionBank, QuestionBankAgentTool
+from app.utils.question_bank_store import InMemoryQuestionBankStore
+from app.utils.question_history import (
+    NearDuplicateIndex,
+    QuestionHistoryAgentTool,
+    batch_difficulties,
+    find_near_duplicate,
+    get_batched_questions,
+    get_graded_question,
+    get_question_history,
+    get_rubric,
+    record_graded_question,
+    record_question,
+    record_rubric,
+    seed_question_history,
+    with_rubric,
+)
+from app.utils.typing import GeneratedQuestion
+
+
+def make_question(text: str) -> dict:
+    return {
+        "subject": "Geschiedenis",
+        "chapter": "De Belgische Revolutie",
+        "question": text,
+        "answer": "antwoord",
+        "difficulty": 2,
+        "max_score": 2,
+    }
+
+
+def make_agent() -> Agent:
+    return Agent(name="question_generation_agent", model="gemini-2.0-flash-001")
+
+
+def test_index_finds_near_duplicates_only() -> None:
+    """Rewordings are near duplicates, other questions about the chapter are not."""
+    index = NearDuplicateIndex(threshold=0.7)
+    index.add("Wat waren de belangrijkste oorzaken van de Belgische Revolutie?")
+    index.add("In welk jaar werd Leopold I koning der Belgen?")
+
+    assert (
+        index.find("Wat waren de belangrijkste oorzaken van de Belgische revolutie")
+        == "Wat waren de belangrijkste oorzaken van de Belgische Revolutie?"
+    )
+    assert index.find("Wat waren de oorzaken van de Belgische Revolutie?") is not None
+    assert index.find("Welke rol speelde Frankrijk bij de onafhankelijkheid?") is None
+    assert len(index) == 2
+
+
+def test_history_is_capped_and_reassigned() -> None:
+    """The history keeps the last questions and is stored as a new value."""
+    state: dict[str, Any] = {}
+    assert get_question_history(state, "Geschiedenis", "H1") is None
+    seed_question_history(state, "Geschiedenis", "H1", [])
+    seeded = state["question_history"]
+    for number in range(5):
+        record_question(state, "Geschiedenis", "H1", f"vraag {number}", 3)
+    record_question(state, "geschiedenis", "h1", "vraag 4", 3)
+
+    assert get_question_history(state, "Geschiedenis", "H1") == [
+        "vraag 2",
+        "vraag 3",
+        "vraag 4",
+    ]
+    assert state["question_history"] is not seeded
+    assert find_near_duplicate(state, "Geschiedenis", "H1", "Vraag 3!") == "vraag 3"
+
+
+def test_rubric_is_kept_with_the_question_until_graded() -> None:
+    """The rubric of a shown question is added to its evaluation request."""
+    rubric = [
+        {"point": "Politieke onvrede", "weight": 2},
+        {"point": "Franse Revolutie", "weight": 1},
+    ]
+    state: dict[str, Any] = {}
+    for number in range(4):
+        record_rubric(state, f"vraag {number}", rubric, max_rubrics=3)
+    kept = state["question_rubrics"]
+    record_rubric(state, "vraag 1", rubric[:1], max_rubrics=3)
+
+    assert list(state["question_rubrics"]) == ["vraag 2", "vraag 3", "vraag 1"]
+    assert state["question_rubrics"] is not kept
+    assert get_rubric(state, "vraag 0") is None
+    request = {"question": "vraag 2", "answer": "De onvrede"}
+    assert with_rubric(state, request) == {**request, "rubric": rubric}
+    assert with_rubric(state, {"question": "vraag 9"}) == {"question": "vraag 9"}
+
+    record_graded_question(
+        state, {**with_rubric(state, request), "correct_answer": "De onvrede"}
+    )
+    assert get_graded_question(state, "vraag 2") == {
+        "question": "vraag 2",
+        "correct_answer": "De onvrede",
+        "rubric": rubric,
+    }
+    assert get_graded_question(state, "vraag 3") is None
+
+
+def test_generated_question_rubric_is_optional() -> None:
+    """Questions without a rubric, e.g. banked before rubrics, still validate."""
+    question = make_question("Wat waren de oorzaken van de Belgische Revolutie?")
+    assert GeneratedQuestion.model_validate(question).rubric == []
+    rubric = [{"point": "Politieke onvrede", "weight": 2}]
+    parsed = GeneratedQuestion.model_validate({**question, "rubric": rubric})
+    assert parsed.model_dump()["rubric"] == rubric
+
+
+def test_invalid_rubric_points_are_dropped_or_weighted_1() -> None:
+    """Points without a text are dropped and an invalid weight counts as 1."""
+    rubric = [
+        {"point": "Politieke onvrede", "weight": 0},
+        {"point": "Franse Revolutie"},
+        {"point": "", "weight": 2},
+        {"weight": 2},
+        "Taal",
+    ]
+    parsed = GeneratedQuestion.model_validate(
+        {**make_question("Wat waren de oorzaken?"), "rubric": rubric}
+    )
+    expected = [
+        {"point": "Politieke onvrede", "weight": 1},
+        {"point": "Franse Revolutie", "weight": 1},
+    ]
+    assert parsed.model_dump()["rubric"] == expected
+
+    state: dict[str, Any] = {}
+    record_rubric(state, "vraag", rubric)
+    assert get_rubric(state, "vraag") == expected
+
+
+@pytest.mark.asyncio
+async def test_tool_sends_fixed_size_hint_and_regenerates_duplicates() -> None:
+    """The prompt holds the last questions only, and a repeat is regenerated."""
+    asked = [f"Vraag nummer {number} over de revolutie?" for number in range(50)]
+    state: dict[str, Any] = {}
+    seed_question_history(state, "Geschiedenis", "De Belgische Revolutie", asked)
+    requests = []
+
+    async def generate(*, args: dict[str, Any], tool_context: Any) -> str:
+        requests.append(json.loads(args["request"]))
+        text = asked[10] if len(requests) == 1 else "Wie was Charles Rogier?"
+        return format_agent_json(make_question(text))
+
+    tool = QuestionHistoryAgentTool(agent=make_agent(), hint_size=5)
+    with patch.object(AgentTool, "run_async", AsyncMock(side_effect=generate)):
+        result = await tool.run_async(
+            args={
+                "request": json.dumps(
+                    {
+                        "subject": "Geschiedenis",
+                        "chapter": "De Belgische Revolutie",
+                        "difficulty": 2,
+                        "previous_questions": asked,
+                    }
+                )
+            },
+            tool_context=Mock(state=state),
+        )
+
+    assert parse_agent_json(result)["question"] == "Wie was Charles Rogier?"
+    assert requests[0]["previous_questions"] == asked[-5:]
+    assert requests[1]["previous_questions"][-1] == asked[10]
+    assert tool.stats() == {
+        "generations": 2,
+        "duplicates_rejected": 1,
+        "batched_questions": 0,
+        "batched_served": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_bank_tool_puts_back_near_duplicates() -> None:
+    """A banked near duplicate is skipped and stays available for others."""
+    state: dict[str, Any] = {}
+    seed_question_history(
+        state,
+        "Geschiedenis",
+        "De Belgische Revolutie",
+        ["Wat waren de oorzaken van de Belgische Revolutie?"],
+    )
+    store = InMemoryQuestionBankStore()
+    store.add(
+        "Geschiedenis",
+        "De Belgische Revolutie",
+        2,
+        [
+            make_question("Wat waren de oorzaken van de Belgische Revolutie"),
+            make_question("Wie was Charles Rogier?"),
+        ],
+    )
+    bank = QuestionBank(store=store, generate_fn=Mock(return_value=None))
+    tool = QuestionBankAgentTool(agent=make_agent(), bank=bank)
+
+    result = await tool.run_async(
+        args={
+            "request": json.dumps(
+                {
+                    "subject": "Geschiedenis",
+                    "chapter": "De Belgische Revolutie",
+                    "difficulty": 2,
+                }
+            )
+        },
+        tool_context=Mock(state=state),
+    )
+    bank.close()
+
+    assert parse_agent_json(result)["question"] == "Wie was Charles Rogier?"
+    assert store.count("Geschiedenis", "De Belgische Revolutie", 2) == 1
+
+
+def test_batch_difficulties_cover_the_next_difficulty() -> None:
+    """A batch starts at the requested difficulty and stays within 1-5."""
+    assert batch_difficulties(3, 3) == [3, 4, 2]
+    assert batch_difficulties(5, 4) == [5, 5, 4, 5]
+    assert batch_difficulties(1, 1) == [1]
+
+
+@pytest.mark.asyncio
+async def test_tool_keeps_the_extras_of_a_batch() -> None:
+    """One agent call serves the question and keeps the rest for later turns."""
+    state: dict[str, Any] = {}
+    seed_question_history(
+        state,
+        "Geschiedenis",
+        "De Belgische Revolutie",
+        ["Wat waren de oorzaken van de Belgische Revolutie?"],
+    )
+    requests = []
+
+    async def generate(*, args: dict[str, Any], tool_context: Any) -> str:
+        requests.append(json.loads(args["request"]))
+        questions = [
+            {**make_question("Wie was Charles Rogier?"), "difficulty": 2},
+            {
+                **make_question("Wat waren de oorzaken van de Belgische Revolutie"),
+                "difficulty": 3,
+            },
+            {**make_question("Wanneer werd de grondwet aangenomen?"), "difficulty": 3},
+            {**make_question("Welke rol speelde Frankrijk in 1831?"), "difficulty": 1},
+        ]
+        return format_agent_json({"questions": questions})
+
+    tool = QuestionHistoryAgentTool(agent=make_agent(), batch_size=4)
+    tool_context = Mock(state=state)
+
+    async def ask(difficulty: int) -> str:
+        result = await tool.run_async(
+            args={
+                "request": json.dumps(
+                    {
+                        "subject": "Geschiedenis",
+                        "chapter": "De Belgische Revolutie",
+                        "difficulty": difficulty,
+                    }
+                )
+            },
+            tool_context=tool_context,
+        )
+        return parse_agent_json(result)["question"]
+
+    with patch.object(AgentTool, "run_async", AsyncMock(side_effect=generate)):
+        first = await ask(2)
+        record_question(state, "Geschiedenis", "De Belgische Revolutie", first)
+        second = await ask(3)
+        third = await ask(1)
+
+    assert requests[0]["difficulties"] == [2, 3, 1, 2]
+    assert len(requests) == 1
+    assert (first, second, third) == (
+        "Wie was Charles Rogier?",
+        "Wanneer werd de grondwet aangenomen?",
+        "Welke rol speelde Frankrijk in 1831?",
+    )
+    assert get_batched_questions(state, "Geschiedenis", "De Belgische Revolutie") == []
+    assert tool.stats() == {
+        "generations": 1,
+        "duplicates_rejected": 1,
+        "batched_questions": 2,
+        "batched_served": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_tool_asks_a_batched_near_duplicate_after_the_last_attempt() -> None:
+    """A batch of repeats only falls back to its first question, not the batch."""
+    asked = ["Wat waren de oorzaken van de Belgische Revolutie?"]
+    state: dict[str, Any] = {}
+    seed_question_history(state, "Geschiedenis", "De Belgische Revolutie", asked)
+
+    async def generate(*, args: dict[str, Any], tool_context: Any) -> str:
+        return format_agent_json({"questions": [make_question(asked[0])] * 2})
+
+    tool = QuestionHistoryAgentTool(agent=make_agent(), batch_size=2)
+    with patch.object(AgentTool, "run_async", AsyncMock(side_effect=generate)):
+        result = await tool.run_async(
+            args={
+                "request": json.dumps(
+                    {
+                        "subject": "Geschiedenis",
+                        "chapter": "De Belgische Revolutie",
+                        "difficulty": 2,
+                    }
+                )
+            },
+            tool_context=Mock(state=state),
+        )
+
+    assert parse_agent_json(result) == {**make_question(asked[0]), "rubric": []}
+    assert tool.stats()["generations"] == 2
@@ -0,0 +1,164 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import Mock
+
+from app.utils.result_journal import ResultJournal
+from app.utils.result_sink import BufferedResultWriter
+
+
+def test_flushes_by_batch_size_and_drains_on_close() -> None:
+    """Rows are flushed in full batches and the remainder on close."""
+    batches: list[list[dict[str, Any]]] = []
+    writer = BufferedResultWriter(
+        flush_fn=batches.append, max_batch_size=2, max_batch_age=60
+    )
+    for i in range(5):
+        writer.submit({"id": i})
+    writer.close()
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    stats = writer.stats()
+    assert stats["rows_flushed"] == 5
+    assert stats["batches_flushed"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_flushes_by_batch_age() -> None:
+    """A partial batch is flushed once its oldest row exceeds the max age."""
+    flush_fn = Mock()
+    writer = BufferedResultWriter(
+        flush_fn=flush_fn, max_batch_size=100, max_batch_age=0.01
+    )
+    writer.submit({"id": 1})
+    deadline = time.monotonic() + 1
+    while not flush_fn.called and time.monotonic() < deadline:
+        time.sleep(0.005)
+    flush_fn.assert_called_once_with([{"id": 1}])
+    writer.close()
+
+
+def test_retries_failed_flush() -> None:
+    """A failed flush is retried and counted."""
+    flush_fn = Mock(side_effect=[RuntimeError("503"), None])
+    writer = BufferedResultWriter(
+        flush_fn=flush_fn,
+        max_batch_size=1,
+        max_retries=1,
+        initial_backoff=0,
+    )
+    writer.submit({"id": 1})
+    writer.close()
+
+    assert flush_fn.call_count == 2
+    stats = writer.stats()
+    assert stats["flush_retries"] == 1
+    assert stats["rows_flushed"] == 1
+    assert stats["rows_dropped"] == 0
+
+
+def test_journaled_rows_survive_failed_flush(tmp_path: Path) -> None:
+    """Rows a stopped process could not flush are replayed by the next writer."""
+    path = str(tmp_path / "journal.sqlite3")
+    failing = BufferedResultWriter(
+        flush_fn=Mock(side_effect=RuntimeError("503")),
+        max_batch_size=10,
+        max_retries=0,
+        journal=ResultJournal(path, owner="stopped"),
+    )
+    failing.submit({"id": 1, "timestamp": datetime.datetime(2025, 5, 1, 12)})
+    failing.submit({"id": 2, "timestamp": datetime.datetime(2025, 5, 1, 12)})
+    failing.close()
+    assert failing.stats()["rows_dropped"] == 2
+
+    batches: list[list[dict[str, Any]]] = []
+    writer = BufferedResultWriter(flush_fn=batches.append, journal=ResultJournal(path))
+    assert writer.replay_journal() == 2
+    writer.close()
+
+    assert batches == [
+        [
+            {"id": 1, "timestamp": "2025-05-01 12:00:00"},
+            {"id": 2, "timestamp": "2025-05-01 12:00:00"},
+        ]
+    ]
+    assert ResultJournal(path).pending() == []
+
+
+def test_rows_of_live_workers_are_not_replayed(tmp_path: Path) -> None:
+    """Rows journaled by a running worker are left to that worker."""
+    path = str(tmp_path / "journal.sqlite3")
+    live = ResultJournal(path, owner="live")
+    live.append({"id": 1})
+
+    batches: list[list[dict[str, Any]]] = []
+    writer = BufferedResultWriter(flush_fn=batches.append, journal=ResultJournal(path))
+    assert writer.replay_journal() == 0
+    writer.close()
+    live.close()
+
+    assert batches == []
+    assert len(ResultJournal(path).pending()) == 1
+
+
+def test_rows_of_a_crashed_process_are_replayed(tmp_path: Path) -> None:
+    """A process that died without closing the journal is no longer an owner."""
+    path = str(tmp_path / "journal.sqlite3")
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import os, sys\n"
+            "from app.utils.result_journal import ResultJournal\n"
+            "ResultJournal(sys.argv[1]).append({'id': 1})\n"
+            "os._exit(1)",
+            path,
+        ],
+        check=False,
+    )
+
+    batches: list[list[dict[str, Any]]] = []
+    writer = BufferedResultWriter(flush_fn=batches.append, journal=ResultJournal(path))
+    assert writer.replay_journal() == 1
+    writer.close()
+
+    assert batches == [[{"id": 1}]]
+    # A process restarted under the same process id is a new owner.
+    assert ResultJournal(path).owner != ResultJournal(path).owner
+
+
+def test_replays_own_dropped_rows(tmp_path: Path) -> None:
+    """Rows dropped after the retries are replayed by the same writer."""
+    flush_fn = Mock(side_effect=[RuntimeError("503"), None])
+    writer = BufferedResultWriter(
+        flush_fn=flush_fn,
+        max_batch_size=1,
+        max_retries=0,
+        journal=ResultJournal(str(tmp_path / "journal.sqlite3")),
+    )
+    writer.submit({"id": 1})
+    deadline = time.monotonic() + 1
+    while not writer.stats()["rows_dropped"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert writer.replay_journal() == 1
+    writer.close()
+
+    assert flush_fn.call_count == 2
+    assert writer.stats()["rows_flushed"] == 1
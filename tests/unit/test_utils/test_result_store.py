@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.utils.result_store import (
+    InMemoryResultStore,
+    ResultStore,
+    SQLiteResultStore,
+    create_result_store,
+)
+
+
+def make_row(user_id: str, student_score: int, max_score: int) -> dict[str, Any]:
+    return {
+        "userId": user_id,
+        "sessionId": "session",
+        "subject": "wiskunde",
+        "chapter": "vergelijkingen",
+        "question": "Los op: 2x = 4",
+        "answer": "x = 2",
+        "student_score": student_score,
+        "max_score": max_score,
+        "difficulty": 1,
+        "timestamp": datetime.datetime(2025, 5, 1, 12),
+    }
+
+
+@pytest.fixture(params=[InMemoryResultStore, SQLiteResultStore])
+def store(request: pytest.FixtureRequest) -> ResultStore:
+    """Create each local result store."""
+    return request.param()
+
+
+def test_totals_accumulate_per_user(store: ResultStore) -> None:
+    """Totals are summed per user, session, subject and chapter."""
+    store.insert_rows([make_row("a", 1, 2), make_row("a", 2, 2)])
+    store.insert_rows([make_row("b", 0, 4)])
+
+    assert store.get_totals("a", "session", "Wiskunde", "Vergelijkingen") == {
+        "total_student_score": 3,
+        "total_max_score": 4,
+        "total_percentage": 75.0,
+    }
+    assert store.get_totals("c", "session", "Wiskunde", "Vergelijkingen") == {
+        "total_student_score": None,
+        "total_max_score": None,
+        "total_percentage": None,
+    }
+
+
+def test_asked_questions_span_sessions(store: ResultStore) -> None:
+    """The last questions of a user are returned over all sessions, oldest first."""
+    rows = []
+    for number in range(4):
+        row = make_row("a", 1, 2)
+        row["sessionId"] = f"session {number % 2}"
+        row["question"] = f"vraag {number}"
+        row["timestamp"] = datetime.datetime(2025, 5, 1, 12, number)
+        rows.append(row)
+    store.insert_rows(rows)
+    store.insert_rows([make_row("b", 0, 4)])
+
+    assert store.get_asked_questions("a", "Wiskunde", "Vergelijkingen", 3) == [
+        "vraag 1",
+        "vraag 2",
+        "vraag 3",
+    ]
+    assert store.get_asked_questions("a", "Wiskunde", "Breuken", 3) == []
+
+
+def test_sqlite_store_keeps_the_correct_answer_and_rubric(tmp_path: Path) -> None:
+    """Rows keep what they were graded against, also in older databases."""
+    path = str(tmp_path / "results.sqlite3")
+    SQLiteResultStore(path)._connection.executescript(
+        """
+        ALTER TABLE question_answer DROP COLUMN correct_answer;
+        ALTER TABLE question_answer DROP COLUMN rubric;
+        """
+    )
+    store = SQLiteResultStore(path)
+    rubric = '[{"point": "x = 2", "weight": 2}]'
+    store.insert_rows(
+        [{**make_row("a", 2, 2), "correct_answer": "x = 2", "rubric": rubric}]
+    )
+    store.insert_rows([make_row("b", 0, 2)])
+
+    assert store._connection.execute(
+        "SELECT userId, correct_answer, rubric FROM question_answer"
+    ).fetchall() == [("a", "x = 2", rubric), ("b", None, None)]
+
+
+def test_create_result_store_rejects_unknown_backend() -> None:
+    """An unknown RESULTS_BACKEND is a configuration error."""
+    assert isinstance(create_result_store("memory"), InMemoryResultStore)
+    with pytest.raises(ValueError):
+        create_result_store("postgres")
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from collections.abc import Generator
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.utils.score_rollup import merge_into_rollup, row_id
+
+
+@pytest.fixture
+def mock_client() -> Generator[Mock, None, None]:
+    """Patch the pooled BigQuery client."""
+    client = Mock()
+    with patch("app.utils.score_rollup.bq_client_pool") as pool:
+        pool.default_project.return_value = "project"
+        pool.get_client.return_value = client
+        yield client
+
+
+def test_merge_into_rollup_passes_rows_as_parameters(mock_client: Mock) -> None:
+    """Each row becomes one STRUCT of the @rows query parameter."""
+    row = {
+        "userId": "user",
+        "sessionId": "session",
+        "subject": "wiskunde",
+        "chapter": "vergelijkingen",
+        "student_score": 2,
+        "max_score": 3,
+        "timestamp": datetime.datetime(2025, 5, 1, 12),
+    }
+    merge_into_rollup([row, row])
+
+    (sql,) = mock_client.query.call_args.args
+    assert "MERGE `project.student_helper.question_answer_rollup` T" in sql
+    parameter = mock_client.query.call_args.kwargs["job_config"].query_parameters[0]
+    assert parameter.name == "rows"
+    assert len(parameter.values) == 2
+    struct_values = parameter.values[0].to_api_repr()["parameterValue"]["structValues"]
+    assert struct_values["timestamp"] == {"value": "2025-05-01 12:00:00"}
+    assert struct_values["row_id"] == {"value": row_id(row)}
+
+
+def test_merge_into_rollup_skips_merged_rows(mock_client: Mock) -> None:
+    """Merged row ids are recorded in the same transaction and filtered out."""
+    merge_into_rollup(
+        [
+            {
+                "userId": "user",
+                "sessionId": "session",
+                "subject": "wiskunde",
+                "chapter": "vergelijkingen",
+                "student_score": 2,
+                "max_score": 3,
+                "timestamp": datetime.datetime(2025, 5, 1, 12),
+            }
+        ]
+    )
+
+    (sql,) = mock_client.query.call_args.args
+    assert sql.startswith("BEGIN TRANSACTION;")
+    assert sql.endswith("COMMIT TRANSACTION;")
+    merged_table = "`project.student_helper.question_answer_rollup_merged`"
+    assert f"SELECT row_id FROM {merged_table} WHERE merged_at >= @merged_since" in sql
+    assert f"INSERT INTO {merged_table} (row_id, merged_at)" in sql
+    parameters = mock_client.query.call_args.kwargs["job_config"].query_parameters
+    assert parameters[1].name == "merged_since"
+    assert parameters[1].value == datetime.datetime(
+        2025, 4, 30, 12, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_row_id_matches_replayed_rows() -> None:
+    """A row replayed from the journal, or carrying its id, keeps the same id."""
+    row = {"userId": "user", "timestamp": datetime.datetime(2025, 5, 1, 12)}
+    replayed = {"userId": "user", "timestamp": "2025-05-01 12:00:00"}
+    assert row_id(row) == row_id(replayed)
+    assert row_id(row) == row_id({**row, "row_id": row_id(row)})
+
+
+def test_merge_into_rollup_skips_empty_batches(mock_client: Mock) -> None:
+    """No query is issued for an empty batch."""
+    merge_into_rollup([])
+    mock_client.query.assert_not_called()
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from app.utils.scores import (
+    format_score_result,
+    get_cached_score,
+    record_score,
+    seed_score,
+)
+
+
+def test_record_score_accumulates_per_subject_and_chapter() -> None:
+    """Scores are summed per normalised (subject, chapter)."""
+    state: dict = {}
+    record_score(state, "Wiskunde", "Vergelijkingen", 2, 3)
+    record_score(state, "wiskunde", "vergelijkingen", 1, 1)
+    record_score(state, "Geschiedenis", "Romeinse Rijk", 0, 2)
+
+    assert get_cached_score(state, "Wiskunde", "Vergelijkingen") == {
+        "total_student_score": 3,
+        "total_max_score": 4,
+    }
+    assert get_cached_score(state, "Wiskunde", "Integralen") is None
+
+
+def test_seeded_totals_are_extended() -> None:
+    """Totals seeded from BigQuery keep accumulating."""
+    state: dict = {}
+    seed_score(state, "Wiskunde", "Integralen", 5, 10)
+    record_score(state, "Wiskunde", "Integralen", 5, 10)
+    assert get_cached_score(state, "Wiskunde", "Integralen") == {
+        "total_student_score": 10,
+        "total_max_score": 20,
+    }
+
+
+def test_format_score_result_matches_query_row() -> None:
+    """The cached result has the shape of the BigQuery aggregate row."""
+    assert json.loads(format_score_result(3, 4)) == {
+        "total_student_score": 3,
+        "total_max_score": 4,
+        "total_percentage": 75.0,
+    }
+    assert json.loads(format_score_result(0, 0)) == {
+        "total_student_score": None,
+        "total_max_score": None,
+        "total_percentage": None,
+    }
@@ -0,0 +1,36 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.utils.session_state import set_state_entry
+
+
+def test_set_state_entry_reassigns_instead_of_mutating() -> None:
+    entries = {"a": 1}
+    state = {"key": entries}
+    set_state_entry(state, "key", "b", 2)
+    assert state["key"] == {"a": 1, "b": 2}
+    assert state["key"] is not entries
+    assert entries == {"a": 1}
+
+
+def test_set_state_entry_moves_entry_to_end_and_keeps_the_last_entries() -> None:
+    state = {"key": {"a": 1, "b": 2, "c": 3}}
+    set_state_entry(state, "key", "a", 4, max_entries=2)
+    assert list(state["key"].items()) == [("c", 3), ("a", 4)]
+
+
+def test_set_state_entry_creates_missing_dict() -> None:
+    state: dict = {}
+    set_state_entry(state, "key", "a", 1)
+    assert state == {"key": {"a": 1}}